@@ -6,10 +6,34 @@ import cv2
 import gazu
 import configparser
 import re
+import fnmatch
+import csv
+import time
+import random
+import threading
+import traceback
+import json
+import queue
 import subprocess
+import sqlite3
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import select
+import struct
+import gc
+import tracemalloc
+import base64
+import uuid
+import zlib
+import hashlib
+import functools
+import requests
+from collections import namedtuple, OrderedDict, Counter
 from xml.etree import ElementTree
 from cryptography.fernet import Fernet
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from PySide2.QtCore import *
 from PySide2.QtGui import *
@@ -18,6 +42,23 @@ from ui import Ui_MainWindow
 
 version = "0.1"
 
+# Uploads are bound by the network, not by the CPU count
+MAX_UPLOAD_THREADS = 32
+# Login, reference refresh, fetch and planning run on their own pool, so they
+# never queue behind uploads. Higher priorities are dequeued first.
+CONTROL_PRIORITY_LOGIN = 2
+CONTROL_PRIORITY_FETCH = 1
+CONTROL_PRIORITY_PLAN = 0
+# Number of scanned files the live rule preview is evaluated on
+RULE_PREVIEW_SAMPLE = 200
+ACCEPTED_EXTENSIONS = [".mov", ".mp4", ".jpg", ".png", ".tiff"]
+# Column of the information table holding the poster frames
+THUMBNAIL_COLUMN = 9
+# Columns 0 to 8 of the information table, as named in snapshots and CSV
+SNAPSHOT_COLUMNS = ("status", "exists", "episode", "sequence", "shot",
+                    "task", "frames", "preview", "filesize")
+SNAPSHOT_MAGIC = b"KPSNAP1\n"
+
 
 class WorkerSignals(QObject):
     '''
@@ -90,561 +131,3816 @@ class Worker(QRunnable):
             self.signals.finished.emit()  # Done
 
 
-class MainWindow(QMainWindow, Ui_MainWindow):
-    def __init__(self):
-        QMainWindow.__init__(self)
-        self.setupUi(self)
-        self.connectEvents()
-        self.general_path()
-        # The initial job queue status of the host is true
-        self.RQ = 1
-        self.threadpool = QThreadPool()
-        self.max_threads_count = os.cpu_count() - 1
-        self.max_threads_value.setText(str(self.max_threads_count))
-        # Set thread count to 1 so only one shot is synced
-        self.threadpool.setMaxThreadCount(1)
-        self.le_threads.setText("1")
-        self.le_threads.setValidator(QIntValidator(1, self.max_threads_count, self))
-        self.completed_tasks = 0
-        self.total_tasks = 0
-        self.l_ep.setVisible(True)
-        self.le_ep.setVisible(True)
-        self.le_delimiter.setText("_")
-        self.le_ep.setText("1")
-        self.le_sq.setText("2")
-        self.le_sh.setText("3")
-        self.le_ta.setText("4")
-        self.tv_information.setColumnHidden(2, False)
-        self.nb_frame = 0
-        self.newTaskItem_index = 0
-        self.pb_refresh.clicked.connect(lambda: self.refresh_project_list())
-        self.pb_tips.clicked.connect(lambda: self.open_file("Tips for rule definition.txt", path_chosen=0))
-        self.pb_logs.clicked.connect(lambda: self.open_file("Publish_log.txt", path_chosen=1))
-        self.cb_project.currentIndexChanged.connect(self.on_project_changed)
-        self.le_threads.textChanged.connect(self.update_thread_count)
-        
-        if not os.path.exists(self.key_file_path):
-            self.generate_key()
+# Frozen copies of the widget state handed to the fetch and upload workers
+FetchSettings = namedtuple("FetchSettings", [
+    "path", "source", "subfolders", "use_folder", "delimiter",
+    "ep", "sq", "sh", "ta", "project", "has_episode",
+    "pattern", "full_path", "include", "exclude", "max_depth", "latest_only"],
+    defaults=[None, False, "", "", 0, False])
+PublishSettings = namedtuple("PublishSettings", [
+    "project", "has_episode", "username", "reupload",
+    "null_task", "null_task_name", "status", "retries", "threads"],
+    defaults=[5, 1])
+PublishRow = namedtuple("PublishRow", [
+    "row", "task_type_dict", "episode", "sequence", "shot",
+    "task", "frames", "preview", "filesize"])
 
-        # Auto login
-        self.load_config()
 
-        self.cb_subfolders.setEnabled(True)
-        self.rb_doXML.setEnabled(False)
-        self.rb_doFolder.setChecked(True)
-        self.cb_reupload.setChecked(True)
+class UiUpdateBus(QObject):
+    '''
+    Single path for worker threads to change the GUI.
 
-        self.l_info.setText("")
-        self.l_gazuversion.setText(gazu.__version__)
-        self.l_appversion.setText(version)
-        self.gazuToken = None
-        self.isTransfering = False
-        self.cancelTransfer = False
-        self.numberOfShots = 0
-        appIcon = QIcon("kitsu.png")
-        self.setWindowIcon(appIcon)
-        self.show()
+    Workers post updates from any thread. They are applied on the GUI thread
+    by a timer running at a fixed rate. Updates posted under the same key
+    replace each other, so a burst of status changes costs one repaint.
+    Each tick only spends part of its interval, what is left waits for the
+    next one so the window keeps repainting during a big fetch.
 
-    def update_thread_count(self):
-        user_input = self.le_threads.text()
-        thread_count = 1
-        if user_input:
-            thread_count = int(user_input)
-            if thread_count <= 0:
-                thread_count = 1
-            elif thread_count > self.max_threads_count:
-                thread_count = self.max_threads_count
-        else:
-            thread_count = 1
-        self.threadpool.setMaxThreadCount(thread_count)
-        self.le_threads.setText(str(thread_count))
+    :param rate: Number of times per second pending updates are applied.
 
-    def __keyPressEvent(self, event):
-        if event.matches(QKeySequence.Delete):
-            self.__removeServer()
-        else:
-            QTableWidget.keyPressEvent(self.setup.serverTable, event)
+    '''
 
-    def __removeServer(self):
-        self.tv_information.removeRow(
-            self.tv_information.currentRow()
-        )
+    def __init__(self, parent=None, rate=30):
+        super(UiUpdateBus, self).__init__(parent)
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()
+        self.counter = 0
+        self.budget = 0.5 / rate
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / rate))
+        self.timer.timeout.connect(lambda: self.flush(self.budget))
+        self.timer.start()
 
-    def connectEvents(self):
-        self.pb_login.clicked.connect(
-            lambda: self.login(refresh=True)
-        )
-        self.rb_doXML.toggled.connect(
-            lambda: self.radioSwitch(self.rb_doXML)
-        )
-        self.rb_doFolder.toggled.connect(
-            lambda: self.radioSwitch(self.rb_doFolder)
-        )
-        self.pb_pick.clicked.connect(self.pick)
-        self.pb_fetch.clicked.connect(self.fetch)
-        self.pb_publish.clicked.connect(self.publish)
-        self.tv_information.keyPressEvent = self.__keyPressEvent
+    def post(self, key, fn, *args):
+        # Replaces a pending update with the same key and moves it to the
+        # end, so it is still applied after everything posted before it
+        with self.lock:
+            self.pending.pop(key, None)
+            self.pending[key] = (fn, args)
 
-    def login(self, refresh=False):
-        self.pb_login.setText("...Logging in...")
-        worker = Worker(self.login_kitsu, refresh)
-        worker.signals.result.connect(self.login_result)
+    def call(self, fn, *args):
+        # Updates that must all be applied, in order
+        with self.lock:
+            self.counter += 1
+            self.pending[("call", self.counter)] = (fn, args)
 
-        # Execute
-        self.threadpool.start(worker)
+    def flush(self, budget=None):
+        # budget: seconds to spend at most, None applies everything
+        deadline = None if budget is None else time.monotonic() + budget
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return
+                _, (fn, args) = self.pending.popitem(last=False)
+            try:
+                fn(*args)
+            except Exception:
+                # One broken update never drops the others
+                traceback.print_exc()
+            if deadline is not None and time.monotonic() >= deadline:
+                return
 
-    def login_result(self, success):
-        self.pb_login.setText("Log in")
-        if success is True:
-            self.l_info.setText("Logged in")
-            self.save_config()
-        elif success is False:
-            return  # Already logged in
-        else:
-            self.l_info.setText("Failed to login")
-            printMessage(success)
-        self.cb_project.setCurrentIndex(0)
-        self.cb_task.setEnabled(False)
-        self.cb_task.setCurrentIndex(self.newTaskItem_index)
-        self.cb_status.setCurrentIndex(0)
 
-        if self.RQ == 0:
-            self.le_threads.setText("1")
-            self.le_threads.setEnabled(False)
-            self.l_max_threads.setText("# Enabling job queue is needed | <span style='font-size: 8.8pt;'>需要启用 job queue</ span>")
-            self.max_threads_value.setVisible(False)
-        else:
-            self.le_threads.setEnabled(True)
-            self.l_max_threads.setText("# Max input value | <span style='font-size: 8.8pt;'>最大允许输入</ span>")
-            self.max_threads_value.setVisible(True)
+class PublishLogger(object):
+    '''
+    Writes the publish log from a background thread.
 
-    def login_kitsu(self, refresh, progress_callback):
-        self.l_info.setText("Logging in")
-        # Connect to server
-        if self.gazuToken is None or refresh is True:
+    Any thread can queue messages. They are written in batches: the readable
+    summary to the text log and structured records to the JSONL log, one JSON
+    object per line. Both files are rotated together when the JSONL log
+    grows past max_bytes or its first record is older than max_age seconds,
+    keeping the previous files as name.1.ext, name.2.ext, ...
+
+    '''
+
+    def __init__(self, text_path, jsonl_path, max_bytes=5 << 20, max_age=30 * 86400,
+                 backups=5, flush_interval=0.5):
+        self.text_path = text_path
+        self.jsonl_path = jsonl_path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, text=None, record=None):
+        self.queue.put((text, record))
+
+    def close(self):
+        # Writes what is still queued before returning
+        self.queue.put(None)
+        self.thread.join(5)
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < 1000:
+                try:
+                    batch.append(self.queue.get(timeout=self.flush_interval))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            entries = [entry for entry in batch if entry is not None]
             try:
-                host = self.le_kitsuURL.text()
-                host = removeLastSlash(host)
-                host = host + "/api"
-                gazu.set_host(host)
-                if not gazu.client.host_is_up():
-                    raise ConnectionError(
-                        "Could not connect to the server. Is the host URL correct?"
-                    )
-            except Exception as exc:
-                template = "An exception of type {0} occurred. Arguments:\n{1!r}"
-                message = template.format(type(exc).__name__, exc.args)
-                return message
+                self.rotate_if_needed()
+                self.write_batch(entries)
+            except OSError as exc:
+                print("Could not write the publish log: {}".format(exc))
+            if stop:
+                return
+
+    def write_batch(self, entries):
+        texts = [text for text, _ in entries if text is not None]
+        records = [record for _, record in entries if record is not None]
+        if texts:
+            with open(self.text_path, "a", encoding="utf-8") as log_file:
+                log_file.write("".join(text + "\n" for text in texts))
+        if records:
+            with open(self.jsonl_path, "a", encoding="utf-8") as log_file:
+                log_file.write("".join(json.dumps(record, ensure_ascii=False, default=str) + "\n"
+                                       for record in records))
 
-            # Login
+    def rotate_if_needed(self):
+        try:
+            size = os.path.getsize(self.jsonl_path)
+        except OSError:
+            return
+        too_big = size > self.max_bytes
+        too_old = False
+        if not too_big and self.max_age:
+            with open(self.jsonl_path, encoding="utf-8") as log_file:
+                first_line = log_file.readline()
             try:
-                self.gazuToken = gazu.log_in(self.le_username.text(),
-                                             self.le_password.text())
+                first_time = datetime.fromisoformat(json.loads(first_line)["time"])
+                too_old = (datetime.now() - first_time).total_seconds() > self.max_age
+            except (ValueError, KeyError, TypeError):
+                too_old = False
+        if too_big or too_old:
+            for path in (self.text_path, self.jsonl_path):
+                rotate_file(path, self.backups)
 
-            except Exception as exc:
-                message = (
-                    "Login verification failed. "
-                    "Please ensure your username and "
-                    "password for Kitsu are correct. "
-                )
-                template = "An exception of type {0} occurred. Arguments:\n{1!r}"
-                message = template.format(type(exc).__name__, message)
-                return message
 
-            # Logged in. Let's fetch the job-queue-up status first!
-            host_status = gazu.client.get("status")
-            if host_status["job-queue-up"] is False:
-                self.RQ = 0
+class PublishCanceled(Exception):
+    '''
+    Raised inside a worker when the publish it belongs to is canceled.
+
+    '''
+
+
+class CancelToken(object):
+    '''
+    Shared by every worker of one publish run.
+
+    Workers check it between Kitsu calls and between two chunks of an
+    upload, backoff sleeps wake up as soon as it is set.
+
+    '''
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.event.is_set():
+            raise PublishCanceled()
+
+    def sleep(self, seconds):
+        if self.event.wait(seconds):
+            raise PublishCanceled()
+
+
+class MultipartFileStream(object):
+    '''
+    A multipart/form-data body holding one file, read from disk while it is
+    sent.
+
+    requests sends a body with read() and a length chunk by chunk instead
+    of building it in memory. A multi-GB preview never sits in RAM and the
+    upload stops between two chunks once the cancel token is set.
+
+    '''
+
+    def __init__(self, path, field, token, source=None):
+        # source: a reader with a size to use instead of the file itself
+        self.token = token
+        boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary=" + boundary
+        filename = os.path.basename(path).replace('"', "%22")
+        if source is None:
+            source = open(path, "rb")
+            size = os.fstat(source.fileno()).st_size
+        else:
+            size = source.size
+        self.parts = [
+            ('--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\n'
+             'Content-Type: application/octet-stream\r\n\r\n').format(boundary, field, filename).encode(),
+            source,
+            "\r\n--{}--\r\n".format(boundary).encode(),
+        ]
+        self.length = len(self.parts[0]) + size + len(self.parts[2])
+        self.part = 0
+        self.offset = 0
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        self.token.raise_if_cancelled()
+        if size is None or size < 0:
+            size = self.length
+        chunks = []
+        while size > 0 and self.part < len(self.parts):
+            part = self.parts[self.part]
+            if isinstance(part, bytes):
+                chunk = part[self.offset:self.offset + size]
+                self.offset += len(chunk)
+                done = self.offset >= len(part)
             else:
-                self.RQ = 1
-                
-            # Logged in. Let's fetch the projects!
-            self.refresh_project_list()
+                chunk = part.read(size)
+                done = not chunk
+            if done:
+                self.part += 1
+                self.offset = 0
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
 
-            # and let's fetch the shot task types
-            try:
-                self.cb_task.setEnabled(True)
-                self.l_task.setEnabled(True)
-                self.cb_task.clear()
-                task_types = gazu.task.all_task_types()
-                for index, task_type in enumerate(task_types):
-                    if task_type["for_entity"] == "Shot":   # Fixed to align with API changes.
-                        self.cb_task.insertItem(
-                            index,
-                            task_type["name"],
-                            userData=task_type
-                        )
-                self.cb_task.insertItem(
-                    0,
-                    "Don't post | 不上传",
-                    self.cb_task.itemData(1)
-                )
-                self.newTaskItem_index = self.cb_task.count()
-                self.cb_task.insertItem(
-                    self.newTaskItem_index,
-                    "There's no preview with a null task name | 没有空任务字段的预览",
-                    self.cb_task.itemData(1)
-                    )
-            except Exception as exc:
-                template = "An exception of type {0} occurred. Arguments:\n{1!r}"
-                message = template.format(type(exc).__name__, exc.args)
-                return message
+    def close(self):
+        self.parts[1].close()
 
-            # and let's fetch the statuses
-            try:
-                self.cb_status.setEnabled(True)
-                self.l_status.setEnabled(True)
-                self.cb_status.clear()
-                all_task_statuses = gazu.task.all_task_statuses()
-                for index, all_task_status in enumerate(all_task_statuses):
-                    self.cb_status.insertItem(
-                        index,
-                        all_task_status["name"],
-                        userData=all_task_status
-                    )
-            except Exception as exc:
-                template = "An exception of type {0} occurred. Arguments:\n{1!r}"
-                message = template.format(type(exc).__name__, exc.args)
-                return message
 
-            return True
-        return False
+class FileTee(object):
+    '''
+    Reads a file once and hands every chunk to several readers, one per
+    Kitsu host the file is sent to.
 
-    def refresh_project_list(self):
+    A reader that falls behind holds the others back by at most its queue,
+    a reader that is closed early (failed upload) is dropped and no longer
+    fed. The file stops being read once every reader is dropped.
+    source(index) gives the reader to the first attempt of an upload only,
+    a retry reads the file on its own.
+
+    '''
+
+    def __init__(self, path, count, chunk_size=1 << 20, depth=8):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.chunk_size = chunk_size
+        self.queues = [queue.Queue(maxsize=depth) for _ in range(count)]
+        self.dropped = [threading.Event() for _ in range(count)]
+        self.taken = [False] * count
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
         try:
-            self.cb_project.setEnabled(True)
-            self.l_project.setEnabled(True)
-            self.cb_project.clear()
-            projects = gazu.project.all_projects()
-            for index, project in enumerate(projects):
-                self.cb_project.insertItem(
-                    index,
-                    project["name"],
-                    userData=project
-                )
-            self.l_info.setText("Project list refreshed | 项目列表已更新")
+            with open(self.path, "rb") as preview:
+                while not all(dropped.is_set() for dropped in self.dropped):
+                    chunk = preview.read(self.chunk_size)
+                    self.put(chunk)
+                    if not chunk:
+                        return
         except Exception as exc:
-            template = "An exception of type {0} occurred. Arguments:\n{1!r}"
-            message = template.format(type(exc).__name__, exc.args)
-            return message
-            
-    def on_project_changed(self):
-        current_project_name = self.cb_project.currentText()
+            self.put(exc)
 
-        if current_project_name:
-            current_project_dict = gazu.project.get_project_by_name(current_project_name)
-            if current_project_dict["production_type"] != "tvshow":
-                self.l_ep.setVisible(False)
-                self.le_ep.setText("1")
-                self.le_ep.setVisible(False)
-                self.tv_information.setColumnHidden(2, True)
-                self.has_episode = 0
+    def put(self, item):
+        for index, chunks in enumerate(self.queues):
+            while not self.dropped[index].is_set():
+                try:
+                    chunks.put(item, timeout=0.2)
+                    break
+                except queue.Full:
+                    pass
+
+    def source(self, index):
+        def take():
+            with self.lock:
+                if self.taken[index]:
+                    return None
+                self.taken[index] = True
+            return TeeReader(self, index)
+        return take
+
+    def drop(self, index):
+        self.dropped[index].set()
+
+
+class TeeReader(object):
+    '''
+    One reader of a FileTee, used as the file part of a MultipartFileStream.
+
+    '''
+
+    def __init__(self, tee, index):
+        self.tee = tee
+        self.index = index
+        self.size = tee.size
+        self.buffer = b""
+        self.offset = 0
+        self.ended = False
+
+    def read(self, size=-1):
+        if self.offset >= len(self.buffer) and not self.ended:
+            item = self.tee.queues[self.index].get()
+            if isinstance(item, Exception):
+                raise item
+            self.buffer = item
+            self.offset = 0
+            self.ended = not item
+        # Move an offset rather than slicing off the rest of the chunk,
+        # small reads would copy it over and over
+        if size is None or size < 0:
+            size = len(self.buffer) - self.offset
+        chunk = self.buffer[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        return chunk
+
+    def close(self):
+        self.tee.drop(self.index)
+
+
+class TokenBucket(object):
+    '''
+    Thread safe token bucket limiting the request rate sent to one Kitsu host.
+
+    :param rate: Requests per second. 0 or less disables the limit.
+    :param burst: How many requests can be sent at once after an idle period.
+
+    '''
+
+    def __init__(self, rate, burst=None):
+        self.lock = threading.Lock()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        with self.lock:
+            self.rate = float(rate)
+            self.capacity = float(burst or max(1.0, self.rate))
+            self.tokens = self.capacity
+            self.updated = time.monotonic()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                if self.rate <= 0:
+                    return
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+token_buckets = {}
+token_buckets_lock = threading.Lock()
+
+
+def token_bucket_for_host(host, rate):
+    # One bucket per host, shared by every publish talking to it
+    with token_buckets_lock:
+        bucket = token_buckets.get(host)
+        if bucket is None:
+            bucket = token_buckets[host] = TokenBucket(rate)
+        elif bucket.rate != rate:
+            bucket.set_rate(rate)
+        return bucket
+
+
+class AdaptiveConcurrency(object):
+    '''
+    AIMD controller for the number of upload threads.
+
+    Uploads and API calls are measured apart. The thread count grows by one
+    after every window of finished uploads and is halved when the server
+    throttles (429), fails (5xx) or drops connections. A growth step that
+    made the upload throughput (bytes/s) drop is undone, a window far slower
+    than the best one shrinks the count. An API call only counts when it
+    gets far slower than the fastest call of the same kind.
+
+    :param threadpool: The QThreadPool running the uploads.
+
+    '''
+
+    def __init__(self, threadpool):
+        self.threadpool = threadpool
+        self.lock = threading.Lock()
+        self.reset(1, 1, 1, enabled=False)
+
+    def reset(self, minimum, maximum, start, enabled=True):
+        with self.lock:
+            self.enabled = enabled
+            self.minimum = minimum
+            self.maximum = maximum
+            self.limit = max(minimum, min(start, maximum))
+            self.best_latency = {}
+            self.best_throughput = None
+            self.successes = 0
+            self.window_started = time.monotonic()
+            self.window_bytes = 0
+            self.last_throughput = None
+            self.last_change = None
+            self.cooldown_until = 0
+        if enabled:
+            self.threadpool.setMaxThreadCount(self.limit)
+
+    def record(self, latency, throttled=False, kind=None):
+        # An API call. kind keeps a small GET from being the baseline of a
+        # slower call.
+        if not self.enabled:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if throttled:
+                if now >= self.cooldown_until:
+                    self.change_limit(max(self.minimum, self.limit // 2), now)
+                return
+            best = self.best_latency.get(kind)
+            if best is None or latency < best:
+                self.best_latency[kind] = latency
+            elif latency > best * 4 and now >= self.cooldown_until:
+                self.change_limit(max(self.minimum, int(self.limit * 0.75)), now)
+
+    def record_upload(self, nbytes):
+        # A finished upload. Only uploads make the windows the thread count
+        # grows on.
+        if not self.enabled:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.window_bytes += nbytes
+            self.successes += 1
+            if self.successes < self.limit:
+                return
+            elapsed = max(now - self.window_started, 1e-6)
+            throughput = self.window_bytes / elapsed
+            if (self.best_throughput and throughput < self.best_throughput / 4
+                    and now >= self.cooldown_until):
+                self.change_limit(max(self.minimum, int(self.limit * 0.75)), now)
+            elif (self.last_change == "up" and self.last_throughput
+                    and throughput < self.last_throughput * 0.9):
+                self.change_limit(max(self.minimum, self.limit - 1), now)
             else:
-                self.l_ep.setVisible(True)
-                self.le_ep.setVisible(True)
-                self.tv_information.setColumnHidden(2, False)
-                self.has_episode = 1
+                self.change_limit(min(self.maximum, self.limit + 1), now)
+            self.last_throughput = throughput
+            self.best_throughput = max(self.best_throughput or 0, throughput)
 
-    def radioSwitch(self, switch):
-        if switch == self.rb_doXML:
-            self.cb_subfolders.setEnabled(False)
-        else:
-            self.cb_subfolders.setEnabled(True)
-        self.le_infopath.setText("")
+    def shed(self):
+        # Memory pressure: halve the threads and stay below that until the
+        # next reset
+        with self.lock:
+            limit = max(1, self.threadpool.maxThreadCount() // 2)
+            self.minimum = min(self.minimum, limit)
+            self.maximum = max(self.minimum, min(self.maximum, limit))
+            self.change_limit(limit, time.monotonic())
 
-    def pick(self):
-        if self.rb_doXML.isChecked() is True:  # If pick XML file
-            fname = QFileDialog.getOpenFileName(self,
-                                                'Pick XML File',
-                                                self.le_infopath.text(),
-                                                filter="XML files (*.xml)")
-            fname = fname[0]
-        else:  # If pick folder
-            fname = QFileDialog.getExistingDirectory(self,
-                                                     'Select a folder',
-                                                     self.le_infopath.text(),
-                                                     options=QFileDialog.ShowDirsOnly)
-        if fname != "":
+    def change_limit(self, limit, now):
+        if limit > self.limit:
+            self.last_change = "up"
+        elif limit < self.limit:
+            self.last_change = "down"
+            # Give the server a moment before reacting again
+            self.cooldown_until = now + 2.0
+        self.limit = limit
+        self.successes = 0
+        self.window_started = now
+        self.window_bytes = 0
+        self.threadpool.setMaxThreadCount(limit)
+
+
+class PreviewProcessingMonitor(object):
+    '''
+    Follows the server side transcoding of the uploaded previews.
+
+    A daemon thread polls the status of the previews that are still being
+    processed. Uploads call wait_for_capacity() before sending a new preview
+    so they are slowed down, then paused, when the server falls behind.
+
+    :param get_preview_file: Callable returning the preview file dict of an id.
+    :param max_pending: How many previews may wait for processing before uploads pause.
+    :param interval: Seconds between two polls.
+
+    '''
+
+    def __init__(self, get_preview_file, max_pending, interval=2.0):
+        self.get_preview_file = get_preview_file
+        self.max_pending = max(1, max_pending)
+        self.interval = interval
+        self.condition = threading.Condition()
+        self.pending = []
+        self.uploaded = 0
+        self.processed = 0
+        self.failed = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def add(self, preview_id):
+        with self.condition:
+            self.pending.append(preview_id)
+            self.uploaded += 1
+
+    def counts(self):
+        with self.condition:
+            return self.uploaded, self.processed, self.failed
+
+    def wait_for_capacity(self, cancelled=lambda: False):
+        with self.condition:
+            while self.running and len(self.pending) >= self.max_pending and not cancelled():
+                self.condition.wait(self.interval)
+            fill = len(self.pending) / self.max_pending
+        if fill > 0.5:
+            # Slow down before the backlog is full
+            time.sleep(self.interval * fill)
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    return
+                # The oldest previews are the first to be done
+                batch = self.pending[:20]
+            done = []
+            for preview_id in batch:
+                try:
+                    preview_file = self.get_preview_file(preview_id)
+                except Exception:
+                    continue
+                status = (preview_file or {}).get("status", "ready")
+                if status == "broken":
+                    done.append((preview_id, False))
+                elif status != "processing":
+                    done.append((preview_id, True))
+            with self.condition:
+                for preview_id, success in done:
+                    self.pending.remove(preview_id)
+                    if success:
+                        self.processed += 1
+                    else:
+                        self.failed += 1
+                if done:
+                    self.condition.notify_all()
+                self.condition.wait(self.interval)
+
+
+class TrigramIndex(object):
+    '''
+    Finds the keys sharing the most trigrams with a query.
+
+    Only the postings of the trigrams of the query are visited, never the
+    whole key list. Scores are Dice coefficients between 0 and 1.
+
+    '''
+
+    def __init__(self):
+        self.postings = {}
+        self.sizes = []
+        self.values = []
+
+    def add(self, key, value):
+        position = len(self.values)
+        grams = trigrams(key)
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(position)
+        self.sizes.append(len(grams))
+        self.values.append(value)
+
+    def search(self, query, limit=5, min_score=0.3):
+        grams = trigrams(query)
+        common = Counter()
+        for gram in grams:
+            common.update(self.postings.get(gram, ()))
+        scored = []
+        for position, count in common.items():
+            score = 2.0 * count / (len(grams) + self.sizes[position])
+            if score >= min_score:
+                scored.append((score, self.values[position]))
+        scored.sort(key=lambda match: -match[0])
+        return scored[:limit]
+
+
+class ShotMatchIndex(object):
+    '''
+    Suggestions for rule results that don't match a shot of the project.
+
+    Names are compared normalized first (case, separators and zero padding
+    ignored), then by trigrams: the sequence among all sequences, the shot
+    only among the shots of the best sequences.
+
+    '''
+
+    def __init__(self, shot_index):
+        self.exact = {}
+        self.sequences = TrigramIndex()
+        self.shots = {}
+        for episode, sequence, shot in shot_index:
+            self.exact[(normalize_name(episode), normalize_name(sequence),
+                        normalize_name(shot))] = (episode, sequence, shot)
+            sequence_key = (episode, sequence)
+            if sequence_key not in self.shots:
+                self.shots[sequence_key] = TrigramIndex()
+                self.sequences.add(self.sequence_query(episode, sequence), sequence_key)
+            self.shots[sequence_key].add(normalize_name(shot), shot)
+
+    def sequence_query(self, episode, sequence):
+        return normalize_name(episode) + "|" + normalize_name(sequence)
+
+    def suggest(self, episode, sequence, shot, limit=5):
+        # [(score, (episode, sequence, shot)), ...], best first
+        exact = self.exact.get((normalize_name(episode), normalize_name(sequence),
+                                normalize_name(shot)))
+        if exact is not None:
+            return [(1.0, exact)]
+        suggestions = []
+        for sequence_score, sequence_key in self.sequences.search(
+                self.sequence_query(episode, sequence), limit=3):
+            for shot_score, shot_name in self.shots[sequence_key].search(
+                    normalize_name(shot), limit=limit):
+                # The shot name weighs more than the sequence it sits in
+                suggestions.append(((sequence_score + 2 * shot_score) / 3,
+                                    sequence_key + (shot_name,)))
+        suggestions.sort(key=lambda match: -match[0])
+        return suggestions[:limit]
+
+
+class ThumbnailCache(object):
+    '''
+    Poster frames of the previews, kept as small JPEG images.
+
+    The memory part is an LRU bounded in bytes and looked up by path, so
+    the GUI thread never touches the disk. The disk part is keyed by path,
+    size and modification time: an overwritten preview gets a new frame.
+    It is an LRU too, on the modification time of the files, pruned down
+    to 80% of max_disk_bytes when it grows over it.
+
+    '''
+
+    def __init__(self, cache_dir, max_bytes=16 << 20, height=40, max_disk_bytes=256 << 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.height = height
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+        self.bytes = 0
+        self.disk_lock = threading.Lock()
+        self.disk_bytes = None  # Measured on the first write
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cached(self, path):
+        with self.lock:
+            entry = self.items.get(path)
+            if entry is None:
+                return None
+            self.items.move_to_end(path)
+            return entry[1]
+
+    def load(self, path):
+        # Worker side: memory, then disk, then decode
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            entry = self.items.get(path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+        key = "{}|{}|{}".format(path, *signature).encode()
+        disk_path = os.path.join(self.cache_dir, hashlib.sha1(key).hexdigest() + ".jpg")
+        try:
+            with open(disk_path, "rb") as cached_file:
+                data = cached_file.read()
+            with contextlib.suppress(OSError):
+                os.utime(disk_path)  # Recently used
+        except OSError:
+            data = poster_frame(path, self.height)
+            if data is None:
+                # Remembered as empty so it isn't decoded again on each scroll
+                self.put(path, signature, b"")
+                return b""
+            try:
+                with open(disk_path, "wb") as cached_file:
+                    cached_file.write(data)
+                self.add_disk(len(data))
+            except OSError:
+                pass  # Only a cache
+        self.put(path, signature, data)
+        return data
+
+    def add_disk(self, nbytes):
+        with self.disk_lock:
+            if self.disk_bytes is None:
+                self.disk_bytes = sum(size for _, size, _ in self.disk_entries())
+            else:
+                self.disk_bytes += nbytes
+            if self.disk_bytes > self.max_disk_bytes:
+                self.prune()
+
+    def disk_entries(self):
+        entries = []
+        with os.scandir(self.cache_dir) as found:
+            for entry in found:
+                if not entry.name.endswith(".jpg"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def prune(self):
+        # Least recently used first, a disk hit touches its file
+        entries = sorted(self.disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes * 0.8:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self.disk_bytes = total
+
+    def evict(self):
+        # The decoded thumbnails stay on disk, only the memory copy goes
+        with self.lock:
+            self.items.clear()
+            self.bytes = 0
+
+    def put(self, path, signature, data):
+        with self.lock:
+            previous = self.items.pop(path, None)
+            if previous is not None:
+                self.bytes -= len(previous[1])
+            self.items[path] = (signature, data)
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes and len(self.items) > 1:
+                _, (_, evicted) = self.items.popitem(last=False)
+                self.bytes -= len(evicted)
+
+
+class MemoryMonitor(object):
+    '''
+    Follows the memory of a fetch or a publish, stage by stage.
+
+    A sampling thread keeps the peak resident size of every stage and calls
+    on_pressure when the process goes over the budget, at most once per
+    cooldown. With trace, tracemalloc also measures the Python allocations
+    of every stage and keeps their largest sources.
+
+    '''
+
+    def __init__(self, budget=0, trace=False, on_pressure=None, interval=0.5, cooldown=5.0):
+        self.budget = budget
+        self.trace = trace
+        self.on_pressure = on_pressure
+        self.interval = interval
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.stages = []
+        self.current = None
+        self.pressure_events = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def start(self, stage):
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.begin(stage)
+        self.thread.start()
+
+    def begin(self, stage):
+        if self.trace and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        rss = current_rss()
+        with self.lock:
+            self.current = {"stage": stage, "start_rss": rss, "peak_rss": rss,
+                            "started": time.monotonic()}
+
+    def stage(self, name):
+        # Ends the running stage and starts the next one
+        self.end()
+        self.begin(name)
+
+    def end(self):
+        with self.lock:
+            current, self.current = self.current, None
+        if current is None:
+            return
+        current["peak_rss"] = max(current["peak_rss"], current_rss())
+        current["seconds"] = round(time.monotonic() - current.pop("started"), 1)
+        if self.trace and tracemalloc.is_tracing():
+            current["python"], current["python_peak"] = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics("lineno")[:5]
+            current["top"] = ["{} {}".format(stat.traceback, pretty_size(stat.size)) for stat in statistics]
+        self.stages.append(current)
+
+    def stop(self):
+        self.end()
+        self.stopped.set()
+        if self.trace and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return self.stages
+
+    def sample(self):
+        last_pressure = 0
+        while not self.stopped.wait(self.interval):
+            rss = current_rss()
+            with self.lock:
+                if self.current is not None:
+                    self.current["peak_rss"] = max(self.current["peak_rss"], rss)
+            now = time.monotonic()
+            if self.budget and rss > self.budget and now - last_pressure > self.cooldown:
+                last_pressure = now
+                self.pressure_events += 1
+                if self.on_pressure is not None:
+                    self.on_pressure(rss)
+
+    def summary(self):
+        parts = []
+        for stage in self.stages:
+            text = "{} {}".format(stage["stage"], pretty_size(stage["peak_rss"]))
+            if "python_peak" in stage:
+                text += " (Python {})".format(pretty_size(stage["python_peak"]))
+            parts.append(text)
+        text = "Peak memory: " + ", ".join(parts)
+        if self.pressure_events:
+            text += ", over budget {} times".format(self.pressure_events)
+        return text
+
+
+def current_rss():
+    # Resident size of the process in bytes, 0 when it can't be read
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            class ProcessMemoryCounters(ctypes.Structure):
+                _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong)] + [
+                    (name, ctypes.c_size_t) for name in (
+                        "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                        "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                        "PagefileUsage", "PeakPagefileUsage")]
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                     ctypes.byref(counters), counters.cb)
+            return counters.WorkingSetSize
+        import resource
+        # macOS has no current size without extra modules, the peak will do
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return 0
+
+
+class FileTally(object):
+    '''
+    Stands for the list of scanned files: counts them and only keeps the
+    first ones as the sample of the rule preview, so a 100k-file fetch
+    doesn't hold every path twice.
+
+    '''
+
+    def __init__(self, sample_size):
+        self.sample_size = sample_size
+        self.count = 0
+        self.sample = []
+
+    def append(self, file):
+        self.count += 1
+        if len(self.sample) < self.sample_size and os.path.splitext(file)[1] in ACCEPTED_EXTENSIONS:
+            self.sample.append(file)
+
+    def __len__(self):
+        return self.count
+
+
+class KitsuSession(object):
+    '''
+    The one authenticated gazu session of the application.
+
+    Logging in, the status check and the reference lists (projects, task
+    types and task statuses) are only done again when the credentials
+    change, when asked, or when they are stale. Before use the session is
+    validated with a single cheap request at most once per interval, and
+    the access token is refreshed a while before it expires.
+
+    '''
+
+    def __init__(self, validate_interval=60, refresh_margin=300, reference_ttl=900, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.validate_interval = validate_interval
+        self.refresh_margin = refresh_margin
+        self.reference_ttl = reference_ttl
+        self.lock = threading.RLock()
+        self.credentials = None
+        self.logged_in = False
+        self.token_expires = 0
+        self.last_validated = 0
+        self.job_queue_up = True
+        self.reference = None
+        self.reference_time = 0
+
+    def ensure(self, host=None, username=None, password=None):
+        # Returns True when a new login was needed. Without arguments the
+        # credentials of the last login are used. Every upload thread comes
+        # through here: the periodic check runs outside the lock, one thread
+        # does it while the others go on.
+        with self.lock:
+            if host is not None:
+                credentials = (removeLastSlash(host), username, password)
+                if credentials != self.credentials:
+                    self.credentials = credentials
+                    self.logged_in = False
+            if self.credentials is None:
+                raise ConnectionError("Not logged in | 未登录")
+            if not self.logged_in:
+                self.log_in()
+                return True
+            now = time.time()
+            if now > self.token_expires - self.refresh_margin:
+                self.refresh()
+                return False
+            if now - self.last_validated <= self.validate_interval:
+                return False
+            self.last_validated = now
+        try:
+            authenticated = gazu.client.get("auth/authenticated")
+        except Exception:
+            authenticated = None
+        if authenticated:
+            return False
+        with self.lock:
+            if self.logged_in and self.last_validated > now:
+                return False  # An other thread logged in meanwhile
+            self.log_in()
+            return True
+
+    def invalidate(self):
+        with self.lock:
+            self.logged_in = False
+
+    def log_in(self):
+        host, username, password = self.credentials
+        gazu.set_host(host + "/api")
+        if not gazu.client.host_is_up():
+            raise ConnectionError(
+                "Could not connect to the server. Is the host URL correct?"
+            )
+        try:
+            tokens = gazu.log_in(username, password)
+        except Exception as exc:
+            raise PermissionError(
+                "Login verification failed. "
+                "Please ensure your username and "
+                "password for Kitsu are correct. "
+            ) from exc
+        self.set_tokens(tokens)
+        self.logged_in = True
+        # A new server may have a different job queue and reference data
+        self.job_queue_up = gazu.client.get("status")["job-queue-up"] is not False
+        self.reference = None
+
+    def refresh(self):
+        # gazu 0.8 has no call for it: auth/refresh-token is asked with the
+        # refresh token, which stays the same, for a new access token
+        client = gazu.client.default_client
+        tokens = getattr(client, "tokens", None) or {}
+        try:
+            response = client.session.get(gazu.client.get_full_url("auth/refresh-token"),
+                                          headers={"Authorization": "Bearer " + tokens["refresh_token"]},
+                                          timeout=30)
+            response.raise_for_status()
+            tokens = dict(tokens, access_token=response.json()["access_token"])
+        except Exception:
+            self.log_in()
+            return
+        gazu.client.set_tokens(tokens)
+        self.set_tokens(tokens)
+
+    def set_tokens(self, tokens):
+        now = time.time()
+        self.token_expires = token_expiry((tokens or {}).get("access_token"), now + 3600)
+        self.last_validated = now
+
+    def reference_data(self, force=False):
+        with self.lock:
+            if force or self.reference is None or time.time() - self.reference_time > self.reference_ttl:
+                # The three lists don't depend on each other, load them at once
+                loaders = {"projects": gazu.project.all_projects,
+                           "task_types": gazu.task.all_task_types,
+                           "task_statuses": gazu.task.all_task_statuses}
+                reference = {}
+                errors = []
+
+                def load(key, loader):
+                    try:
+                        reference[key] = loader()
+                    except Exception as exc:
+                        errors.append(exc)
+
+                threads = [threading.Thread(target=load, args=item) for item in loaders.items()]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                if errors:
+                    raise errors[0]
+                self.reference = reference
+                self.reference_time = time.time()
+                self.save_cached_reference()
+            return self.reference
+
+    def cache_file(self, host, username):
+        key = "{}|{}".format(removeLastSlash(host), username).encode()
+        return os.path.join(self.cache_dir, "reference_{}.json".format(hashlib.sha1(key).hexdigest()[:16]))
+
+    def load_cached_reference(self, host, username, max_age):
+        # Shown at startup while the real lists are loaded in the background
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.cache_file(host, username), encoding="utf-8") as cache:
+                cached = json.load(cache)
+        except (OSError, ValueError):
+            return None
+        if time.time() - cached.get("time", 0) > max_age:
+            return None
+        return cached.get("reference")
+
+    def save_cached_reference(self):
+        if self.cache_dir is None or self.credentials is None:
+            return
+        host, username, _ = self.credentials
+        path = self.cache_file(host, username)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as cache:
+                json.dump({"time": self.reference_time, "reference": self.reference}, cache)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass  # Only a cache
+
+
+class KitsuTarget(object):
+    '''
+    An other Kitsu instance the publishes are mirrored to, from a
+    [Mirror <name>] section of the config.
+
+    It has its own gazu client, login, rate limit and retries. The project,
+    entities, task type and status are found by the names used on the main
+    host, and cached for the whole run.
+
+    '''
+
+    def __init__(self, name, host, username, password, project_name=None, rate=20):
+        self.name = name
+        self.host = removeLastSlash(host)
+        self.username = username
+        self.password = password
+        self.project_name = project_name
+        self.rate_limiter = token_bucket_for_host(self.host, rate)
+        self.client = gazu.client.create_client(self.host + "/api")
+        self.lock = threading.Lock()
+        self.logged_in = False
+        self.cache = {}
+
+    def ensure(self):
+        with self.lock:
+            if not self.logged_in:
+                try:
+                    gazu.log_in(self.username, self.password, client=self.client)
+                except Exception as exc:
+                    raise PermissionError("Login failed on {} | 登录失败".format(self.host)) from exc
+                self.logged_in = True
+
+    def call(self, token, fn, *args, attempts=5, recover=None, measure=None, **kwargs):
+        # The retry policy of MainWindow.kitsu_call, against this host.
+        # Mirrors don't steer the thread count, measure is not used.
+        not_authenticated = getattr(gazu.exception, "NotAuthenticatedException", ())
+        for attempt in range(attempts + 1):
+            token.raise_if_cancelled()
+            self.ensure()
+            self.rate_limiter.acquire()
+            try:
+                return fn(*args, client=self.client, **kwargs)
+            except not_authenticated:
+                if attempt == attempts:
+                    raise
+                with self.lock:
+                    self.logged_in = False
+            except Exception as exc:
+                if not is_retryable_error(exc) or attempt == attempts:
+                    raise
+                token.sleep(backoff_delay(attempt))
+                if recover is not None:
+                    found = self.call(token, recover)
+                    if found is not None:
+                        return found
+
+    def cached(self, token, key, fn, *args):
+        with self.lock:
+            if key in self.cache:
+                return self.cache[key]
+        value = self.call(token, fn, *args)
+        with self.lock:
+            self.cache[key] = value
+        return value
+
+    def resolve(self, token, first, settings, task_type_name):
+        # (task, status, person) for the rows of a group on this host.
+        # Raises LookupError with the reason when something is missing.
+        project_name = self.project_name or settings.project["name"]
+        project = self.cached(token, ("project", project_name), gazu.project.get_project_by_name, project_name)
+        if project is None:
+            raise LookupError("no project " + project_name)
+        if settings.has_episode == 1:
+            episode = self.cached(token, ("episode", first.episode),
+                                  gazu.shot.get_episode_by_name, project, first.episode)
+            if episode is None:
+                raise LookupError("no episode " + first.episode)
+            sequence = self.cached(token, ("sequence", first.episode, first.sequence),
+                                   gazu.shot.get_sequence_by_name, project, first.sequence, episode)
+        else:
+            sequence = self.cached(token, ("sequence", None, first.sequence),
+                                   gazu.shot.get_sequence_by_name, project, first.sequence)
+        if sequence is None:
+            raise LookupError("no sequence " + first.sequence)
+        shot = self.call(token, gazu.shot.get_shot_by_name, sequence, first.shot)
+        if shot is None:
+            raise LookupError("no shot " + first.shot)
+        task_type = self.cached(token, ("task type", task_type_name),
+                                gazu.task.get_task_type_by_name, task_type_name)
+        if task_type is None:
+            raise LookupError("no task type " + task_type_name)
+        task = self.call(token, gazu.task.get_task_by_name, shot, task_type)
+        if task is None:
+            raise LookupError("no task " + task_type_name)
+        status = self.cached(token, ("status", settings.status["name"]),
+                             gazu.task.get_task_status_by_name, settings.status["name"])
+        if status is None:
+            raise LookupError("no status " + settings.status["name"])
+        person = self.cached(token, ("person",), gazu.person.get_person_by_email, self.username)
+        return task, status, person
+
+
+def token_expiry(token, fallback):
+    # The access token is a JWT, its payload holds the expiry time
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return fallback
+
+
+class PublishJob(object):
+    '''
+    A fetched folder or manifest of one project waiting in the publish queue.
+
+    The job keeps its own copy of the rows and of the publish settings, so
+    the main table can be used for the next fetch while it waits. Upload
+    groups are handed out one by one to the shared upload pool.
+
+    '''
+
+    def __init__(self, fetch_settings, publish_settings, rows, batch):
+        self.fetch_settings = fetch_settings
+        self.publish_settings = publish_settings
+        self.lock = threading.Lock()
+        if batch:
+            self.groups = group_rows_by_task(rows, publish_settings)
+        else:
+            self.groups = [[row] for row in rows]
+        self.next_group = 0
+        self.in_flight = 0
+        # Row numbers that went through; a group is complete once all its
+        # rows are in here
+        self.done_rows = set()
+        self.completed = 0
+        self.total = len(rows)
+        self.paused = False
+
+    @property
+    def project_name(self):
+        return (self.fetch_settings.project or {}).get("name", "")
+
+    @property
+    def status(self):
+        if self.completed >= self.total:
+            return "Done"
+        if self.paused:
+            return "Paused" if self.in_flight == 0 else "Pausing"
+        if self.next_group == 0:
+            return "Queued"
+        return "Running"
+
+    def has_work(self):
+        return not self.paused and self.next_group < len(self.groups)
+
+    def take_group(self):
+        group = self.groups[self.next_group]
+        self.next_group += 1
+        self.in_flight += 1
+        return self.next_group - 1, group
+
+    def group_finished(self, index):
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def requeue_running(self):
+        # After a cancel: every group handed out that did not complete,
+        # dropped from the pool, stopped halfway or failed, is done again
+        # when the job is resumed
+        with self.lock:
+            unfinished = [group for group in self.groups[:self.next_group]
+                          if any(row.row not in self.done_rows for row in group)]
+        if not unfinished:
+            return
+        self.groups = unfinished + self.groups[self.next_group:]
+        self.next_group = 0
+        self.in_flight = 0
+        self.paused = True
+
+    # Same interface as the main window for uploadToKitsu
+    def post_cell(self, row, column, text):
+        pass
+
+    def post_row_status(self, row, text):
+        pass
+
+    def row_done(self, row):
+        with self.lock:
+            self.done_rows.add(row)
+            self.completed = len(self.done_rows)
+
+
+class SharedWorkQueue(object):
+    '''
+    A publish plan stored in a SQLite file on a share, worked by any number
+    of Kitsu Publisher instances.
+
+    Every upload group is one item. A worker claims an item with a lease
+    and renews it while uploading. Leases of a crashed or unplugged
+    workstation expire and the item is handed out again. Each call opens
+    its own connection, so the object can be used from several threads.
+
+    '''
+
+    def __init__(self, path, lease=300, max_attempts=3):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        with self.connect() as connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    updated REAL);
+                CREATE INDEX IF NOT EXISTS items_state ON items (state, lease_expires);
+            """)
+
+    @contextlib.contextmanager
+    def connect(self):
+        # No WAL: it needs shared memory, which network shares don't have
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            connection.execute("PRAGMA journal_mode=DELETE")
+            yield connection
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def add_plan(self, host, settings, groups):
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('host', ?)", (host,))
+            connection.executemany(
+                "INSERT INTO items (payload, updated) VALUES (?, ?)",
+                [(json.dumps({"settings": settings._asdict(),
+                              "rows": [row._asdict() for row in rows]}), now)
+                 for rows in groups])
+            connection.execute("COMMIT")
+
+    def host(self):
+        with self.connect() as connection:
+            found = connection.execute("SELECT value FROM meta WHERE key = 'host'").fetchone()
+        return found[0] if found else ""
+
+    def claim(self, owner):
+        # BEGIN IMMEDIATE takes the write lock before reading, so two
+        # workstations can never lease the same item
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # An item whose lease ran out on every attempt crashes its
+            # workers: stop handing it out
+            connection.execute(
+                "UPDATE items SET state = 'failed', result = ?, lease_expires = NULL, updated = ? "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                ("The lease expired {} times | 租约已过期 {} 次".format(self.max_attempts, self.max_attempts),
+                 now, now, self.max_attempts))
+            found = connection.execute(
+                "SELECT id, payload FROM items WHERE state = 'pending' "
+                "OR (state = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,)).fetchone()
+            if found is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                "UPDATE items SET state = 'leased', owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (owner, now + self.lease, now, found[0]))
+            connection.execute("COMMIT")
+        payload = json.loads(found[1])
+        return (found[0],
+                PublishSettings(**payload["settings"]),
+                [PublishRow(**row) for row in payload["rows"]])
+
+    def renew(self, owner):
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE items SET lease_expires = ?, updated = ? "
+                "WHERE state = 'leased' AND owner = ?",
+                (now + self.lease, now, owner))
+
+    def complete(self, item_id, owner, message=None):
+        # Only the current lease holder may record a result: a worker that
+        # lost its lease must not overwrite the one that took over, and
+        # gets None back
+        if message is None:
+            state = "done"
+        else:
+            state = "failed"
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if state == "failed":
+                attempts = connection.execute(
+                    "SELECT attempts FROM items WHERE id = ?", (item_id,)).fetchone()
+                if attempts and attempts[0] < self.max_attempts:
+                    state = "pending"
+            updated = connection.execute(
+                "UPDATE items SET state = ?, result = ?, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND owner = ? AND state = 'leased'",
+                (state, message, time.time(), item_id, owner)).rowcount
+            connection.execute("COMMIT")
+        return state if updated else None
+
+    def release(self, item_id, owner):
+        # Give an unstarted item back without counting the attempt
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE items SET state = 'pending', owner = NULL, lease_expires = NULL, "
+                "attempts = attempts - 1, updated = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+                (time.time(), item_id, owner))
+
+    def counts(self):
+        with self.connect() as connection:
+            found = connection.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall()
+        return dict(found)
+
+    def outstanding(self):
+        counts = self.counts()
+        return counts.get("pending", 0) + counts.get("leased", 0)
+
+
+class SharedQueueTracker(object):
+    '''
+    Same interface as the main window for uploadToKitsu, for rows coming
+    from a shared work queue instead of the table.
+
+    '''
+
+    def post_cell(self, row, column, text):
+        pass
+
+    def post_row_status(self, row, text):
+        pass
+
+    def row_done(self, row):
+        pass
+
+
+class WatchRecord(object):
+    '''
+    The files a watch has handled, in a SQLite file of the config folder,
+    so a restarted watch doesn't publish them again. A file whose size or
+    modification time changed is handled again. The first watch of a folder
+    records the files already in it as a baseline, only new ones are
+    published.
+
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with self.connect() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS handled (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    outcome TEXT,
+                    updated REAL)""")
+            connection.execute("CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, started REAL)")
+
+    @contextlib.contextmanager
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def load(self):
+        # {path: (size, mtime_ns)}, read once when the watch starts
+        with self.connect() as connection:
+            return dict((path, (size, mtime_ns)) for path, size, mtime_ns in
+                        connection.execute("SELECT path, size, mtime_ns FROM handled"))
+
+    def mark(self, path, size, mtime_ns, outcome):
+        with self.connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO handled VALUES (?, ?, ?, ?, ?)",
+                               (path, size, mtime_ns, outcome, time.time()))
+
+    def known_root(self, root):
+        with self.connect() as connection:
+            return connection.execute("SELECT 1 FROM roots WHERE path = ?", (root,)).fetchone() is not None
+
+    def add_baseline(self, root, files):
+        # Records files as handled without publishing them, returns their
+        # {path: (size, mtime_ns)}
+        baseline = {}
+        for path in files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            baseline[path] = (stat.st_size, stat.st_mtime_ns)
+        now = time.time()
+        with self.connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO handled VALUES (?, ?, ?, ?, ?)",
+                                   [(path, size, mtime_ns, "baseline", now)
+                                    for path, (size, mtime_ns) in baseline.items()])
+            connection.execute("INSERT OR REPLACE INTO roots VALUES (?, ?)", (root, now))
+        return baseline
+
+
+class FolderWatcher(object):
+    '''
+    Reports the preview files that appear under a folder, by polling.
+
+    Only the folders are stat'ed on every pass, a folder is listed again
+    when its modification time changed, which adding, renaming or removing
+    a file in it does. A file rewritten in place under an existing name is
+    only seen by the inotify watcher.
+
+    '''
+
+    def __init__(self, root, ext, scan_filter=None, subfolders=True, interval=10.0, stop_event=None):
+        self.root = root
+        self.ext = ext
+        self.scan_filter = scan_filter or ScanFilter()
+        self.subfolders = subfolders
+        self.interval = interval
+        self.stop_event = stop_event or threading.Event()
+        self.folders = {}
+        self.next_poll = 0
+
+    def start(self):
+        # Every preview already in the folder
+        self.next_poll = time.monotonic() + self.interval
+        return list(self.add_tree(self.root, "", 0))
+
+    def accepts(self, name, relative):
+        return (os.path.splitext(name)[1].lower() in self.ext
+                and self.scan_filter.accept_file(name, relative))
+
+    def add_tree(self, path, prefix, depth):
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            entries = list(os.scandir(path))
+        except OSError:
+            return
+        self.add_folder(path, prefix, depth, mtime_ns, set(entry.name for entry in entries))
+        for entry in entries:
+            yield from self.new_entry(entry, prefix, depth)
+
+    def new_entry(self, entry, prefix, depth):
+        relative = prefix + entry.name
+        if entry.is_dir():
+            if self.subfolders and not self.scan_filter.skip_folder(entry.name, relative, depth + 1):
+                yield from self.add_tree(entry.path, relative + "/", depth + 1)
+        elif self.accepts(entry.name, relative):
+            yield entry.path
+
+    def add_folder(self, path, prefix, depth, mtime_ns, names):
+        self.folders[path] = [prefix, depth, mtime_ns, names]
+
+    def wait(self, timeout):
+        # New files, after at most timeout seconds. Empty when stopped.
+        delay = max(0.0, min(timeout, self.next_poll - time.monotonic()))
+        if self.stop_event.wait(delay) or time.monotonic() < self.next_poll:
+            return []
+        self.next_poll = time.monotonic() + self.interval
+        found = []
+        for path, folder in list(self.folders.items()):
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+                if mtime_ns == folder[2]:
+                    continue
+                entries = list(os.scandir(path))
+            except OSError:
+                del self.folders[path]
+                continue
+            names = set(entry.name for entry in entries)
+            prefix, depth, _, known = folder
+            folder[2], folder[3] = mtime_ns, names
+            for entry in entries:
+                if entry.name not in known:
+                    found.extend(self.new_entry(entry, prefix, depth))
+        return found
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(FolderWatcher):
+    '''
+    FolderWatcher on Linux inotify: one watch per folder and a blocking
+    read, so nothing runs between two events whatever the size of the tree.
+    Raises OSError when inotify is missing or out of watches, the polling
+    watcher is used then.
+
+    '''
+
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, *args, **kwargs):
+        FolderWatcher.__init__(self, *args, **kwargs)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.watches = {}
+
+    def add_folder(self, path, prefix, depth, mtime_ns, names):
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch", path)
+        self.watches[wd] = path
+        self.folders[path] = [prefix, depth, mtime_ns, None]
+
+    def wait(self, timeout):
+        # Wakes up at least every second to notice a stop
+        found = []
+        deadline = time.monotonic() + timeout
+        while not found and not self.stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([self.fd], [], [], min(remaining, 1.0))
+            if readable:
+                found.extend(self.read_events())
+        return found
+
+    def read_events(self):
+        buffer = os.read(self.fd, 1 << 16)
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = struct.unpack_from("iIII", buffer, offset)
+            name = os.fsdecode(buffer[offset + 16:offset + 16 + length].rstrip(b"\0"))
+            offset += 16 + length
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were lost, look at the whole tree again
+                yield from self.add_tree(self.root, "", 0)
+                continue
+            if mask & self.IN_IGNORED:
+                self.folders.pop(self.watches.pop(wd, None), None)
+                continue
+            folder = self.watches.get(wd)
+            if folder is None or not name:
+                continue
+            prefix, depth = self.folders[folder][:2]
+            path = os.path.join(folder, name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    relative = prefix + name
+                    if self.subfolders and not self.scan_filter.skip_folder(name, relative, depth + 1):
+                        yield from self.add_tree(path, relative + "/", depth + 1)
+            elif self.accepts(name, prefix + name):
+                yield path
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_folder_watcher(root, ext, scan_filter, subfolders, interval, stop_event):
+    # inotify where there is one, polling elsewhere (Windows, macOS, shares
+    # mounted without events support still work through polling)
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, ext, scan_filter, subfolders, interval, stop_event)
+        except (OSError, AttributeError):
+            pass
+    return FolderWatcher(root, ext, scan_filter, subfolders, interval, stop_event)
+
+
+def group_rows_by_task(rows, settings):
+    # Rows resolving to the same episode/sequence/shot/task share one
+    # comment. The groups keep the table order.
+    groups = {}
+    for row in rows:
+        task = row.task
+        if "null" in task:
+            task = settings.null_task_name
+        key = (row.episode, row.sequence, row.shot, task)
+        groups.setdefault(key, []).append(row)
+    return list(groups.values())
+
+
+def pick_main_preview(preview_dicts):
+    # preview_dicts: [(path, preview_dict), ...] in table order.
+    # A movie wins over a still, otherwise the first row wins.
+    for path, preview_dict in preview_dicts:
+        if os.path.splitext(path)[1].lower() in (".mov", ".mp4"):
+            return preview_dict
+    return preview_dicts[0][1]
+
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+def is_retryable_error(exc):
+    # Connection problems, timeouts, throttling (429) and server errors (5xx)
+    # are worth another try, everything else is a real error. Decided on
+    # the exception type or the status code of the response, never on the
+    # message: a file or shot name can hold any number.
+    server_error = getattr(gazu.exception, "ServerErrorException", ())
+    if isinstance(exc, (ConnectionError, TimeoutError, server_error)):
+        return True
+    if isinstance(exc, (requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout,
+                        requests.exceptions.ChunkedEncodingError)):
+        return True
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) in RETRYABLE_STATUS
+
+
+def backoff_delay(attempt, base=1.0, maximum=30.0):
+    # Full jitter: keeps parallel workers from retrying in lockstep
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+def recent_comment(task, status, person, since, client=None):
+    # The comment a failed add_comment may still have created: same author
+    # and status, no text, posted after the call started. Newest first.
+    host = {} if client is None else {"client": client}
+    for comment in gazu.task.all_comments_for_task(task, **host):
+        try:
+            created = datetime.fromisoformat(comment["created_at"]).replace(tzinfo=None)
+        except (KeyError, TypeError, ValueError):
+            continue
+        if (created >= since and not comment.get("text")
+                and comment.get("task_status_id") == status["id"]
+                and (person is None or comment.get("person_id") == person["id"])):
+            return comment
+    return None
+
+
+def unclaimed_preview(comment, claimed, client=None):
+    # A preview a failed create_preview may still have added to the
+    # comment, that no upload of this run has used yet
+    host = {} if client is None else {"client": client}
+    comment = gazu.client.fetch_one("comments", comment["id"], **host)
+    for preview in (comment or {}).get("previews", []):
+        preview_id = preview["id"] if isinstance(preview, dict) else preview
+        if preview_id not in claimed:
+            return {"id": preview_id}
+    return None
+
+
+def add_comment_once(call, task, status, person):
+    # add_comment is a POST: before it is sent again, look for the comment
+    # the failed attempt may have left. The server clock may be a bit off.
+    since = datetime.utcnow() - timedelta(minutes=1)
+    return call(gazu.task.add_comment, task, status, "", person,
+                recover=functools.partial(recent_comment, task, status, person, since))
+
+
+class MainWindow(QMainWindow, Ui_MainWindow):
+    def __init__(self, headless=False):
+        QMainWindow.__init__(self)
+        self.setupUi(self)
+        self.connectEvents()
+        self.general_path()
+        # The initial job queue status of the host is true
+        self.RQ = 1
+        self.threadpool = QThreadPool()
+        self.max_threads_count = MAX_UPLOAD_THREADS
+        self.max_threads_value.setText(str(self.max_threads_count))
+        # Set thread count to 1 so only one shot is synced
+        self.threadpool.setMaxThreadCount(1)
+        self.le_threads.setText("1")
+        # Control plane: short interactive work, sized apart from the uploads
+        self.control_pool = QThreadPool()
+        self.control_pool.setMaxThreadCount(max(1, self.config_value("Control", "threads", 3, int)))
+        self.le_threads.setValidator(QIntValidator(1, self.max_threads_count, self))
+        self.completed_tasks = 0
+        self.total_tasks = 0
+        self.progress_lock = threading.Lock()
+        self.ui_bus = UiUpdateBus(self)
+        # Publish queue: jobs share the upload pool, the timer keeps it fed
+        self.publish_jobs = []
+        self.jobs_in_flight = 0
+        self.queue_running = False
+        self.last_fetch_settings = None
+        self.task_type_dict_list = []
+        self.task_rule_list = []
+        self.shot_id_list = []
+        self.job_timer = QTimer(self)
+        self.job_timer.setInterval(500)
+        self.job_timer.timeout.connect(self.pump_job_queue)
+        self.pb_add_job.clicked.connect(self.add_job)
+        self.pb_job_up.clicked.connect(lambda: self.move_job(-1))
+        self.pb_job_down.clicked.connect(lambda: self.move_job(1))
+        self.pb_job_pause.clicked.connect(self.toggle_job_pause)
+        self.pb_job_remove.clicked.connect(self.remove_job)
+        self.pb_run_queue.clicked.connect(self.toggle_job_queue)
+        self.pb_save_snapshot.clicked.connect(self.save_snapshot)
+        self.pb_load_snapshot.clicked.connect(self.load_snapshot)
+        self.pb_share_export.clicked.connect(self.export_shared_queue)
+        self.pb_share_work.clicked.connect(self.work_shared_queue)
+        self.pb_watch.clicked.connect(self.watch_folder)
+        self.l_ep.setVisible(True)
+        self.le_ep.setVisible(True)
+        self.le_delimiter.setText("_")
+        self.le_ep.setText("1")
+        self.le_sq.setText("2")
+        self.le_sh.setText("3")
+        self.le_ta.setText("4")
+        self.tv_information.setColumnHidden(2, False)
+        self.nb_frame = 0
+        self.newTaskItem_index = 0
+        self.pb_refresh.clicked.connect(lambda: self.refresh_project_list())
+        self.pb_tips.clicked.connect(lambda: self.open_file("Tips for rule definition.txt", path_chosen=0))
+        self.pb_logs.clicked.connect(lambda: self.open_file("Publish_log.txt", path_chosen=1))
+        self.cb_project.currentIndexChanged.connect(self.on_project_changed)
+        self.le_threads.textChanged.connect(self.update_thread_count)
+        self.concurrency = AdaptiveConcurrency(self.threadpool)
+        # Read on the GUI thread only, the upload threads use the value
+        self.retries = self.config_value("Publish", "retries", 5, int)
+        self.session = KitsuSession(
+            reference_ttl=self.config_value("Login", "reference_ttl_minutes", 15, float) * 60,
+            cache_dir=self.config_path)
+        self.shown_reference = None
+        self.rate_limiter = TokenBucket(0)
+        self.processing_monitor = None
+        self.le_backlog.setValidator(QIntValidator(1, 10000, self))
+        self.processing_timer = QTimer(self)
+        self.processing_timer.timeout.connect(self.update_processing_counts)
+        self.cancel_token = CancelToken()
+        self.run_stats = {"started": time.monotonic(), "bytes": 0, "calls": 0}
+        self.mirror_targets = []
+        self.memory_monitor = None
+        self.cancel_timer = QTimer(self)
+        self.cancel_timer.setInterval(200)
+        self.cancel_timer.timeout.connect(self.finish_cancel)
+        # Live rule preview: debounced, evaluated on its own single thread
+        # against cached file names and a cached shot index, the
+        # {(episode, sequence, shot): shot id} of the project
+        self.rule_sample = []
+        self.shot_index = None
+        self.match_index = None
+        self.task_type_names = set()
+        self.rule_preview_generation = 0
+        self.preview_pool = QThreadPool()
+        self.preview_pool.setMaxThreadCount(1)
+        # The shot index (network) and the sample scan (disk) load apart, so
+        # a rule edit never waits behind them
+        self.preview_data_pool = QThreadPool()
+        self.preview_data_pool.setMaxThreadCount(2)
+        # Fetch shards are resolved in parallel, bound by the server latency
+        # and by cv2 probing, which both leave the GIL
+        self.fetch_pool = QThreadPool()
+        self.fetch_pool.setMaxThreadCount(
+            self.config_value("Fetch", "threads", min(16, 2 * (os.cpu_count() or 2)), int))
+        self.rule_preview_timer = QTimer(self)
+        self.rule_preview_timer.setSingleShot(True)
+        self.rule_preview_timer.setInterval(250)
+        self.rule_preview_timer.timeout.connect(self.run_rule_preview)
+        for rule_edit in (self.le_delimiter, self.le_ep, self.le_sq, self.le_sh, self.le_ta):
+            rule_edit.textChanged.connect(self.schedule_rule_preview)
+        self.cb_use_folder.toggled.connect(self.schedule_rule_preview)
+        self.le_pattern.textChanged.connect(self.schedule_rule_preview)
+        self.cb_full_path.toggled.connect(self.schedule_rule_preview)
+        self.cb_pattern.toggled.connect(self.toggle_pattern_mode)
+        self.cb_live_preview.toggled.connect(self.toggle_rule_preview)
+        self.le_infopath.editingFinished.connect(self.refresh_rule_sample)
+        self.le_depth.setValidator(QIntValidator(0, 1000, self))
+        self.le_include.setText(self.config_value("Fetch", "include", ""))
+        self.le_exclude.setText(self.config_value("Fetch", "exclude", ""))
+        max_depth = self.config_value("Fetch", "max_depth", 0, int)
+        self.le_depth.setText(str(max_depth) if max_depth else "")
+        self.cb_latest_version.setChecked(self.config_value("Fetch", "latest_only", 1, int) == 1)
+        for scan_edit in (self.le_include, self.le_exclude, self.le_depth):
+            scan_edit.editingFinished.connect(self.refresh_rule_sample)
+        self.le_rate.setValidator(QIntValidator(0, 1000, self))
+        self.cb_adaptive.setChecked(True)
+        # Thumbnails: only the rows in view are decoded, on their own pool
+        self.cb_memory.setChecked(self.config_value("Memory", "trace", 0, int) == 1)
+        self.thumbnails = ThumbnailCache(
+            os.path.join(self.config_path, "thumbnails"),
+            max_bytes=self.config_value("Thumbnails", "memory_mb", 16, float) * (1 << 20),
+            max_disk_bytes=self.config_value("Thumbnails", "disk_mb", 256, float) * (1 << 20))
+        self.thumbnail_pool = QThreadPool()
+        self.thumbnail_pool.setMaxThreadCount(2)
+        self.thumbnail_rows = set()
+        self.thumbnail_pending = {}  # path: decode worker
+        self.row_height = self.tv_information.verticalHeader().defaultSectionSize()
+        self.thumbnail_timer = QTimer(self)
+        self.thumbnail_timer.setSingleShot(True)
+        self.thumbnail_timer.setInterval(100)
+        self.thumbnail_timer.timeout.connect(self.load_visible_thumbnails)
+        self.tv_information.verticalScrollBar().valueChanged.connect(self.thumbnail_timer.start)
+        self.tv_information.verticalScrollBar().rangeChanged.connect(self.thumbnail_timer.start)
+        self.cb_thumbnails.setChecked(self.config_value("Thumbnails", "enabled", 1, int) == 1)
+        self.toggle_thumbnails(self.cb_thumbnails.isChecked())
+        self.cb_thumbnails.toggled.connect(self.toggle_thumbnails)
+        self.cb_thumbnails.toggled.connect(
+            lambda enabled: self.set_config_value("Thumbnails", "enabled", int(enabled)))
+        
+        if not os.path.exists(self.key_file_path):
+            self.generate_key()
+
+        self.log_run = None
+        self.logger = PublishLogger(
+            self.log_file_path, self.jsonl_log_path,
+            max_bytes=self.config_value("Log", "max_size_mb", 5, float) * (1 << 20),
+            max_age=self.config_value("Log", "max_age_days", 30, float) * 86400,
+            backups=self.config_value("Log", "backups", 5, int))
+
+        # Auto login
+        self.load_config(login=not headless)
+
+        self.cb_subfolders.setEnabled(True)
+        self.rb_doXML.setEnabled(False)
+        self.rb_doFolder.setChecked(True)
+        self.cb_reupload.setChecked(True)
+
+        self.l_info.setText("")
+        self.le_rate.setText(str(self.config_value("Publish", "rate", 20, int)))
+        self.update_mirror_label()
+        self.cb_mirrors.setChecked(self.cb_mirrors.isEnabled()
+                                   and self.config_value("Publish", "mirrors", 0, int) == 1)
+        self.le_backlog.setText(str(self.config_value("Publish", "max_processing", 20, int)))
+        self.l_processing.setText("")
+        self.l_gazuversion.setText(gazu.__version__)
+        self.l_appversion.setText(version)
+        self.isTransfering = False
+        self.cancelTransfer = False
+        self.numberOfShots = 0
+        appIcon = QIcon("kitsu.png")
+        self.setWindowIcon(appIcon)
+        if not headless:
+            self.show()
+
+    @property
+    def cancelTransfer(self):
+        return self.cancel_token.cancelled
+
+    @cancelTransfer.setter
+    def cancelTransfer(self, cancel):
+        # True cancels the current run, False starts a new one
+        if cancel:
+            self.cancel_token.cancel()
+        else:
+            self.cancel_token = CancelToken()
+
+    def update_thread_count(self):
+        user_input = self.le_threads.text()
+        thread_count = 1
+        if user_input:
+            thread_count = int(user_input)
+            if thread_count <= 0:
+                thread_count = 1
+            elif thread_count > self.max_threads_count:
+                thread_count = self.max_threads_count
+        else:
+            thread_count = 1
+        self.threadpool.setMaxThreadCount(thread_count)
+        self.le_threads.setText(str(thread_count))
+
+    def __keyPressEvent(self, event):
+        if event.matches(QKeySequence.Delete):
+            self.__removeServer()
+        else:
+            QTableWidget.keyPressEvent(self.setup.serverTable, event)
+
+    def __removeServer(self):
+        self.tv_information.removeRow(
+            self.tv_information.currentRow()
+        )
+
+    def connectEvents(self):
+        self.pb_login.clicked.connect(
+            lambda: self.login(refresh=True)
+        )
+        self.rb_doXML.toggled.connect(
+            lambda: self.radioSwitch(self.rb_doXML)
+        )
+        self.rb_doFolder.toggled.connect(
+            lambda: self.radioSwitch(self.rb_doFolder)
+        )
+        self.rb_doManifest.toggled.connect(
+            lambda: self.radioSwitch(self.rb_doManifest)
+        )
+        self.pb_pick.clicked.connect(self.pick)
+        self.pb_fetch.clicked.connect(self.fetch)
+        self.pb_publish.clicked.connect(self.publish)
+        self.pb_dry_run.clicked.connect(self.dry_run)
+        self.pb_add_mirror.clicked.connect(self.add_mirror)
+        self.tv_information.keyPressEvent = self.__keyPressEvent
+        self.tv_information.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tv_information.customContextMenuRequested.connect(self.show_row_suggestions)
+
+    def login(self, refresh=False):
+        self.pb_login.setText("...Logging in...")
+        self.l_info.setText("Logging in")
+        worker = Worker(self.login_kitsu, refresh,
+                        self.le_kitsuURL.text(),
+                        self.le_username.text(),
+                        self.le_password.text())
+        worker.signals.result.connect(self.login_result)
+
+        # Execute
+        self.control_pool.start(worker, CONTROL_PRIORITY_LOGIN)
+
+    def login_result(self, success):
+        self.pb_login.setText("Log in")
+        if isinstance(success, dict):
+            self.show_reference_data(success)
+            self.l_info.setText("Logged in")
+            self.save_config()
+        elif success is False:
+            return  # Already logged in
+        else:
+            self.l_info.setText("Failed to login")
+            printMessage(success)
+
+        if self.RQ == 0:
+            # Without the job queue previews are processed during the upload
+            self.cb_backpressure.setChecked(False)
+            self.cb_backpressure.setEnabled(False)
+            self.le_threads.setText("1")
+            self.le_threads.setEnabled(False)
+            self.l_max_threads.setText("# Enabling job queue is needed | <span style='font-size: 8.8pt;'>需要启用 job queue</ span>")
+            self.max_threads_value.setVisible(False)
+        else:
+            self.cb_backpressure.setEnabled(True)
+            self.le_threads.setEnabled(True)
+            self.l_max_threads.setText("# Max input value | <span style='font-size: 8.8pt;'>最大允许输入</ span>")
+            self.max_threads_value.setVisible(True)
+
+    def login_kitsu(self, refresh, host, username, password, progress_callback):
+        # Runs on a worker thread: only talks to Kitsu, the widgets are
+        # filled by login_result on the GUI thread.
+        # The session only logs in again when needed and the reference
+        # lists are only reloaded when refresh is asked or they are stale.
+        try:
+            new_login = self.session.ensure(host, username, password)
+        except Exception as exc:
+            template = "An exception of type {0} occurred. Arguments:\n{1!r}"
+            message = template.format(type(exc).__name__, exc.args)
+            return message
+        if new_login is False and refresh is False:
+            return False  # Already logged in
+        self.RQ = 1 if self.session.job_queue_up else 0
+
+        # Logged in. Let's fetch the projects, the task types and the statuses!
+        try:
+            return dict(self.session.reference_data(force=refresh and not new_login))
+        except Exception as exc:
+            template = "An exception of type {0} occurred. Arguments:\n{1!r}"
+            message = template.format(type(exc).__name__, exc.args)
+            return message
+
+    def show_reference_data(self, reference):
+        # The cached lists are shown at startup, the revalidated ones only
+        # replace them when something changed. The selection is kept.
+        if reference == self.shown_reference:
+            return
+        project = self.cb_project.currentText()
+        task = self.cb_task.currentText()
+        status = self.cb_status.currentText()
+        self.fill_project_list(reference["projects"])
+        self.fill_task_types(reference["task_types"])
+        self.fill_task_statuses(reference["task_statuses"])
+        self.shown_reference = reference
+        self.cb_project.setCurrentIndex(max(self.cb_project.findText(project), 0))
+        self.cb_task.setEnabled(False)
+        task_index = self.cb_task.findText(task)
+        self.cb_task.setCurrentIndex(task_index if task_index >= 0 else self.newTaskItem_index)
+        self.cb_status.setCurrentIndex(max(self.cb_status.findText(status), 0))
+
+    def refresh_project_list(self):
+        self.l_info.setText("Refreshing the project list")
+        worker = Worker(self.reload_reference_data)
+        worker.signals.result.connect(self.reference_data_result)
+        self.control_pool.start(worker, CONTROL_PRIORITY_LOGIN)
+
+    def reload_reference_data(self, progress_callback):
+        try:
+            return dict(self.session.reference_data(force=True))
+        except Exception as exc:
+            template = "An exception of type {0} occurred. Arguments:\n{1!r}"
+            message = template.format(type(exc).__name__, exc.args)
+            return message
+
+    def reference_data_result(self, reference):
+        if isinstance(reference, dict):
+            self.show_reference_data(reference)
+            self.l_info.setText("Project list refreshed | 项目列表已更新")
+        else:
+            self.l_info.setText("Failed to refresh the project list")
+            printMessage(reference)
+
+    def fill_project_list(self, projects):
+        self.cb_project.setEnabled(True)
+        self.l_project.setEnabled(True)
+        self.cb_project.clear()
+        for index, project in enumerate(projects):
+            self.cb_project.insertItem(
+                index,
+                project["name"],
+                userData=project
+            )
+
+    def fill_task_types(self, task_types):
+        self.cb_task.setEnabled(True)
+        self.l_task.setEnabled(True)
+        self.cb_task.clear()
+        self.task_type_names = set(task_type["name"].lower() for task_type in task_types
+                                   if task_type["for_entity"] == "Shot")
+        for index, task_type in enumerate(task_types):
+            if task_type["for_entity"] == "Shot":   # Fixed to align with API changes.
+                self.cb_task.insertItem(
+                    index,
+                    task_type["name"],
+                    userData=task_type
+                )
+        self.cb_task.insertItem(
+            0,
+            "Don't post | 不上传",
+            self.cb_task.itemData(1)
+        )
+        self.newTaskItem_index = self.cb_task.count()
+        self.cb_task.insertItem(
+            self.newTaskItem_index,
+            "There's no preview with a null task name | 没有空任务字段的预览",
+            self.cb_task.itemData(1)
+            )
+
+    def fill_task_statuses(self, task_statuses):
+        self.cb_status.setEnabled(True)
+        self.l_status.setEnabled(True)
+        self.cb_status.clear()
+        for index, task_status in enumerate(task_statuses):
+            self.cb_status.insertItem(
+                index,
+                task_status["name"],
+                userData=task_status
+            )
+
+    def on_project_changed(self):
+        current_project_name = self.cb_project.currentText()
+        self.shot_index = None
+        if self.cb_live_preview.isChecked():
+            self.refresh_shot_index()
+
+        # The project list already holds the production type, no request needed
+        current_project_dict = self.cb_project.currentData()
+        if current_project_name and current_project_dict:
+            if current_project_dict.get("production_type") != "tvshow":
+                self.l_ep.setVisible(False)
+                self.le_ep.setText("1")
+                self.le_ep.setVisible(False)
+                self.tv_information.setColumnHidden(2, True)
+                self.has_episode = 0
+            else:
+                self.l_ep.setVisible(True)
+                self.le_ep.setVisible(True)
+                self.tv_information.setColumnHidden(2, False)
+                self.has_episode = 1
+
+    def radioSwitch(self, switch):
+        if switch == self.rb_doXML or switch == self.rb_doManifest:
+            self.cb_subfolders.setEnabled(False)
+        else:
+            self.cb_subfolders.setEnabled(True)
+        self.le_infopath.setText("")
+
+    def pick(self):
+        if self.rb_doXML.isChecked() is True:  # If pick XML file
+            fname = QFileDialog.getOpenFileName(self,
+                                                'Pick XML File',
+                                                self.le_infopath.text(),
+                                                filter="XML files (*.xml)")
+            fname = fname[0]
+        elif self.rb_doManifest.isChecked() is True:  # If pick CSV/EDL manifest
+            fname = QFileDialog.getOpenFileName(self,
+                                                'Pick CSV/EDL Manifest',
+                                                self.le_infopath.text(),
+                                                filter="Manifests (*.csv *.edl)")
+            fname = fname[0]
+        else:  # If pick folder
+            fname = QFileDialog.getExistingDirectory(self,
+                                                     'Select a folder',
+                                                     self.le_infopath.text(),
+                                                     options=QFileDialog.ShowDirsOnly)
+        if fname != "":
             self.le_infopath.setText(os.path.abspath(fname))
+            self.refresh_rule_sample()
+
+    def toggle_rule_preview(self, enabled):
+        self.tw_rule_preview.setVisible(enabled)
+        self.l_preview_summary.setText("")
+        if enabled:
+            if not self.rule_sample:
+                self.refresh_rule_sample()
+            if self.shot_index is None:
+                self.refresh_shot_index()
+            self.schedule_rule_preview()
+
+    def refresh_rule_sample(self):
+        # Scanning only happens when the path changes, never per keystroke
+        if not self.cb_live_preview.isChecked() or not self.rb_doFolder.isChecked():
+            return
+        worker = Worker(sample_files, os.path.abspath(self.le_infopath.text()),
+                        ACCEPTED_EXTENSIONS, self.cb_subfolders.isChecked(), RULE_PREVIEW_SAMPLE,
+                        ScanFilter(*self.scan_settings()))
+        worker.signals.result.connect(self.rule_sample_result)
+        self.preview_data_pool.start(worker)
+
+    def scan_settings(self):
+        # (include, exclude, max depth) as typed in the scan row
+        return (self.le_include.text().strip(), self.le_exclude.text().strip(),
+                int(self.le_depth.text() or 0))
+
+    def rule_sample_result(self, files):
+        self.rule_sample = files
+        self.schedule_rule_preview()
+
+    def refresh_shot_index(self):
+        project = self.cb_project.currentData()
+        if project is None or not self.session.logged_in:
+            return
+        worker = Worker(self.fetch_shot_index, project)
+        worker.signals.result.connect(self.shot_index_result)
+        self.preview_data_pool.start(worker)
+
+    def fetch_shot_index(self, project, progress_callback):
+        try:
+            return project["id"], self.project_shot_ids(project)
+        except Exception:
+            return None
+
+    def shot_index_result(self, result):
+        project = self.cb_project.currentData()
+        if result is None or project is None or result[0] != project["id"]:
+            return  # Failed, or the project changed in the meantime
+        self.shot_index = result[1]
+        self.match_index = ShotMatchIndex(self.shot_index)
+        self.schedule_rule_preview()
+
+    def schedule_rule_preview(self):
+        if self.cb_live_preview.isChecked():
+            self.rule_preview_timer.start()
+
+    def run_rule_preview(self):
+        self.rule_preview_generation += 1
+        rules = (self.le_delimiter.text() or "_",
+                 self.le_ep.text() or "1",
+                 self.le_sq.text() or "2",
+                 self.le_sh.text() or "3",
+                 self.le_ta.text() or "4",
+                 self.cb_use_folder.isChecked(),
+                 self.le_pattern.text() if self.cb_pattern.isChecked() else None,
+                 self.cb_full_path.isChecked())
+        worker = Worker(self.evaluate_rule_preview, self.rule_preview_generation, rules,
+                        list(self.rule_sample), self.shot_index, self.task_type_names,
+                        getattr(self, "has_episode", 1))
+        worker.signals.result.connect(self.rule_preview_result)
+        self.preview_pool.start(worker)
+
+    def evaluate_rule_preview(self, generation, rules, sample, shot_index, task_type_names,
+                              has_episode, progress_callback):
+        delimiter, ep_input, sq_input, sh_input, ta_input, use_folder, pattern, full_path = rules
+        compiled_pattern = None
+        if pattern:
+            try:
+                compiled_pattern = compile_name_pattern(pattern)
+            except re.error as exc:
+                return generation, [("❗" + str(exc), "", "", "", "", "")]
+        results = []
+        for file in sample:
+            if compiled_pattern is not None:
+                fields = match_name_pattern(compiled_pattern, file, full_path)
+                if fields is None:
+                    results.append((os.path.basename(file), "", "", "", "", "No match"))
+                    continue
+                episode_rule = fields["ep"] if has_episode == 1 else ""
+                sequence_rule = fields["sq"]
+                shot_rule = fields["shot"]
+                task_rule = fields["task"]
+            else:
+                namesplit = split_name(file, delimiter, use_folder)
+                episode_rule = self.process_rule(ep_input, namesplit, None) if has_episode == 1 else ""
+                sequence_rule = self.process_rule(sq_input, namesplit, None)
+                shot_rule = self.process_rule(sh_input, namesplit, None)
+                task_rule = self.process_rule(ta_input, namesplit, None)
+            if task_type_names and task_rule.lower() not in task_type_names:
+                task_rule = "null"
+            if shot_index is None:
+                exists = "?"
+            elif (episode_rule, sequence_rule, shot_rule) in shot_index:
+                exists = "Yes"
+            else:
+                exists = "No"
+            results.append((os.path.basename(file), episode_rule, sequence_rule,
+                            shot_rule, task_rule, exists))
+        return generation, results
+
+    def rule_preview_result(self, result):
+        generation, results = result
+        if generation != self.rule_preview_generation:
+            return  # The rules changed again, a newer preview is on its way
+        self.tw_rule_preview.setRowCount(len(results))
+        for row, values in enumerate(results):
+            for column, value in enumerate(values):
+                self.tw_rule_preview.setItem(row, column, QTableWidgetItem(value))
+        self.tw_rule_preview.resizeColumnsToContents()
+        matches = sum(1 for values in results if values[5] == "Yes")
+        if self.shot_index is None:
+            self.l_preview_summary.setText("{} sample files".format(len(results)))
+        else:
+            self.l_preview_summary.setText(
+                "{} / {} sample files match a Kitsu shot".format(matches, len(results)))
+
+    def toggle_pattern_mode(self, enabled):
+        for rule_widget in (self.cb_use_folder, self.le_delimiter, self.le_ep,
+                            self.le_sq, self.le_sh, self.le_ta):
+            rule_widget.setEnabled(not enabled)
+        self.le_pattern.setEnabled(enabled)
+        self.cb_full_path.setEnabled(enabled)
+        self.schedule_rule_preview()
+
+    def parse_rule_indices(self, input_str):
+        try:
+            return [int(i) - 1 for i in input_str.split('+') if i]
+
+        except ValueError:
+            return [0]
+
+    def process_rule_part(self, rule_input, namesplit):
+        parts = rule_input.split(",")
+        base_rule = parts[0].strip()
+        adv_rules = parts[1:]
+
+        parts = []
+        for idx in [int(i) - 1 for i in base_rule.split('+')]:
+            if 0 <= idx < len(namesplit):
+                parts.append(namesplit[idx])
+            else:
+                parts.append("❗out of range")
+        result = "_".join(parts)
+
+        for adv_rule in adv_rules:
+            adv_rule = adv_rule.strip()
+            if adv_rule.startswith('+'):
+                result += adv_rule[1:]
+            elif adv_rule.endswith('+'):
+                result = adv_rule[:-1] + result
+            elif adv_rule.startswith('-'):
+                remove_str = adv_rule[1:]
+                if remove_str:
+                    result = re.sub(r'{}$'.format(re.escape(remove_str)), "", result)
+            elif adv_rule.endswith('-'):
+                remove_str = adv_rule[:-1]
+                if remove_str:
+                    if result.startswith(remove_str):
+                        result = result[len(remove_str):]
+            elif ":" in adv_rule:
+                find, replace = adv_rule.split(":")
+                result = result.replace(find, replace)
+
+        return result
+
+    def process_rule(self, rule_input, namesplit, indices):
+        if "," not in rule_input:
+            rule_input = rule_input + ", : "
+            
+        if "&" in rule_input:
+            rule_parts = rule_input.split("&")
+            results = []
+            
+            for part in rule_parts:
+                result = self.process_rule_part(part.strip(), namesplit)
+                results.append(result)
+
+            return "_".join(results)
+    
+        else:
+            return self.process_rule_part(rule_input, namesplit)
+
+    def fetch(self):
+        self.pb_fetch.setText("...Fetching...")
+        self.progressBar.setValue(0)
+        self.l_info.setText("Fetching information")
+        self.drop_thumbnail_decodes(set())
+        self.thumbnail_rows = set()
+        # Back to full speed if an earlier run went over the memory budget
+        self.fetch_pool.setMaxThreadCount(
+            self.config_value("Fetch", "threads", min(16, 2 * (os.cpu_count() or 2)), int))
+
+        settings = self.fetch_settings()
+        self.last_fetch_settings = settings
+        if self.cb_stream.isChecked():
+            if self.isTransfering is True or not self.confirm_publish():
+                self.pb_fetch.setText("Fetch")
+                self.l_info.setText("")
+                return
+            self.cancelTransfer = False
+            self.start_memory("scan, resolve and upload")
+            self.prepare_upload()
+            worker = Worker(self.fetch_data, settings, self.publish_settings())
+            worker.signals.result.connect(self.stream_result)
+            # The uploads need every thread of the upload pool
+            QThreadPool.globalInstance().start(worker)
+            return
+        self.start_memory("scan and resolve")
+        worker = Worker(self.fetch_data, settings, None)
+        worker.signals.result.connect(self.fetch_result)
+
+        # Execute
+        self.control_pool.start(worker, CONTROL_PRIORITY_FETCH)
+
+    def fetch_settings(self):
+        # The workers get a frozen copy of the settings and never read widgets
+        if self.rb_doXML.isChecked() is True:
+            source = "xml"
+        elif self.rb_doManifest.isChecked() is True:
+            source = "manifest"
+        else:
+            source = "folder"
+        settings = FetchSettings(
+            path=os.path.abspath(self.le_infopath.text()),
+            source=source,
+            subfolders=self.cb_subfolders.isChecked(),
+            use_folder=self.cb_use_folder.isChecked(),
+            delimiter=self.le_delimiter.text() or "_",
+            ep=self.le_ep.text() or "1",
+            sq=self.le_sq.text() or "2",
+            sh=self.le_sh.text() or "3",
+            ta=self.le_ta.text() or "4",
+            project=self.cb_project.currentData(),
+            has_episode=getattr(self, "has_episode", 1),
+            pattern=self.le_pattern.text() if self.cb_pattern.isChecked() else None,
+            full_path=self.cb_full_path.isChecked(),
+            include=self.scan_settings()[0],
+            exclude=self.scan_settings()[1],
+            max_depth=self.scan_settings()[2],
+            latest_only=self.cb_latest_version.isChecked(),
+        )
+        self.set_config_value("Fetch", "include", settings.include)
+        self.set_config_value("Fetch", "exclude", settings.exclude)
+        self.set_config_value("Fetch", "max_depth", settings.max_depth)
+        self.set_config_value("Fetch", "latest_only", int(settings.latest_only))
+        return settings
+
+    def stream_result(self, nr_shots):
+        self.fetch_result(nr_shots)
+        self.concurrency.reset(1, 1, 1, enabled=False)
+        self.update_thread_count()
+        self.isTransfering = False
+        self.pb_publish.setText("Publish")
+        if not self.cancelTransfer:
+            self.record_throughput()
+        if isinstance(nr_shots, int):
+            self.l_info.setText("Fetched {} files, uploaded {} rows{}".format(
+                nr_shots, self.completed_tasks, " (canceled)" if self.cancelTransfer else ""))
+        self.show_memory_summary()
+
+    def fetch_result(self, nr_shots):
+        # Put every row posted by the worker in the table first
+        self.ui_bus.flush()
+        self.pb_fetch.setText("Fetch")
+        if not isinstance(nr_shots, (int, float, complex)):
+            self.finish_memory()
+            self.l_info.setText(
+                "Some error happend. Could not fetch information")
+            printMessage(nr_shots)  # An error happened. Print it
+            return
+        self.l_info.setText("Fetched " + str(nr_shots) + " shots")
+
+        if all('null' not in task_rule for _, task_rule in self.task_rule_list):
+            self.cb_task.setEnabled(False)
+            if self.cb_task.count() == self.newTaskItem_index:
+                self.cb_task.insertItem(
+                    self.newTaskItem_index,
+                    "There's no preview with a null task name | 没有空任务字段的预览",
+                    self.cb_task.itemData(1)
+                    )
+            self.cb_task.setCurrentText("There's no preview with a null task name | 没有空任务字段的预览")
+        else:
+            self.cb_task.setEnabled(True)
+            self.cb_task.removeItem(self.newTaskItem_index)
+            self.cb_task.setCurrentText("Don't post | 不上传")
+        self.cb_task.update()
+        self.tv_information.resizeColumnsToContents()
+        if self.isTransfering is False:  # A fetch and publish reports at its end
+            self.show_memory_summary()
+
+    def fetch_data(self, settings, publish_settings, progress_callback):
+        # With publish_settings the rows are uploaded while fetching
+        self.start_log_run()
+        self.task_rule_list = []
+        self.task_type_dict_list = []
+        self.shot_id_list = []
+        all_task_type_names = []
+
+        try:
+            self.session.ensure()
+            # The whole project in three calls, every row is resolved
+            # against it without an other request
+            shot_ids = self.project_shot_ids(settings.project)
+            self.shot_index = shot_ids
+            self.match_index = ShotMatchIndex(self.shot_index)
+            path = settings.path
+            files = FileTally(RULE_PREVIEW_SAMPLE)
+            task_types = gazu.task.all_task_types()
+            for task_type in task_types:
+                if task_type["for_entity"] == "Shot":
+                    all_task_type_names.append(task_type["name"].lower())
+
+            if settings.source == "xml":  # If pick XML file
+                return "XML isn't supported yet."
+            elif settings.source == "manifest":  # If pick CSV/EDL manifest
+                if os.path.isfile(path) is False:
+                    return "Manifest does not seem to exists.\nPlease check!"
+            else:
+                if os.path.exists(path) is False:
+                    return "Path does not seem to exists.\nPlease check!"
+
+            self.ui_bus.call(self.tv_information.setRowCount, 0)
+            entries = self.iter_fetch_entries(settings, files)
+            if publish_settings is not None:
+                self.stream_entries(settings, publish_settings, entries, task_types, all_task_type_names,
+                                    shot_ids)
+            else:
+                self.resolve_entries(settings, list(entries), task_types, all_task_type_names, shot_ids)
+            if settings.source != "manifest":
+                self.rule_sample = files.sample
+            self.memory_stage("table")
+            return len(files)
+        except Exception as exc:
+            template = "An exception of type {0} occurred. Arguments:\n{1!r}"
+            message = template.format(type(exc).__name__, exc.args)
+            return message
+
+    def project_shot_ids(self, project):
+        # {(episode, sequence, shot): shot id} of the whole project
+        return build_shot_ids(gazu.shot.all_episodes_for_project(project),
+                              gazu.shot.all_sequences_for_project(project),
+                              gazu.shot.all_shots_for_project(project))
+
+    def iter_fetch_entries(self, settings, files):
+        # Scans the source and applies the rules, one entry at a time:
+        # (file, episode, sequence, shot, task, frames, version). frames is
+        # None when the file still has to be probed, version when the name
+        # has no version token. Scanned files are added to files (a list or
+        # a FileTally).
+        path = settings.path
+
+        if settings.source == "manifest":
+            ep_indices = self.parse_rule_indices(settings.ep)
+            sq_indices = self.parse_rule_indices(settings.sq)
+            sh_indices = self.parse_rule_indices(settings.sh)
+            ta_indices = self.parse_rule_indices(settings.ta)
+            version_token = re.compile(self.config_value("Fetch", "version_regex", VERSION_TOKEN),
+                                       re.IGNORECASE)
+            fps = self.config_value("Manifest", "fps", 24, float)
+            # The manifest already names the entities, so the folder is
+            # never scanned and the files are never probed with cv2
+            for entry in read_manifest(path, fps):
+                files.append(entry["file"])
+                derived = []
+                if entry["shot"] is None:
+                    # An EDL event without a LOC: the clip is named like a
+                    # scanned file
+                    namesplit = split_name(entry["file"], settings.delimiter, settings.use_folder)
+                else:
+                    namesplit = entry["shot"].split(settings.delimiter)
+                shot_rule = entry["shot"]
+                if shot_rule is None or entry["sequence"] is None:
+                    # No sequence given: the shot is a full name the rules
+                    # cut up, the shot rule included
+                    shot_rule = self.process_rule(settings.sh, namesplit, sh_indices)
+                    derived.append(("shot", shot_rule))
+                episode_rule = entry["episode"]
+                if episode_rule is None:
+                    episode_rule = self.process_rule(settings.ep, namesplit, ep_indices)
+                    if settings.has_episode == 1:
+                        derived.append(("episode", episode_rule))
+                sequence_rule = entry["sequence"]
+                if sequence_rule is None:
+                    sequence_rule = self.process_rule(settings.sq, namesplit, sq_indices)
+                    derived.append(("sequence", sequence_rule))
+                preview_task_name = entry["task"]
+                if preview_task_name is None:
+                    preview_task_name = self.process_rule(settings.ta, namesplit, ta_indices)
+                # A task the rules can't find goes to the NULL TASK option,
+                # a shot has no such fallback
+                missing = [field for field, value in derived if "❗out of range" in value]
+                if missing:
+                    self.log_message(f"\nThe rules can't find the {', '.join(missing)} in this manifest row |"
+                                     f"\n规则无法从清单的这一行中得到字段："
+                                     f"\n{entry['shot'] or entry['file']}",
+                                     outcome="no match", file=entry["file"], missing=missing)
+                    continue
+                frames = "" if entry["frames"] is None else str(entry["frames"])
+                yield (entry["file"], episode_rule, sequence_rule, shot_rule,
+                       preview_task_name, frames, parse_version(entry["file"], version_token))
+            return
+
+        acceptedExtensions = ACCEPTED_EXTENSIONS
+        # Compiled once, applied while walking so excluded trees are skipped
+        scan_filter = ScanFilter(settings.include, settings.exclude, settings.max_depth)
+        if settings.subfolders is True:
+            scanned = iter_fast_scandir(path, acceptedExtensions, scan_filter)
+        else:
+            scanned = (entry.path for entry in os.scandir(path)
+                       if entry.is_file() and scan_filter.accept_file(entry.name, entry.name))
+        yield from self.rule_entries(settings, scanned, files)
+
+    def rule_entries(self, settings, scanned, files=None):
+        # The rules or the pattern applied to scanned files, see
+        # iter_fetch_entries. Also used by the watch for files one by one.
+        ep_indices = self.parse_rule_indices(settings.ep)
+        sq_indices = self.parse_rule_indices(settings.sq)
+        sh_indices = self.parse_rule_indices(settings.sh)
+        ta_indices = self.parse_rule_indices(settings.ta)
+        version_token = re.compile(self.config_value("Fetch", "version_regex", VERSION_TOKEN),
+                                   re.IGNORECASE)
+        acceptedExtensions = ACCEPTED_EXTENSIONS
+
+        # The pattern is compiled once for the whole fetch
+        compiled_pattern = compile_name_pattern(settings.pattern) if settings.pattern else None
+        for file in scanned:
+            if files is not None:
+                files.append(file)
+            extension = os.path.splitext(file)[1]
+            if extension in acceptedExtensions:
+                if compiled_pattern is not None:
+                    fields = match_name_pattern(compiled_pattern, file, settings.full_path)
+                    if fields is None:
+                        self.log_message(f"\nThe pattern doesn't match this file |"
+                                         f"\n规则与该文件不匹配："
+                                         f"\n{file}",
+                                         outcome="no match", file=file)
+                        continue
+                    episode_rule = fields["ep"]
+                    sequence_rule = fields["sq"]
+                    shot_rule = fields["shot"]
+                    preview_task_name = fields["task"]
+                    version = parse_version(file, version_token, fields["version"])
+                else:
+                    namesplit = split_name(file, settings.delimiter, settings.use_folder)
+
+                    episode_rule = self.process_rule(settings.ep, namesplit, ep_indices)
+                    sequence_rule = self.process_rule(settings.sq, namesplit, sq_indices)
+                    shot_rule = self.process_rule(settings.sh, namesplit, sh_indices)
+                    preview_task_name = self.process_rule(settings.ta, namesplit, ta_indices)
+                    version = parse_version(file, version_token)
+
+                # The frames are probed later, by the shard of the file
+                yield (file, episode_rule, sequence_rule, shot_rule, preview_task_name, None, version)
+
+    def stream_entries(self, settings, publish_settings, entries, task_types, all_task_type_names, shot_ids):
+        # Fetch and publish: scan -> resolve and probe -> upload. Every stage
+        # is bounded, so a slow upload holds back the resolvers, which hold
+        # back the scan, and memory stays flat whatever the delivery size.
+        resolve_queue = queue.Queue(maxsize=self.config_value("Fetch", "stream_queue", 256, int))
+        # The adaptive controller starts the pool small and grows it, the
+        # window follows the configured maximum so it never holds it back
+        upload_window = max(1, publish_settings.threads * 2)
+        upload_slots = threading.Semaphore(upload_window)
+        errors = []
+        lock = threading.Lock()
+        # Versioned rows wait until the folder above their own folder (the
+        # shot folder when versions have a folder each) is scanned and
+        # resolved. Only the latest version of a shot and task is uploaded
+        # then, the scan is depth first so the folder is never seen again.
+        regions = {}
+        released = {}
+
+        def region_of(file):
+            return os.path.dirname(os.path.dirname(os.path.abspath(file)))
+
+        def take_ready(name):
+            # Called under lock: the held rows of a finished region to upload
+            region = regions[name]
+            if region["open"] or region["pending"]:
+                return []
+            del regions[name]
+            held = region["held"]
+            superseded = self.mark_superseded([(row, key, version) for row, key, version, _, _ in held])
+            ready = []
+            for row, key, version, task_type_dict, values in sorted(held, key=lambda item: item[0]):
+                if row in superseded:
+                    continue
+                if key in released and released[key] >= version:
+                    # A later folder with an older version of a shot
+                    # already sent
+                    self.post_row_status(row, superseded_status(released[key]))
+                    continue
+                released[key] = version
+                ready.append((row, task_type_dict, values))
+            return ready
+
+        def resolved(name):
+            with lock:
+                regions[name]["pending"] -= 1
+                if errors or self.cancelTransfer is True:
+                    return
+                ready = take_ready(name)
+            for row, task_type_dict, values in ready:
+                upload(row, task_type_dict, values)
+
+        def upload(row, task_type_dict, values):
+            upload_slots.acquire()
+            with self.progress_lock:
+                self.total_tasks += 1
+            worker = Worker(self.stream_upload, [PublishRow(row, task_type_dict, *values[2:9])],
+                            publish_settings, upload_slots)
+            worker.signals.result.connect(self.thread_result)
+            self.threadpool.start(worker)
+
+        def resolver(progress_callback):
+            while True:
+                item = resolve_queue.get()
+                if item is None:
+                    return
+                try:
+                    resolve(*item)
+                finally:
+                    resolved(item[2])
+
+        def resolve(row, entry, name):
+            if errors or self.cancelTransfer is True:
+                return  # Drain the queue so the scan never blocks
+            file, episode_rule, sequence_rule, shot_rule, preview_task_name, frames, version = entry
+            try:
+                if frames is None:
+                    frames = self.probe_frames(file)
+                resolved_row = self.resolve_row(settings, row, file, episode_rule, sequence_rule,
+                                                shot_rule, preview_task_name, frames, task_types,
+                                                all_task_type_names, shot_ids)
+            except Exception as exc:
+                errors.append(exc)
+                return
+            with lock:
+                self.add_information_row(row, *resolved_row)
+            task_rule, task_type_dict, shot_id, values, _ = resolved_row
+            # Only rows that resolve cleanly go up right away, the
+            # others stay in the table for a normal publish
+            if shot_id is None or task_rule == "null" or values[8] == "Missing":
+                return
+            if settings.latest_only and version is not None:
+                with lock:
+                    regions[name]["held"].append((row, (shot_id, task_rule), version, task_type_dict, values))
+                return
+            upload(row, task_type_dict, values)
+
+        resolver_count = self.fetch_pool.maxThreadCount()
+        for _ in range(resolver_count):
+            self.fetch_pool.start(Worker(resolver))
+        try:
+            for row, entry in enumerate(entries):
+                if errors or self.cancelTransfer is True:
+                    break
+                name = region_of(entry[0])
+                path = os.path.abspath(entry[0])
+                ready = []
+                with lock:
+                    # The scan left these folders for good
+                    for other, region in list(regions.items()):
+                        if region["open"] and not path.startswith(other + os.sep):
+                            region["open"] = False
+                            ready.extend(take_ready(other))
+                    region = regions.setdefault(name, {"open": True, "pending": 0, "held": []})
+                    region["open"] = True
+                    region["pending"] += 1
+                for held in ready:
+                    upload(*held)
+                resolve_queue.put((row, entry, name))
+        finally:
+            for _ in range(resolver_count):
+                resolve_queue.put(None)
+            self.fetch_pool.waitForDone()
+            if not errors:
+                with lock:
+                    ready = []
+                    for name, region in list(regions.items()):
+                        region["open"] = False
+                        ready.extend(take_ready(name))
+                for row, task_type_dict, values in sorted(ready, key=lambda held: held[0]):
+                    if self.cancelTransfer is True:
+                        break
+                    upload(row, task_type_dict, values)
+            # Wait for the uploads still running. Uploads dropped from the
+            # pool by a cancel never give their slot back.
+            acquired = 0
+            while acquired < upload_window:
+                if upload_slots.acquire(timeout=0.2):
+                    acquired += 1
+                elif self.cancelTransfer is True and self.threadpool.activeThreadCount() == 0:
+                    break
+        for pairs in (self.task_rule_list, self.task_type_dict_list, self.shot_id_list):
+            pairs.sort(key=lambda pair: pair[0])
+        if errors:
+            raise errors[0]
+
+    def stream_upload(self, rows, settings, upload_slots, progress_callback):
+        try:
+            return self.uploadToKitsu(rows, settings, self, progress_callback)
+        finally:
+            upload_slots.release()
+
+    def resolve_entries(self, settings, entries, task_types, all_task_type_names, shot_ids):
+        # Entries of the same episode and sequence form a shard, probed and
+        # resolved by one thread of the fetch pool. Big sequences are cut in
+        # pieces to keep every thread busy. The rows are added back in the
+        # order of the entries, whatever shard finishes first.
+        shard_size = self.config_value("Fetch", "shard_size", 64, int)
+        shards = OrderedDict()
+        for row, entry in enumerate(entries):
+            shards.setdefault((entry[1], entry[2]), []).append((row, entry))
+        results = [None] * len(entries)
+        errors = []
+        progress = {"done": 0}
+        lock = threading.Lock()
+
+        def resolve_shard(shard, progress_callback):
+            try:
+                for row, (file, episode_rule, sequence_rule, shot_rule,
+                          preview_task_name, frames, _) in shard:
+                    if errors:
+                        return
+                    if frames is None:
+                        frames = self.probe_frames(file)
+                    results[row] = self.resolve_row(settings, row, file, episode_rule, sequence_rule,
+                                                    shot_rule, preview_task_name, frames, task_types,
+                                                    all_task_type_names, shot_ids)
+            except Exception as exc:
+                errors.append(exc)
+                return
+            with lock:
+                progress["done"] += len(shard)
+                done = progress["done"]
+            self.post_info("Resolved {} / {} files".format(done, len(entries)))
+
+        for shard in shards.values():
+            for start in range(0, len(shard), shard_size):
+                self.fetch_pool.start(Worker(resolve_shard, shard[start:start + shard_size]))
+        self.fetch_pool.waitForDone()
+        if errors:
+            raise errors[0]
+        if settings.latest_only:
+            superseded = self.mark_superseded(
+                [(row, (resolved[2], resolved[0]), entries[row][6])
+                 for row, resolved in enumerate(results)
+                 if resolved[2] is not None and entries[row][6] is not None], post=False)
+            for row, version in superseded.items():
+                results[row][3][0] = superseded_status(version)
+        for row, resolved in enumerate(results):
+            self.add_information_row(row, *resolved)
+
+    def mark_superseded(self, candidates, post=True):
+        # candidates: (row, (shot id, task), version). Returns {row: newest
+        # version} for every row that an other row of its shot and task
+        # supersedes. With post the status cell is updated right away.
+        latest = {}
+        for row, key, version in candidates:
+            if key not in latest or version >= latest[key][0]:
+                latest[key] = (version, row)  # Same version: the last row wins
+        superseded = {}
+        for row, key, version in candidates:
+            newest, kept_row = latest[key]
+            if kept_row != row:
+                superseded[row] = newest
+                self.log_message(f"\nSkipped, superseded by v{newest:03d} in row {kept_row + 1} |"
+                                 f"\n已跳过，已有更新的版本：row {row + 1}",
+                                 outcome="superseded", row=row, version=version)
+                if post:
+                    self.post_row_status(row, superseded_status(newest))
+        return superseded
+
+    def probe_frames(self, file):
+        vidReader = cv2.VideoCapture(file)
+        try:
+            if not vidReader.isOpened():
+                # printMessage() here may cause the program to freeze, use self.log_message() instead
+                #printMessage(
+                #    "Could not read video file")
+                self.log_message(
+                    f"\nCould not read video file |"
+                    f"\n无法读取视频文件："
+                    f"\n{file}",
+                    outcome="unreadable", file=file)
+            return str(int(vidReader.get(cv2.CAP_PROP_FRAME_COUNT)))
+        finally:
+            vidReader.release()
+
+    def resolve_row(self, settings, row, file, episode_rule, sequence_rule, shot_rule,
+                    preview_task_name, frames, task_types, all_task_type_names,
+                    shot_ids):
+        # Runs on the fetch pool: only reads shared state, the row itself is
+        # added by add_information_row once every shard is done. shot_ids
+        # is the project from project_shot_ids, no request is sent.
+        preview_task_name = preview_task_name.lower()
+        if preview_task_name in all_task_type_names:
+            for task_type in task_types:
+                task_name_match = task_type["name"].lower() == preview_task_name
+                if task_type["for_entity"] == "Shot" and task_name_match:
+                    task_rule = task_type["name"]
+                    task_type_dict = task_type
+        else:
+            task_rule = "null"
+            task_type_dict = "{'name': 'null'}"
+
+        shot_id = shot_ids.get((episode_rule if settings.has_episode == 1 else "", sequence_rule, shot_rule))
+        exists = "No" if shot_id is None else "Yes"
+
+        if os.path.isfile(file):
+            filesize = pretty_size(os.stat(file).st_size)
+        else:
+            filesize = "Missing"
+            self.log_message(f"\nPreview file does not exist |"
+                             f"\n预览文件不存在："
+                             f"\n{file}",
+                             outcome="missing", row=row, file=file)
+
+        suggestion = None
+        if exists == "No":
+            suggestions = self.match_index.suggest(
+                episode_rule if settings.has_episode == 1 else "", sequence_rule, shot_rule, limit=1)
+            if suggestions:
+                suggestion = "/".join(name for name in suggestions[0][1] if name)
+        values = ["Ready", exists, episode_rule, sequence_rule, shot_rule,
+                  task_rule, frames, file, filesize]
+        return task_rule, task_type_dict, shot_id, values, suggestion
+
+    def add_information_row(self, row, task_rule, task_type_dict, shot_id, values, suggestion):
+        # The row itself is created by the UI bus
+        self.task_rule_list.append((row, task_rule))
+        self.task_type_dict_list.append((row, task_type_dict))
+        self.shot_id_list.append((row, shot_id))
+        self.ui_bus.call(self.set_information_row, row, values)
+        if suggestion is not None:
+            self.ui_bus.call(self.set_cell_tooltip, row, 1,
+                             "Did you mean {}? Right-click for suggestions | "
+                             "右键查看建议".format(suggestion))
+
+    def set_information_row(self, row, values):
+        if self.tv_information.rowCount() <= row:
+            self.tv_information.setRowCount(row + 1)
+        for column, value in enumerate(values):
+            self.tv_information.setItem(row, column, QTableWidgetItem(value))
+        self.tv_information.item(row, 8).setTextAlignment(2)
+
+    def set_cell_text(self, row, column, text):
+        item = self.tv_information.item(row, column)
+        if item is not None:
+            item.setText(text)
+
+    def set_cell_tooltip(self, row, column, text):
+        item = self.tv_information.item(row, column)
+        if item is not None:
+            item.setToolTip(text)
+
+    def show_row_suggestions(self, position):
+        row = self.tv_information.rowAt(position.y())
+        exists = self.tv_information.item(row, 1) if row >= 0 else None
+        if exists is None or exists.text() != "No" or self.match_index is None:
+            return
+        episode, sequence, shot = [self.tv_information.item(row, column).text() for column in (2, 3, 4)]
+        if getattr(self, "has_episode", 1) != 1:
+            episode = ""
+        menu = QMenu(self)
+        for score, names in self.match_index.suggest(episode, sequence, shot):
+            action = menu.addAction("{}  ({:.0%})".format("/".join(name for name in names if name), score))
+            action.triggered.connect(lambda checked=False, names=names: self.accept_suggestion(row, names))
+        if menu.isEmpty():
+            menu.addAction("No suggestions | 没有建议").setEnabled(False)
+        menu.exec_(self.tv_information.viewport().mapToGlobal(position))
+
+    def accept_suggestion(self, row, names):
+        episode, sequence, shot = names
+        if getattr(self, "has_episode", 1) == 1:
+            self.set_cell_text(row, 2, episode)
+        self.set_cell_text(row, 3, sequence)
+        self.set_cell_text(row, 4, shot)
+        self.set_cell_text(row, 1, "Yes")
+        self.set_cell_tooltip(row, 1, "")
+        # Snapshots and dry runs read the shot id, not the cells
+        shot_id = (self.shot_index or {}).get(names)
+        for index, (shot_row, _) in enumerate(self.shot_id_list):
+            if shot_row == row:
+                self.shot_id_list[index] = (row, shot_id)
+                break
+
+    def toggle_thumbnails(self, enabled):
+        self.tv_information.setColumnHidden(THUMBNAIL_COLUMN, not enabled)
+        if enabled:
+            self.tv_information.setIconSize(QSize(self.thumbnails.height * 2, self.thumbnails.height))
+            self.tv_information.verticalHeader().setDefaultSectionSize(
+                max(self.row_height, self.thumbnails.height + 4))
+            self.thumbnail_timer.start()
+        else:
+            self.drop_thumbnail_decodes(set())
+            self.drop_thumbnails(set())
+            self.tv_information.verticalHeader().setDefaultSectionSize(self.row_height)
+
+    def drop_thumbnails(self, keep_rows):
+        # The pixmaps of rows out of view are freed, the cache keeps the data
+        for row in self.thumbnail_rows - keep_rows:
+            self.tv_information.takeItem(row, THUMBNAIL_COLUMN)
+        self.thumbnail_rows &= keep_rows
+
+    def load_visible_thumbnails(self):
+        if not self.cb_thumbnails.isChecked():
+            return
+        table = self.tv_information
+        first = table.rowAt(0)
+        if first < 0:
+            return
+        last = table.rowAt(table.viewport().height() - 1)
+        if last < 0:
+            last = table.rowCount() - 1
+        visible = set(range(first, last + 1))
+        self.drop_thumbnails(visible)
+        # Decodes still waiting for rows scrolled away are not needed anymore
+        self.drop_thumbnail_decodes({table.item(row, 7).text() for row in visible
+                                     if table.item(row, 7) is not None})
+        for row in range(first, last + 1):
+            if table.item(row, THUMBNAIL_COLUMN) is not None:
+                continue
+            item = table.item(row, 7)
+            if item is None or not item.text():
+                continue
+            path = item.text()
+            data = self.thumbnails.cached(path)
+            if data is not None:
+                self.set_thumbnail(row, data)
+            elif path not in self.thumbnail_pending:
+                worker = Worker(self.decode_thumbnail, path)
+                worker.signals.result.connect(self.thumbnail_result)
+                self.thumbnail_pending[path] = worker
+                self.thumbnail_pool.start(worker)
+
+    def drop_thumbnail_decodes(self, keep_paths):
+        # Only the decodes taken back before they started are forgotten, the
+        # running ones stay pending until their result so they aren't started
+        # twice
+        for path, worker in list(self.thumbnail_pending.items()):
+            if path not in keep_paths and self.thumbnail_pool.tryTake(worker):
+                del self.thumbnail_pending[path]
+
+    def decode_thumbnail(self, path, progress_callback):
+        # Decoding must never slow down the uploads or the interface
+        QThread.currentThread().setPriority(QThread.LowestPriority)
+        return path, self.thumbnails.load(path)
+
+    def thumbnail_result(self, result):
+        path, data = result
+        self.thumbnail_pending.pop(path, None)
+        if data:
+            # The next pass takes it from the memory cache for the rows
+            # still in view
+            self.thumbnail_timer.start()
+
+    def set_thumbnail(self, row, data):
+        item = QTableWidgetItem()
+        if data:
+            pixmap = QPixmap()
+            pixmap.loadFromData(data, "JPG")
+            item.setData(Qt.DecorationRole, pixmap)
+        self.tv_information.setItem(row, THUMBNAIL_COLUMN, item)
+        self.thumbnail_rows.add(row)
+
+    def save_snapshot(self):
+        if not self.task_type_dict_list or self.last_fetch_settings is None:
+            printMessage("Fetch some previews first | 请先获取预览文件")
+            return
+        fname, selected_filter = QFileDialog.getSaveFileName(
+            self, 'Save fetch', self.le_infopath.text(),
+            filter="Kitsu Publisher fetch (*.kps);;CSV (*.csv)")
+        if fname == "":
+            return
+        self.ui_bus.flush()
+        snapshot = self.build_snapshot()
+        try:
+            if selected_filter.startswith("CSV") or fname.lower().endswith(".csv"):
+                write_snapshot_csv(fname, snapshot)
+            else:
+                write_snapshot(fname, snapshot)
+        except OSError as exc:
+            printMessage("Could not save the fetch | 无法保存\n{}".format(exc))
+            return
+        self.l_info.setText("Saved {} rows to {}".format(len(snapshot["shot_ids"]), fname))
+
+    def build_snapshot(self):
+        # The table as it is now, including accepted suggestions
+        shot_ids = dict(self.shot_id_list)
+        columns = dict((name, []) for name in SNAPSHOT_COLUMNS)
+        task_types = []
+        task_type_index = []
+        for i, task_type_dict in self.task_type_dict_list:
+            for column, name in enumerate(SNAPSHOT_COLUMNS):
+                columns[name].append(self.tv_information.item(i, column).text())
+            # Task types repeat on every row, store each one once
+            if task_type_dict not in task_types:
+                task_types.append(task_type_dict)
+            task_type_index.append(task_types.index(task_type_dict))
+        return {
+            "version": 1,
+            "saved": datetime.now().isoformat(timespec="seconds"),
+            "host": removeLastSlash(self.le_kitsuURL.text()),
+            "settings": self.last_fetch_settings._asdict(),
+            "columns": columns,
+            "task_types": task_types,
+            "task_type_index": task_type_index,
+            "shot_ids": [shot_ids.get(i) for i, _ in self.task_type_dict_list],
+        }
+
+    def load_snapshot(self):
+        if self.isTransfering is True:
+            return
+        fname = QFileDialog.getOpenFileName(self, 'Open fetch', self.le_infopath.text(),
+                                            filter="Kitsu Publisher fetch (*.kps)")[0]
+        if fname == "":
+            return
+        try:
+            snapshot = read_snapshot(fname)
+        except (OSError, ValueError, zlib.error) as exc:
+            printMessage("Could not open the fetch | 无法打开\n{}".format(exc))
+            return
+        host = removeLastSlash(self.le_kitsuURL.text())
+        if snapshot["host"] and host and snapshot["host"] != host:
+            printMessage("This fetch was made on {} | 该结果来自 {}".format(snapshot["host"], snapshot["host"]))
+            return
+        self.apply_snapshot(snapshot)
+        self.l_info.setText("Opened {} rows from {}".format(len(snapshot["shot_ids"]), fname))
+
+    def apply_snapshot(self, snapshot):
+        settings = FetchSettings(**snapshot["settings"])
+        project_index = self.cb_project.findText((settings.project or {}).get("name", ""))
+        if project_index >= 0:
+            self.cb_project.setCurrentIndex(project_index)
+        # Show the rules the rows were made with. The source first: switching
+        # it empties the path.
+        {"xml": self.rb_doXML, "manifest": self.rb_doManifest}.get(
+            settings.source, self.rb_doFolder).setChecked(True)
+        self.le_infopath.setText(settings.path)
+        self.cb_subfolders.setChecked(settings.subfolders)
+        self.cb_use_folder.setChecked(settings.use_folder)
+        for rule_edit, value in ((self.le_delimiter, settings.delimiter), (self.le_ep, settings.ep),
+                                 (self.le_sq, settings.sq), (self.le_sh, settings.sh),
+                                 (self.le_ta, settings.ta)):
+            rule_edit.setText(value)
+        self.cb_pattern.setChecked(bool(settings.pattern))
+        self.le_pattern.setText(settings.pattern or "")
+        self.cb_full_path.setChecked(settings.full_path)
+        self.le_include.setText(settings.include)
+        self.le_exclude.setText(settings.exclude)
+        self.le_depth.setText(str(settings.max_depth) if settings.max_depth else "")
+        self.cb_latest_version.setChecked(settings.latest_only)
+        self.last_fetch_settings = settings
+
+        columns = [snapshot["columns"][name] for name in SNAPSHOT_COLUMNS]
+        task_types = snapshot["task_types"]
+        row_count = len(snapshot["shot_ids"])
+        self.drop_thumbnail_decodes(set())
+        self.thumbnail_rows = set()
+        self.tv_information.setUpdatesEnabled(False)
+        self.tv_information.setRowCount(0)
+        self.tv_information.setRowCount(row_count)
+        for row, values in enumerate(zip(*columns)):
+            for column, value in enumerate(values):
+                self.tv_information.setItem(row, column, QTableWidgetItem(value))
+            self.tv_information.item(row, 8).setTextAlignment(2)
+        self.tv_information.setUpdatesEnabled(True)
+        self.task_type_dict_list = [(row, task_types[index])
+                                    for row, index in enumerate(snapshot["task_type_index"])]
+        self.task_rule_list = [(row, task) for row, task in enumerate(snapshot["columns"]["task"])]
+        self.shot_id_list = list(enumerate(snapshot["shot_ids"]))
+        self.fetch_result(row_count)
+        # The suggestions and the live preview need the shots of the project
+        self.shot_index = None
+        self.match_index = None
+        self.refresh_shot_index()
+        self.refresh_rule_sample()
+
+    def add_job(self):
+        if not self.task_type_dict_list or self.last_fetch_settings is None:
+            printMessage("Fetch some previews first | 请先获取预览文件")
+            return
+        self.ui_bus.flush()
+        job = PublishJob(self.last_fetch_settings,
+                         self.publish_settings(),
+                         self.publish_rows(),
+                         self.cb_batch_task.isChecked())
+        self.publish_jobs.append(job)
+        self.refresh_job_table()
+
+    def selected_job_index(self):
+        row = self.tw_jobs.currentRow()
+        if 0 <= row < len(self.publish_jobs):
+            return row
+        return None
+
+    def move_job(self, offset):
+        index = self.selected_job_index()
+        if index is None or not 0 <= index + offset < len(self.publish_jobs):
+            return
+        jobs = self.publish_jobs
+        jobs[index], jobs[index + offset] = jobs[index + offset], jobs[index]
+        self.refresh_job_table()
+        self.tw_jobs.selectRow(index + offset)
+
+    def toggle_job_pause(self):
+        index = self.selected_job_index()
+        if index is not None:
+            job = self.publish_jobs[index]
+            job.paused = not job.paused
+            self.refresh_job_table()
+            self.pump_job_queue()
+
+    def remove_job(self):
+        index = self.selected_job_index()
+        if index is not None and self.publish_jobs[index].in_flight == 0:
+            del self.publish_jobs[index]
+            self.refresh_job_table()
+
+    def refresh_job_table(self):
+        self.tw_jobs.setRowCount(len(self.publish_jobs))
+        for row, job in enumerate(self.publish_jobs):
+            values = [job.status, job.project_name, job.fetch_settings.path,
+                      "{} / {}".format(job.completed, job.total)]
+            for column, value in enumerate(values):
+                item = self.tw_jobs.item(row, column)
+                if item is None:
+                    self.tw_jobs.setItem(row, column, QTableWidgetItem(value))
+                elif item.text() != value:
+                    item.setText(value)
+
+    def toggle_job_queue(self):
+        if self.job_timer.isActive():
+            # The groups already in the pool finish, then the run ends
+            self.job_timer.stop()
+            self.pb_run_queue.setText("Run queue")
+            self.pump_job_queue()
+            return
+        if not self.publish_jobs or self.isTransfering is True:
+            return
+        # Every job shares the login, the rate limit, the upload pool and
+        # the publish options of a normal publish
+        self.cancelTransfer = False
+        self.prepare_run()
+        self.queue_running = True
+        self.pb_run_queue.setText("Stop queue")
+        self.job_timer.start()
+        self.pump_job_queue()
+
+    def pump_job_queue(self):
+        if self.job_timer.isActive():
+            # Keep a few groups waiting in the pool so the uplink never
+            # idles between two jobs. Jobs are served in the order of the
+            # list.
+            window = self.threadpool.maxThreadCount() * 2
+            for job in self.publish_jobs:
+                while self.jobs_in_flight < window and job.has_work():
+                    index, group = job.take_group()
+                    worker = Worker(self.uploadToKitsu, group, job.publish_settings, job)
+                    worker.signals.result.connect(self.thread_result)
+                    worker.signals.finished.connect(
+                        lambda job=job, index=index: self.job_group_finished(job, index))
+                    self.jobs_in_flight += 1
+                    self.threadpool.start(worker)
+        self.refresh_job_table()
+        if self.jobs_in_flight == 0 and self.queue_running and (
+                not self.job_timer.isActive() or not any(job.has_work() for job in self.publish_jobs)):
+            self.finish_job_queue()
+
+    def finish_job_queue(self):
+        self.job_timer.stop()
+        self.queue_running = False
+        self.pb_run_queue.setText("Run queue")
+        if any(job.has_work() for job in self.publish_jobs):
+            self.l_info.setText("Publish queue stopped")
+        else:
+            self.l_info.setText("Publish queue done")
+        self.finish_run()
+
+    def job_group_finished(self, job, index):
+        job.group_finished(index)
+        self.jobs_in_flight = max(0, self.jobs_in_flight - 1)
+        self.pump_job_queue()
+
+    def export_shared_queue(self):
+        if not self.task_type_dict_list:
+            printMessage("Fetch some previews first | 请先获取预览文件")
+            return
+        fname = QFileDialog.getSaveFileName(self,
+                                            'Shared publish queue',
+                                            self.le_infopath.text(),
+                                            filter="Publish queues (*.kpq)")[0]
+        if fname == "":
+            return
+        self.ui_bus.flush()
+        settings = self.publish_settings()
+        publish_rows = self.publish_rows()
+        if self.cb_batch_task.isChecked():
+            upload_groups = group_rows_by_task(publish_rows, settings)
+        else:
+            upload_groups = [[row] for row in publish_rows]
+        try:
+            SharedWorkQueue(fname).add_plan(removeLastSlash(self.le_kitsuURL.text()),
+                                            settings, upload_groups)
+        except sqlite3.Error as exc:
+            printMessage("Could not write the shared queue | 无法写入共享队列\n{}".format(exc))
+            return
+        self.l_info.setText("{} uploads written to {}".format(len(upload_groups), fname))
+
+    def work_shared_queue(self):
+        if self.isTransfering is True:
+            return
+        fname = QFileDialog.getOpenFileName(self,
+                                            'Shared publish queue',
+                                            self.le_infopath.text(),
+                                            filter="Publish queues (*.kpq)")[0]
+        if fname == "":
+            return
+        host = removeLastSlash(self.le_kitsuURL.text())
+        self.rate_limiter = token_bucket_for_host(host, int(self.le_rate.text() or 0))
+        self.cancelTransfer = False
+        self.isTransfering = True
+        self.pb_publish.setText("Cancel")
+        worker = Worker(self.run_shared_queue, fname, host, int(self.le_threads.text() or 1))
+        worker.signals.result.connect(self.shared_queue_result)
+        # The queue loop starts its own upload threads, keep it out of the upload pool
+        QThreadPool.globalInstance().start(worker)
+
+    def shared_queue_result(self, summary):
+        self.ui_bus.flush()
+        self.isTransfering = False
+        self.pb_publish.setText("Publish")
+        self.l_info.setText(summary)
+
+    def run_shared_queue(self, path, host, threads, progress_callback=None):
+        # Claims uploads from the shared queue until nothing is left. Items
+        # leased by other workstations are waited for: if one of them dies,
+        # its lease expires and the item is picked up here.
+        try:
+            work_queue = SharedWorkQueue(path,
+                                         lease=self.config_value("Shared queue", "lease", 300, int),
+                                         max_attempts=self.config_value("Shared queue", "attempts", 3, int))
+            queue_host = work_queue.host()
+        except sqlite3.Error as exc:
+            template = "An exception of type {0} occurred. Arguments:\n{1!r}"
+            return template.format(type(exc).__name__, exc.args)
+        if queue_host and queue_host != host:
+            return "The queue was written for {} | 该队列属于 {}".format(queue_host, queue_host)
+        poll = self.config_value("Shared queue", "poll", 10, float)
+        owner = "{}:{}".format(platform.node(), os.getpid())
+        tracker = SharedQueueTracker()
+        stopped = threading.Event()
+        lock = threading.Lock()
+        counts = {"done": 0, "failed": 0}
+        self.start_log_run()
+
+        def heartbeat():
+            while not stopped.wait(work_queue.lease / 3):
+                try:
+                    work_queue.renew(owner)
+                except sqlite3.Error:
+                    pass  # Share hiccup, the next beat will catch up
+
+        def work():
+            while self.cancelTransfer is False:
+                try:
+                    item = work_queue.claim(owner)
+                    if item is None:
+                        if work_queue.outstanding() == 0:
+                            return
+                        time.sleep(poll)
+                        continue
+                except sqlite3.Error:
+                    time.sleep(backoff_delay(3))
+                    continue
+                item_id, settings, rows = item
+                if self.cancelTransfer is True:
+                    work_queue.release(item_id, owner)
+                    return
+                message = self.uploadToKitsu(rows, settings, tracker, None)
+                if self.cancelTransfer is True:
+                    # Maybe stopped halfway, let another workstation redo it
+                    work_queue.release(item_id, owner)
+                    return
+                state = work_queue.complete(item_id, owner, message)
+                if state is None:
+                    # The lease was lost meanwhile, the new holder reports it
+                    self.log_record({"outcome": "lease lost", "rows": [row.row for row in rows]})
+                elif state in counts:
+                    # A failure that will be retried is not counted yet
+                    with lock:
+                        counts[state] += len(rows)
+                left = work_queue.outstanding()
+                self.post_info("Shared queue: {} rows published here, {} uploads left".format(
+                    counts["done"], left))
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        workers = [threading.Thread(target=work) for _ in range(max(1, threads))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stopped.set()
+        summary = "Shared queue: {} rows published here, {} failed".format(counts["done"], counts["failed"])
+        if self.cancelTransfer is True:
+            summary += " (canceled)"
+        return summary
+
+    def watch_folder(self):
+        if self.isTransfering is True:
+            if self.pb_watch.text() != "Watch folder":
+                self.pb_publish.setText("...Canceling...")
+                self.cancel_publish()
+            return
+        if not self.rb_doFolder.isChecked() or not os.path.isdir(self.le_infopath.text()):
+            printMessage("Pick a folder to watch | 请选择要监视的文件夹")
+            return
+        if not self.confirm_publish():
+            return
+        settings = self.fetch_settings()
+        publish_settings = self.publish_settings()
+        # Kept for "--watch", which runs the same watch without a window
+        with open(os.path.join(self.config_path, "watch.json"), "w", encoding="utf-8") as saved:
+            json.dump({"fetch": settings._asdict(), "publish": publish_settings._asdict()}, saved)
+        self.rate_limiter = token_bucket_for_host(removeLastSlash(self.le_kitsuURL.text()),
+                                                  int(self.le_rate.text() or 0))
+        self.cancelTransfer = False
+        self.isTransfering = True
+        self.pb_publish.setText("Cancel")
+        self.pb_watch.setText("Stop watching")
+        worker = Worker(self.run_watch, settings, publish_settings, int(self.le_threads.text() or 1))
+        worker.signals.result.connect(self.watch_result)
+        # The watch runs for hours, keep it out of the upload pool
+        QThreadPool.globalInstance().start(worker)
+
+    def watch_result(self, summary):
+        self.ui_bus.flush()
+        self.cancel_timer.stop()
+        self.isTransfering = False
+        self.pb_publish.setText("Publish")
+        self.pb_watch.setText("Watch folder")
+        self.l_info.setText(summary)
+
+    def run_watch(self, settings, publish_settings, threads, progress_callback=None):
+        # Publishes every preview that lands under the folder until canceled.
+        # A file is published once its size and time stopped changing for
+        # [Watch] settle seconds. Handled files are recorded and skipped,
+        # also after a restart; failed uploads are tried again later. The
+        # files already there on the first watch of a folder are left
+        # alone unless [Watch] publish_existing is 1.
+        token = self.cancel_token
+        settle = self.config_value("Watch", "settle", 5, float)
+        retry = self.config_value("Watch", "retry", 300, float)
+        record = WatchRecord(os.path.join(self.config_path, "watch.sqlite"))
+        handled = record.load()
+        scan_filter = ScanFilter(settings.include, settings.exclude, settings.max_depth)
+        watcher_args = (settings.path, ACCEPTED_EXTENSIONS, scan_filter, settings.subfolders,
+                        self.config_value("Watch", "poll", 10, float), token.event)
+        counts = {"published": 0, "skipped": 0, "failed": 0}
+        self.start_log_run()
+        watcher = create_folder_watcher(*watcher_args)
+        try:
+            try:
+                new_files = watcher.start()
+            except OSError:
+                # Usually out of inotify watches on a huge tree
+                watcher.close()
+                watcher = FolderWatcher(*watcher_args)
+                new_files = watcher.start()
+            if not record.known_root(settings.path):
+                publish_existing = self.config_value("Watch", "publish_existing", 0, int) == 1
+                handled.update(record.add_baseline(settings.path, [] if publish_existing else new_files))
+                if not publish_existing:
+                    self.log_record({"outcome": "watch baseline", "path": settings.path,
+                                     "files": len(new_files)})
+                    new_files = []
+            self.session.ensure()
+            shot_ids = self.project_shot_ids(settings.project)
+            self.match_index = ShotMatchIndex(shot_ids)
+            task_types = self.kitsu_call(gazu.task.all_task_types)
+            all_task_type_names = [task_type["name"].lower() for task_type in task_types
+                                   if task_type["for_entity"] == "Shot"]
+            pending = {}  # path: (size, mtime_ns, unchanged since)
+            while not token.cancelled:
+                now = time.monotonic()
+                for file in new_files:
+                    if file in handled and file not in pending:
+                        try:
+                            stat = os.stat(file)
+                        except OSError:
+                            continue
+                        if handled[file] == (stat.st_size, stat.st_mtime_ns):
+                            continue  # Published by an earlier watch
+                    pending.setdefault(file, (None, None, now))
+                settled = []
+                for file, (size, mtime_ns, since) in list(pending.items()):
+                    try:
+                        stat = os.stat(file)
+                    except OSError:
+                        del pending[file]  # Gone again, a temp file
+                        continue
+                    if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                        pending[file] = (stat.st_size, stat.st_mtime_ns, max(since, now))
+                    elif now - since >= settle:
+                        del pending[file]
+                        if handled.get(file) != (size, mtime_ns):
+                            settled.append((file, size, mtime_ns))
+                if settled:
+                    failed = self.publish_settled(settled, settings, publish_settings, threads, task_types,
+                                                  all_task_type_names, shot_ids, record, handled, counts,
+                                                  token)
+                    for file, size, mtime_ns in failed:
+                        # Settles again once the retry delay is over
+                        pending[file] = (size, mtime_ns, time.monotonic() + retry - settle)
+                self.post_info("Watching {}: {} published, {} failed, {} waiting | 监视中".format(
+                    settings.path, counts["published"], counts["failed"], len(pending)))
+                new_files = watcher.wait(settle / 2 if pending else 3600)
+        except PublishCanceled:
+            pass
+        except Exception as exc:
+            template = "An exception of type {0} occurred. Arguments:\n{1!r}"
+            return template.format(type(exc).__name__, exc.args)
+        finally:
+            watcher.close()
+        return "Stopped watching: {} published, {} skipped, {} failed".format(
+            counts["published"], counts["skipped"], counts["failed"])
 
-    def parse_rule_indices(self, input_str):
-        try:
-            return [int(i) - 1 for i in input_str.split('+') if i]
+    def publish_settled(self, settled, settings, publish_settings, threads, task_types,
+                        all_task_type_names, shot_ids, record, handled, counts, token):
+        # The fetch and publish of a few files. Returns the failed ones.
+        # shot_ids is refreshed in place when a file names a shot created
+        # since the watch started.
+        stats = dict((file, (size, mtime_ns)) for file, size, mtime_ns in settled)
+        lock = threading.Lock()
+        failed = []
 
-        except ValueError:
-            return [0]
+        def mark(file, outcome):
+            size, mtime_ns = stats[file]
+            record.mark(file, size, mtime_ns, outcome)
+            with lock:
+                handled[file] = (size, mtime_ns)
+                counts["published" if outcome == "published" else "skipped"] += 1
 
-    def process_rule_part(self, rule_input, namesplit):
-        parts = rule_input.split(",")
-        base_rule = parts[0].strip()
-        adv_rules = parts[1:]
+        matched = set()
+        refreshed = False
+        uploads = []
+        for row, (file, episode_rule, sequence_rule, shot_rule, preview_task_name, _,
+                  version) in enumerate(self.rule_entries(settings, [file for file, _, _ in settled])):
+            matched.add(file)
+            frames = self.probe_frames(file)
+            task_rule, task_type_dict, shot_id, values, _ = self.resolve_row(
+                settings, row, file, episode_rule, sequence_rule, shot_rule, preview_task_name,
+                frames, task_types, all_task_type_names, shot_ids)
+            if shot_id is None and not refreshed:
+                refreshed = True
+                shot_ids.update(self.kitsu_call(self.project_shot_ids, settings.project, measure=None))
+                task_rule, task_type_dict, shot_id, values, _ = self.resolve_row(
+                    settings, row, file, episode_rule, sequence_rule, shot_rule, preview_task_name,
+                    frames, task_types, all_task_type_names, shot_ids)
+            if shot_id is None:
+                self.log_message(f"\nThere is no data for this shot on Kitsu |\nKitsu上没有这个镜头的数据："
+                                 f"\n{file}",
+                                 outcome="no shot", file=file)
+                mark(file, "no shot")
+                continue
+            uploads.append((row, (shot_id, task_rule), version, file,
+                            PublishRow(row, task_type_dict, *values[2:9])))
+        for file in stats:
+            if file not in matched:
+                mark(file, "no match")  # Logged by rule_entries
+        if settings.latest_only:
+            superseded = self.mark_superseded(
+                [(row, key, version) for row, key, version, _, _ in uploads if version is not None],
+                post=False)
+            for row, _, _, file, _ in uploads:
+                if row in superseded:
+                    mark(file, "superseded")
+            uploads = [upload for upload in uploads if upload[0] not in superseded]
 
-        parts = []
-        for idx in [int(i) - 1 for i in base_rule.split('+')]:
-            if 0 <= idx < len(namesplit):
-                parts.append(namesplit[idx])
-            else:
-                parts.append("❗out of range")
-        result = "_".join(parts)
+        work = queue.Queue()
+        for upload in uploads:
+            work.put(upload)
+        tracker = SharedQueueTracker()
 
-        for adv_rule in adv_rules:
-            adv_rule = adv_rule.strip()
-            if adv_rule.startswith('+'):
-                result += adv_rule[1:]
-            elif adv_rule.endswith('+'):
-                result = adv_rule[:-1] + result
-            elif adv_rule.startswith('-'):
-                remove_str = adv_rule[1:]
-                if remove_str:
-                    result = re.sub(r'{}$'.format(re.escape(remove_str)), "", result)
-            elif adv_rule.endswith('-'):
-                remove_str = adv_rule[:-1]
-                if remove_str:
-                    if result.startswith(remove_str):
-                        result = result[len(remove_str):]
-            elif ":" in adv_rule:
-                find, replace = adv_rule.split(":")
-                result = result.replace(find, replace)
+        def upload_worker():
+            while not token.cancelled:
+                try:
+                    _, _, _, file, publish_row = work.get_nowait()
+                except queue.Empty:
+                    return
+                message = self.uploadToKitsu([publish_row], publish_settings, tracker, None)
+                if token.cancelled:
+                    return  # Maybe stopped halfway, done again by the next watch
+                if message is None:
+                    mark(file, "published")
+                else:
+                    with lock:
+                        counts["failed"] += 1
+                        failed.append((file,) + stats[file])
 
-        return result
+        workers = [threading.Thread(target=upload_worker) for _ in range(max(1, min(threads, len(uploads))))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return failed
 
-    def process_rule(self, rule_input, namesplit, indices):
-        if "," not in rule_input:
-            rule_input = rule_input + ", : "
-            
-        if "&" in rule_input:
-            rule_parts = rule_input.split("&")
-            results = []
-            
-            for part in rule_parts:
-                result = self.process_rule_part(part.strip(), namesplit)
-                results.append(result)
+    def run_headless_watch(self, threads):
+        # No window: the watch last started in the GUI, with the saved login
+        host = removeLastSlash(self.le_kitsuURL.text())
+        try:
+            with open(os.path.join(self.config_path, "watch.json"), encoding="utf-8") as saved:
+                saved = json.load(saved)
+        except (OSError, ValueError):
+            print("Start a watch once with the GUI | 请先用界面启动一次监视")
+            return 1
+        result = self.login_kitsu(True, host, self.le_username.text(), self.le_password.text(), None)
+        if not isinstance(result, dict):
+            print(result)
+            return 1
+        self.rate_limiter = token_bucket_for_host(host, self.config_value("Publish", "rate", 20, int))
+        settings = FetchSettings(**saved["fetch"])
+        print("Watching {}, Ctrl+C to stop | 监视中".format(settings.path))
+        worker = threading.Thread(target=lambda: print(self.run_watch(
+            settings, PublishSettings(**saved["publish"]), threads)))
+        worker.start()
+        try:
+            while worker.is_alive():
+                worker.join(1)
+        except KeyboardInterrupt:
+            self.cancelTransfer = True
+            worker.join()
+        self.logger.close()
+        return 0
 
-            return "_".join(results)
-    
-        else:
-            return self.process_rule_part(rule_input, namesplit)
+    def run_headless_worker(self, path, threads):
+        # No window: log in with the saved config and work the queue
+        host = removeLastSlash(self.le_kitsuURL.text())
+        if not host:
+            print("No saved login, log in once with the GUI | 没有保存的登录信息，请先用界面登录")
+            return 1
+        result = self.login_kitsu(True, host, self.le_username.text(), self.le_password.text(), None)
+        if not isinstance(result, dict):
+            print(result)
+            return 1
+        self.rate_limiter = token_bucket_for_host(host, self.config_value("Publish", "rate", 20, int))
+        summary = self.run_shared_queue(path, host, threads)
+        self.logger.close()
+        print(summary)
+        return 0
 
-    def fetch(self):
-        self.pb_fetch.setText("...Fetching...")
-        self.progressBar.setValue(0)
-        self.login()
+    def kitsu_call(self, fn, *args, recover=None, measure="api", attempts=None, **kwargs):
+        # Every publish request goes through the rate limit of the host and
+        # is retried with a jittered backoff when the server is struggling.
+        # Only reads and the upload to an existing preview are sent again
+        # as they are. A POST that got no answer may have been applied:
+        # recover() looks for its result first and is given for those.
+        # measure: "api" feeds the latency to the thread count controller,
+        # "upload" only its failures (the bytes are counted when done).
+        if attempts is None:
+            attempts = self.retries
+        not_authenticated = getattr(gazu.exception, "NotAuthenticatedException", ())
+        token = self.cancel_token
+        for attempt in range(attempts + 1):
+            token.raise_if_cancelled()
+            self.session.ensure()
+            self.rate_limiter.acquire()
+            with self.progress_lock:
+                self.run_stats["calls"] += 1
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except not_authenticated:
+                # The server dropped the session, log in again once
+                if attempt == attempts:
+                    raise
+                self.session.invalidate()
+            except Exception as exc:
+                if not is_retryable_error(exc) or attempt == attempts:
+                    raise
+                if measure:
+                    self.concurrency.record(time.monotonic() - started, throttled=True)
+                token.sleep(backoff_delay(attempt))
+                if recover is not None:
+                    found = self.kitsu_call(recover, attempts=attempts)
+                    if found is not None:
+                        return found
+            else:
+                if measure == "api":
+                    self.concurrency.record(time.monotonic() - started,
+                                            kind=getattr(fn, "__name__", None))
+                return result
 
-        worker = Worker(self.fetch_data)
-        worker.signals.result.connect(self.fetch_result)
+    def throughput_history(self):
+        try:
+            return json.loads(self.config_value("Estimate", "history", "[]"))
+        except ValueError:
+            return []
 
-        # Execute
-        self.threadpool.start(worker)
+    def record_throughput(self):
+        # Whole runs only: the wall time already includes the thread count,
+        # the rate limit and the server load of a real publish
+        stats = self.run_stats
+        seconds = time.monotonic() - stats["started"]
+        if stats["bytes"] == 0 or seconds < 1:
+            return
+        history = self.throughput_history()
+        history.append({"bytes": stats["bytes"], "calls": stats["calls"], "seconds": round(seconds, 1),
+                        "threads": int(self.le_threads.text() or 1)})
+        self.set_config_value("Estimate", "history", json.dumps(history[-20:]))
 
-    def fetch_result(self, nr_shots):
-        self.pb_fetch.setText("Fetch")
-        if not isinstance(nr_shots, (int, float, complex)):
-            self.l_info.setText(
-                "Some error happend. Could not fetch information")
-            printMessage(nr_shots)  # An error happened. Print it
-        else:
-            self.l_info.setText("Fetched " + str(nr_shots) + " shots")
+    def start_memory(self, stage):
+        # Off unless asked for: tracemalloc slows every allocation down
+        self.finish_memory()
+        trace = self.cb_memory.isChecked()
+        self.set_config_value("Memory", "trace", int(trace))
+        budget = self.config_value("Memory", "budget_mb", 0, int) << 20
+        if trace or budget:
+            self.memory_monitor = MemoryMonitor(budget, trace, self.relieve_memory)
+            self.memory_monitor.start(stage)
 
-    def fetch_data(self, progress_callback):
-        self.l_info.setText("Fetching information")
-        self.delimiter_input = self.le_delimiter.text() or "_"
-        self.ep_input = self.le_ep.text() or "1"
-        self.sq_input = self.le_sq.text() or "2"
-        self.sh_input = self.le_sh.text() or "3"
-        self.ta_input = self.le_ta.text() or "4"
-        self.clear_log()
-        self.task_rule_list = []
-        self.task_type_dict_list = []
-        all_task_type_names = []
-        shot_dict = {}
-        
-        ep_indices = self.parse_rule_indices(self.ep_input)
-        sq_indices = self.parse_rule_indices(self.sq_input)
-        sh_indices = self.parse_rule_indices(self.sh_input)
-        ta_indices = self.parse_rule_indices(self.ta_input)
-        
-        try:
-            shots = gazu.shot.all_shots_for_project(
-                self.cb_project.currentData())
-            path = os.path.abspath(self.le_infopath.text())
-            files = []
-            task_types = gazu.task.all_task_types()
-            for task_type in task_types:
-                if task_type["for_entity"] == "Shot":
-                    all_task_type_names.append(task_type["name"].lower())
+    def memory_stage(self, stage):
+        monitor = self.memory_monitor
+        if monitor is not None:
+            monitor.stage(stage)
 
-            if self.rb_doXML.isChecked() is True:  # If pick XML file
-                printMessage("XML isn't supported yet.")
-            else:
-                if os.path.exists(path) is False:
-                    printMessage(
-                        title="Error",
-                        msg="Path does not seem to exists.\nPlease check!"
-                    )
-                    return 0
+    def finish_memory(self):
+        monitor, self.memory_monitor = self.memory_monitor, None
+        if monitor is None:
+            return ""
+        stages = monitor.stop()
+        self.log_record({"outcome": "memory", "budget": monitor.budget,
+                         "over_budget": monitor.pressure_events, "stages": stages})
+        return monitor.summary()
 
-                self.tv_information.setRowCount(0)
-                acceptedExtensions = [
-                    ".mov", ".mp4", ".jpg", ".png", ".tiff"]
+    def show_memory_summary(self):
+        summary = self.finish_memory()
+        if summary:
+            self.l_info.setText("{}  |  {}".format(self.l_info.text(), summary))
 
-                if self.cb_subfolders.isChecked() is True:
-                    subfolders, files = run_fast_scandir(
-                        path, acceptedExtensions)
-                else:
-                    for entry in os.scandir(path):
-                        if entry.is_file():
-                            files.append(entry.path)
-
-                # To speed up the preview-check,
-                # save old episode & sequence if same mutlieple times
-                old_episode_name = None
-                old_episode_dict = None
-                old_sequence_name = None
-                old_sequence_dict = None
-                for i, file in enumerate(files):
-                    extension = os.path.splitext(file)[1]
-                    if extension in acceptedExtensions:
-                        if self.cb_use_folder.isChecked():
-                            normpath = os.path.normpath(file)
-                            path_parts = normpath.split(os.sep)
-                            filename = os.path.splitext(path_parts[-1])[0]
-                            name_parts = filename.split(self.delimiter_input)
-                            namesplit = path_parts[: -1] + name_parts
-                        else:
-                            namesplit = os.path.splitext(
-                                os.path.basename(file)
-                            )[0].split(self.delimiter_input)
-
-                        episode_rule = self.process_rule(self.ep_input, namesplit, ep_indices)
-                        sequence_rule = self.process_rule(self.sq_input, namesplit, sq_indices)
-                        shot_rule = self.process_rule(self.sh_input, namesplit, sh_indices)
-
-                        preview_task_name = self.process_rule(self.ta_input, namesplit, ta_indices).lower()
-                        if preview_task_name in all_task_type_names:
-                            for task_type in task_types:
-                                task_name_match = task_type["name"].lower() == preview_task_name
-                                if task_type["for_entity"] == "Shot" and task_name_match:
-                                    task_rule = task_type["name"]
-                                    task_type_dict = task_type
-                        else:
-                            task_rule = "null"
-                            task_type_dict = "{'name': 'null'}"
-                        self.task_rule_list.append((i, task_rule))
-                        self.task_type_dict_list.append((i, task_type_dict))
-                        
-                        exists = "No"
-                        if self.has_episode == 1:
-                            if old_episode_name != episode_rule:
-                                episode_dict = gazu.shot.get_episode_by_name(self.cb_project.currentData(),
-                                                                             episode_rule)
-                                old_episode_name = episode_rule
-                                old_episode_dict = episode_dict
-                            else:
-                                episode_dict = old_episode_dict
-                            if episode_dict is not None:
-                                if old_sequence_name != sequence_rule:
-                                    sequence_dict = gazu.shot.get_sequence_by_name(self.cb_project.currentData(),
-                                                                                   sequence_rule, episode_dict)
-                                    old_sequence_name = sequence_rule
-                                    old_sequence_dict = sequence_dict
-                                else:
-                                    sequence_dict = old_sequence_dict
-                                if sequence_dict is not None:
-                                    shot_dict = gazu.shot.get_shot_by_name(
-                                        sequence_dict, shot_rule)
-                                    if shot_dict is not None:
-                                        exists = "Yes"
-                        else:
-                            if old_sequence_name != sequence_rule:
-                                sequence_dict = gazu.shot.get_sequence_by_name(self.cb_project.currentData(),
-                                                                               sequence_rule)
-                                old_sequence_name = sequence_rule
-                                old_sequence_dict = sequence_dict
-                            else:
-                                sequence_dict = old_sequence_dict
-                            if sequence_dict is not None:
-                                shot_dict = gazu.shot.get_shot_by_name(
-                                    sequence_dict, shot_rule)
-
-                                if shot_dict is not None:
-                                    exists = "Yes"
-
-                        episode = QTableWidgetItem(episode_rule)
-                        sequence = QTableWidgetItem(sequence_rule)
-                        shot = QTableWidgetItem(shot_rule)
-                        task = QTableWidgetItem(task_rule)
-                        vidReader = cv2.VideoCapture(file)
-                        if not vidReader.isOpened():
-                            # printMessage() here may cause the program to freeze, use self.log_message() instead
-                            #printMessage(
-                            #    "Could not read video file")
-                            self.log_message(
-                                f"\nCould not read video file |"
-                                f"\n无法读取视频文件："
-                                f"\n{file}")
-                        framerange = QTableWidgetItem(
-                            str(int(vidReader.get(cv2.CAP_PROP_FRAME_COUNT))))
-                        preview = QTableWidgetItem(file)
-                        filesize = QTableWidgetItem(
-                            pretty_size(os.stat(file).st_size)
-                        )
-
-                        row = self.tv_information.rowCount()
-                        self.tv_information.setRowCount(row + 1)
-
-                        self.tv_information.setItem(
-                            row, 0, QTableWidgetItem("Ready"))
-                        self.tv_information.setItem(
-                            row, 1, QTableWidgetItem(exists))
-                        self.tv_information.setItem(row, 2, episode)
-                        self.tv_information.setItem(row, 3, sequence)
-                        self.tv_information.setItem(row, 4, shot)
-                        self.tv_information.setItem(row, 5, task)
-                        self.tv_information.setItem(row, 6, framerange)
-                        self.tv_information.setItem(row, 7, preview)
-                        self.tv_information.setItem(row, 8, filesize)
-                        self.tv_information.item(row, 8).setTextAlignment(2)
-
-            if all('null' not in task_rule for _, task_rule in self.task_rule_list):
-                self.cb_task.setEnabled(False)
-                if self.cb_task.count() == self.newTaskItem_index:
-                    self.cb_task.insertItem(
-                        self.newTaskItem_index,
-                        "There's no preview with a null task name | 没有空任务字段的预览",
-                        self.cb_task.itemData(1)
-                        )
-                self.cb_task.setCurrentText("There's no preview with a null task name | 没有空任务字段的预览")
-            else:
-                self.cb_task.setEnabled(True)
-                self.cb_task.removeItem(self.newTaskItem_index)
-                self.cb_task.setCurrentText("Don't post | 不上传")
-            self.cb_task.update()
-            self.tv_information.resizeColumnsToContents()
-            return len(files)
+    def relieve_memory(self, rss):
+        # Called by the memory monitor thread: fewer threads hold fewer
+        # files and rows at once, the caches are emptied or left on disk
+        self.concurrency.shed()
+        self.fetch_pool.setMaxThreadCount(max(1, self.fetch_pool.maxThreadCount() // 2))
+        self.thumbnails.evict()
+        with self.session.lock:
+            self.session.reference = None
+        gc.collect()
+        self.log_record({"outcome": "memory pressure", "rss": rss,
+                         "upload_threads": self.threadpool.maxThreadCount(),
+                         "fetch_threads": self.fetch_pool.maxThreadCount()})
+        self.post_info("Over the memory budget ({}), running with fewer threads | "
+                       "内存超出预算，已减少线程".format(pretty_size(rss)))
+
+    def dry_run(self):
+        if not self.task_type_dict_list:
+            printMessage("Fetch some previews first | 请先获取预览文件")
+            return
+        self.ui_bus.flush()
+        settings = self.publish_settings()
+        publish_rows = self.publish_rows()
+        if self.cb_batch_task.isChecked():
+            upload_groups = group_rows_by_task(publish_rows, settings)
+        else:
+            upload_groups = [[row] for row in publish_rows]
+        skipped_rows = len(self.task_type_dict_list) - len(publish_rows)
+        self.pb_dry_run.setEnabled(False)
+        self.l_info.setText("Planning the publish... | 正在计算上传计划...")
+        worker = Worker(self.build_publish_plan, upload_groups, settings, skipped_rows)
+        worker.signals.result.connect(self.show_publish_plan)
+        self.control_pool.start(worker, CONTROL_PRIORITY_PLAN)
+
+    def build_publish_plan(self, upload_groups, settings, skipped_rows, progress_callback):
+        # Four reads for the whole project instead of lookups per row
+        try:
+            self.session.ensure()
+            project = settings.project
+            shot_ids = build_shot_ids(gazu.shot.all_episodes_for_project(project),
+                                      gazu.shot.all_sequences_for_project(project),
+                                      gazu.shot.all_shots_for_project(project))
+            task_keys = set((task["entity_id"], task["task_type_id"])
+                            for task in gazu.task.all_tasks_for_project(project))
+            return plan_publish(upload_groups, settings, shot_ids, task_keys, skipped_rows)
         except Exception as exc:
             template = "An exception of type {0} occurred. Arguments:\n{1!r}"
             message = template.format(type(exc).__name__, exc.args)
             return message
 
+    def show_publish_plan(self, plan):
+        self.pb_dry_run.setEnabled(True)
+        self.l_info.setText("")
+        if not isinstance(plan, dict):
+            printMessage(plan)
+            return
+        history = self.throughput_history()
+        seconds = estimate_duration(history, plan["bytes"], plan["api_calls"])
+        if seconds is None:
+            estimate = "unknown until a first publish is measured | 首次上传后才能估算"
+        else:
+            estimate = "about {} (from {} earlier runs, last at {} threads) | 预计用时".format(
+                pretty_duration(seconds), len(history), history[-1].get("threads", "?"))
+        lines = ["Would post {} comments and upload {} previews ({}) | 将上传".format(
+                     plan["comments"], plan["previews"], pretty_size(plan["bytes"])),
+                 "API calls: about {} | 请求数".format(plan["api_calls"]),
+                 "Duration: " + estimate,
+                 ""]
+        skipped = sum(plan["skipped"].values())
+        lines.append("Rows skipped: {} | 跳过的行".format(skipped))
+        for reason, count in plan["skipped"].most_common():
+            lines.append("    {}: {}".format(reason, count))
+        self.log_record({"outcome": "dry run", "comments": plan["comments"],
+                         "previews": plan["previews"], "bytes": plan["bytes"],
+                         "api_calls": plan["api_calls"], "skipped": dict(plan["skipped"]),
+                         "estimate_seconds": None if seconds is None else round(seconds)})
+        msg = QMessageBox(QMessageBox.Information, "Dry run | 上传计划", "\n".join(lines), QMessageBox.Ok, self)
+        msg.setWindowIcon(QIcon("kitsu.png"))
+        msg.exec_()
+
     def publish(self):
         if self.isTransfering is False:
             try:
-                self.login()
-
-                confirm_msg = QMessageBox(QMessageBox.Question,
-                                          "Confirm | 确认上传",
-                                          "Project | 项目:  <b>{}</b><br><br>"
-                                          "Post “NULL TASK” under | 空任务字段预览上传到:<br><b>{}</b>"
-                                          "<br><br>Status | 上传状态:  <b>{}</b>".format(
-                                              self.cb_project.currentText(),
-                                              self.cb_task.currentText(),
-                                              self.cb_status.currentText()),
-                                          QMessageBox.Yes | QMessageBox.No)
-                confirm_msg.setWindowIcon(QIcon("kitsu.png"))
-                icon_pixmap = QPixmap("kitsu.png").scaled(64, 64, aspectRatioMode=Qt.KeepAspectRatio)
-                confirm_msg.setIconPixmap(QPixmap(icon_pixmap))
-
-                if confirm_msg.exec_() == QMessageBox.Yes:
+                if self.confirm_publish():
                     self.cancelTransfer = False
                     self.start_upload()
 
@@ -652,41 +3948,182 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 printMessage("Error", exc)
 
         else:
-            self.pb_publish.setText("...Canceling at next upload...")
-            self.cancelTransfer = True
+            self.pb_publish.setText("...Canceling...")
+            self.cancel_publish()
 
-    def start_upload(self):
+    def cancel_publish(self):
+        # Running uploads stop at their next chunk or Kitsu call, the ones
+        # still waiting in the pool are dropped without being started
+        self.cancelTransfer = True
+        self.threadpool.clear()
+        if self.job_timer.isActive():
+            self.job_timer.stop()
+            self.pb_run_queue.setText("Run queue")
+        self.cancel_timer.start()
+
+    def finish_cancel(self):
+        if self.threadpool.activeThreadCount() > 0:
+            return
+        self.cancel_timer.stop()
+        self.ui_bus.flush()
+        if self.processing_monitor is not None:
+            self.processing_monitor.stop()
+            self.processing_monitor = None
+            self.processing_timer.stop()
+        for job in self.publish_jobs:
+            job.requeue_running()
+        self.jobs_in_flight = 0
+        self.queue_running = False
+        self.refresh_job_table()
+        self.concurrency.reset(1, 1, 1, enabled=False)
+        self.update_thread_count()
+        self.isTransfering = False
+        self.pb_publish.setText("Publish")
+        self.progressBar.setValue(0)
+        message = "Canceled: {} of {} rows uploaded | 已取消".format(self.completed_tasks, self.total_tasks)
+        self.l_info.setText(message)
+        self.show_memory_summary()
+        self.log_record({"outcome": "run canceled", "completed": self.completed_tasks,
+                         "total": self.total_tasks})
+
+    def confirm_publish(self):
+        confirm_msg = QMessageBox(QMessageBox.Question,
+                                  "Confirm | 确认上传",
+                                  "Project | 项目:  <b>{}</b><br><br>"
+                                  "Post “NULL TASK” under | 空任务字段预览上传到:<br><b>{}</b>"
+                                  "<br><br>Status | 上传状态:  <b>{}</b>".format(
+                                      self.cb_project.currentText(),
+                                      self.cb_task.currentText(),
+                                      self.cb_status.currentText()),
+                                  QMessageBox.Yes | QMessageBox.No)
+        confirm_msg.setWindowIcon(QIcon("kitsu.png"))
+        icon_pixmap = QPixmap("kitsu.png").scaled(64, 64, aspectRatioMode=Qt.KeepAspectRatio)
+        confirm_msg.setIconPixmap(QPixmap(icon_pixmap))
+        return confirm_msg.exec_() == QMessageBox.Yes
+
+    def prepare_upload(self):
+        # Shared by a publish and a fetch-and-publish
         self.progressBar.setValue(0)
+        self.prepare_run()
         rows = self.tv_information.rowCount()
         self.numberOfShots = rows
         self.completed_tasks = 0
-        self.total_tasks = len(self.task_type_dict_list)
-        for i, task_type_dict in self.task_type_dict_list:
+        self.total_tasks = 0
+
+    def prepare_run(self):
+        # Everything of a run that isn't the table: also used by the
+        # publish queue
+        rate = int(self.le_rate.text() or 0)
+        self.set_config_value("Publish", "rate", rate)
+        self.rate_limiter = token_bucket_for_host(removeLastSlash(self.le_kitsuURL.text()), rate)
+        max_threads = int(self.le_threads.text() or 1)
+        if self.cb_adaptive.isChecked() and max_threads > 1:
+            # Start small and let the controller find the highest safe count
+            self.concurrency.reset(1, max_threads, min(2, max_threads))
+        else:
+            self.concurrency.reset(1, 1, 1, enabled=False)
+            self.update_thread_count()
+        if self.processing_monitor is not None:
+            self.processing_monitor.stop()
+            self.processing_monitor = None
+        if self.cb_backpressure.isChecked():
+            max_pending = int(self.le_backlog.text() or 1)
+            self.set_config_value("Publish", "max_processing", max_pending)
+            self.processing_monitor = PreviewProcessingMonitor(
+                lambda preview_id: self.kitsu_call(gazu.files.get_preview_file, preview_id, measure=None),
+                max_pending)
+            self.processing_monitor.start()
+            self.processing_timer.start(1000)
+        # Measured for the estimates of later dry runs
+        self.run_stats = {"started": time.monotonic(), "bytes": 0, "calls": 0}
+        self.mirror_targets = self.load_mirror_targets() if self.cb_mirrors.isChecked() else []
+        if self.memory_monitor is None:
+            self.start_memory("publish")
+        self.set_config_value("Publish", "mirrors", int(self.cb_mirrors.isChecked()))
+        self.isTransfering = True
+        self.pb_publish.setText("Cancel")
+
+    def start_upload(self):
+        # Workers only see this frozen copy of the settings and the rows,
+        # never the widgets themselves
+        settings = self.publish_settings()
+        publish_rows = self.publish_rows()
+        if not publish_rows:
+            # Nothing would ever finish the run and give the button back
+            self.l_info.setText("Nothing to publish | 没有可上传的内容")
+            return
+        self.prepare_upload()
+        self.total_tasks = len(publish_rows)
+        if self.cb_batch_task.isChecked():
+            upload_groups = group_rows_by_task(publish_rows, settings)
+        else:
+            upload_groups = [[row] for row in publish_rows]
+        for rows in upload_groups:
             # Pass the function to execute
             # Any other args, kwargs are passed to the run function
-            worker = Worker(self.uploadToKitsu, i, task_type_dict)
-            worker.signals.progress.connect(self.upload_progress)
+            worker = Worker(self.uploadToKitsu, rows, settings, self)
             worker.signals.result.connect(self.thread_result)
             worker.signals.finished.connect(self.thread_complete)
 
             # Execute
             self.threadpool.start(worker)
 
-    def upload_progress(self, calltype, data):
-        if calltype == 0:  # Write upload filesize
-            if hasattr(data, "text"):
-                data_text = data.text()
-            else:
-                data_text = str(data)
+    def publish_settings(self):
+        self.retries = self.config_value("Publish", "retries", 5, int)
+        return PublishSettings(
+            project=self.cb_project.currentData(),
+            has_episode=getattr(self, "has_episode", 1),
+            username=self.le_username.text(),
+            reupload=self.cb_reupload.isChecked(),
+            null_task=self.cb_task.currentData(),
+            null_task_name=self.cb_task.currentText(),
+            status=self.cb_status.currentData(),
+            retries=self.retries,
+            threads=int(self.le_threads.text() or 1),
+        )
 
-            self.l_info.setText(
-                "Uploading... This can take a while. Current file: "
-                + data_text
-            )   # str(data.text()) may cause error in some cases.
-        elif calltype == 1:  # Process done. Update progressbar
+    def publish_rows(self):
+        # Every fetched row except the skipped ones (older versions)
+        return [self.publish_row(i, task_type_dict)
+                for i, task_type_dict in self.task_type_dict_list
+                if not self.tv_information.item(i, 0).text().startswith("Skipped")]
+
+    def publish_row(self, i, task_type_dict):
+        return PublishRow(i, task_type_dict,
+                          *[self.tv_information.item(i, column).text() for column in range(2, 9)])
+
+    def post_info(self, text):
+        self.ui_bus.post("info", self.l_info.setText, text)
+
+    def post_cell(self, row, column, text):
+        self.ui_bus.post(("cell", row, column), self.set_cell_text, row, column, text)
+
+    def post_row_status(self, row, text):
+        self.post_cell(row, 0, text)
+
+    def row_done(self, row):
+        self.post_row_status(row, "Done")
+        with self.progress_lock:
             self.completed_tasks += 1
             progress_percentage = int((self.completed_tasks / self.total_tasks) * 100)
-            self.progressBar.setValue(progress_percentage)
+        self.ui_bus.post("progress", self.progressBar.setValue, progress_percentage)
+
+    def update_processing_counts(self):
+        monitor = self.processing_monitor
+        if monitor is None:
+            self.processing_timer.stop()
+            return
+        uploaded, processed, failed = monitor.counts()
+        text = "Processed {} / uploaded {}".format(processed, uploaded)
+        if failed:
+            text += " ({} failed)".format(failed)
+        self.l_processing.setText(text)
+        if (self.completed_tasks == self.total_tasks and not self.queue_running
+                and processed + failed == uploaded):
+            # Everything sent has been processed, stop polling
+            monitor.stop()
+            self.processing_monitor = None
+            self.processing_timer.stop()
 
     def thread_result(self, msg):
         if msg is not None:
@@ -697,143 +4134,387 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def thread_complete(self):
         if self.completed_tasks == self.total_tasks:
             self.l_info.setText("Done uploading")
-            self.pb_publish.setText("Publish")
-            self.isTransfering = False
+            self.finish_run()
 
-    def uploadToKitsu(self, i, task_type_dict, progress_callback):
-        if self.cancelTransfer is True:
-            self.isTransfering = False
-            self.pb_publish.setText("Publish")
-            self.l_info.setText("Canceled! Press the Fetch button to reset the progress bar | "
-                                "已取消，点击 Fetch 按钮重置进度条")
-            return
+    def finish_run(self):
+        # The end of a publish or of the publish queue, prepare_run undone
+        self.record_throughput()
+        self.ui_bus.flush()
+        self.concurrency.reset(1, 1, 1, enabled=False)
+        self.update_thread_count()
+        self.pb_publish.setText("Publish")
+        self.isTransfering = False
+        self.show_memory_summary()
 
-        self.isTransfering = True
-        self.pb_publish.setText("Cancel")
+    def upload_preview(self, preview_file, path, token, source=None, client=None):
+        # The file upload of gazu.task.add_preview, but streamed from disk
+        # so it can be aborted between two chunks. Sending it again to the
+        # same preview replaces the file. The client is the one of a mirror
+        # host, source the reader of a FileTee.
+        host = {} if client is None else {"client": client}
+        url = gazu.client.get_full_url("pictures/preview-files/{}".format(preview_file["id"]), **host)
+        body = MultipartFileStream(path, "file", token, source() if source is not None else None)
+        headers = gazu.client.make_auth_header(**host)
+        headers["Content-Type"] = body.content_type
+        headers["Content-Length"] = str(len(body))
+        client = client or getattr(gazu.client, "default_client", None)
+        post = client.session.post if client is not None else requests.post
         try:
-            status = self.tv_information.item(i, 0)
-            # exists = self.tv_information.item(i, 1)
-            episode = self.tv_information.item(i, 2)
-            sequence = self.tv_information.item(i, 3)
-            shot = self.tv_information.item(i, 4)
-            task = self.tv_information.item(i, 5)
-            framerange = self.tv_information.item(i, 6)
-            preview = self.tv_information.item(i, 7)
+            response = post(url, data=body, headers=headers)
+        finally:
+            body.close()
+        if response.status_code == 401:
+            raise gazu.exception.NotAuthenticatedException(url)
+        response.raise_for_status()
+        result = response.json()
+        if isinstance(result, dict) and result.get("message"):
+            raise gazu.exception.UploadFailedException(result["message"])
+        return result
+
+    def load_mirror_targets(self):
+        # Every [Mirror <name>] section of the config is an other host
+        config = configparser.ConfigParser()
+        config.read(self.config_file_path)
+        targets = []
+        for section in config.sections():
+            if not section.startswith("Mirror "):
+                continue
+            options = config[section]
+            targets.append(KitsuTarget(section[len("Mirror "):],
+                                       options.get("url", ""),
+                                       options.get("username", ""),
+                                       self.decrypt_password(options.get("password", "").encode()),
+                                       options.get("project") or None,
+                                       options.getint("rate", fallback=int(self.le_rate.text() or 0))))
+        return targets
+
+    def add_mirror(self):
+        fields = []
+        for label, echo in (("Name | 名称", QLineEdit.Normal),
+                            ("Kitsu URL", QLineEdit.Normal),
+                            ("Username | 用户名", QLineEdit.Normal),
+                            ("Password | 密码", QLineEdit.Password),
+                            ("Project, empty for the same name | 项目（留空则同名）", QLineEdit.Normal)):
+            text, accepted = QInputDialog.getText(self, "Add mirror | 添加镜像", label, echo)
+            if not accepted:
+                return
+            fields.append(text.strip())
+        name, url, username, password, project = fields
+        if not name or not url:
+            printMessage("A mirror needs a name and a URL | 镜像需要名称和地址")
+            return
+        section = "Mirror " + name
+        self.set_config_value(section, "url", removeLastSlash(url))
+        self.set_config_value(section, "username", username)
+        self.set_config_value(section, "password", self.encrypt_password(password).decode())
+        self.set_config_value(section, "project", project)
+        self.cb_mirrors.setChecked(True)
+        self.update_mirror_label()
+
+    def update_mirror_label(self):
+        config = configparser.ConfigParser()
+        config.read(self.config_file_path)
+        names = [section[len("Mirror "):] for section in config.sections() if section.startswith("Mirror ")]
+        self.cb_mirrors.setText("Also publish to the mirrors: {} | 同时上传到镜像".format(
+            ", ".join(names) if names else "none"))
+        self.cb_mirrors.setEnabled(bool(names))
+
+    def prepare_mirrors(self, first, settings, entity, token):
+        # The comment of a group on every mirror that has its shot and
+        # task. A mirror that doesn't is left out of this group only.
+        if "null" in first.task:
+            task_type_name = settings.null_task["name"]
+        else:
+            task_type_name = first.task_type_dict["name"]
+        posts = []
+        for target in self.mirror_targets:
+            try:
+                task, status, person = target.resolve(token, first, settings, task_type_name)
+                comment = add_comment_once(functools.partial(target.call, token), task, status, person)
+            except PublishCanceled:
+                raise
+            except LookupError as exc:
+                self.log_record({"outcome": "mirror skipped", "target": target.name,
+                                 "entity": entity, "message": str(exc)})
+                continue
+            except Exception as exc:
+                template = "An exception of type {0} occurred. Arguments:\n{1!r}"
+                self.log_record({"outcome": "mirror failed", "target": target.name, "entity": entity,
+                                 "message": template.format(type(exc).__name__, exc.args)})
+                continue
+            posts.append({"target": target, "task": task, "comment": comment,
+                          "claimed": set(), "previews": [], "failed": False})
+        return posts
+
+    def create_preview_file(self, call, task_dict, comment_dict, claimed):
+        # create_preview is a POST and is never sent twice, the upload of
+        # the file to the created id is retried on its own. claimed holds
+        # the previews of the comment already used by this run.
+        preview_file = call(gazu.task.create_preview, task_dict, comment_dict,
+                            recover=functools.partial(unclaimed_preview, comment_dict, claimed))
+        claimed.add(preview_file["id"])
+        return preview_file
+
+    def send_preview(self, call, task_dict, comment_dict, claimed, path, token):
+        preview_file = self.create_preview_file(call, task_dict, comment_dict, claimed)
+        return call(self.upload_preview, preview_file, path, token, measure="upload")
+
+    def upload_to_targets(self, call, path, task_dict, comment_dict, claimed, mirror_posts, entity, token):
+        # The file is read once and sent to the main host and every mirror
+        # at the same time. Each host keeps its own retries and result, a
+        # failed mirror never fails the main upload.
+        posts = [post for post in mirror_posts if not post["failed"]]
+        if not posts:
+            return self.send_preview(call, task_dict, comment_dict, claimed, path, token)
+        calls = [call] + [functools.partial(post["target"].call, token) for post in posts]
+        owners = [(task_dict, comment_dict, claimed)] + [(post["task"], post["comment"], post["claimed"])
+                                                         for post in posts]
+        results = [None] * len(calls)
+
+        def run_all(target, indexes):
+            threads = [threading.Thread(target=target, args=(index,)) for index in indexes]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        def create(index):
+            try:
+                results[index] = self.create_preview_file(calls[index], *owners[index])
+            except Exception as exc:
+                results[index] = exc
+
+        run_all(create, range(len(calls)))
+        # The file is only read once every preview exists, so each upload
+        # takes its reader right away and none holds the others back
+        # while its POST is still pending
+        created = [index for index, result in enumerate(results) if not isinstance(result, Exception)]
+        if created:
+            tee = FileTee(path, len(calls))
+            for index in set(range(len(calls))) - set(created):
+                tee.drop(index)
+
+            def send(index):
+                try:
+                    results[index] = calls[index](self.upload_preview, results[index], path, token,
+                                                  source=tee.source(index), measure="upload")
+                except Exception as exc:
+                    results[index] = exc
+                finally:
+                    tee.drop(index)
+
+            run_all(send, created)
+        for post, result in zip(posts, results[1:]):
+            if isinstance(result, Exception):
+                post["failed"] = True
+                if not isinstance(result, PublishCanceled):
+                    template = "An exception of type {0} occurred. Arguments:\n{1!r}"
+                    self.log_record({"outcome": "mirror failed", "target": post["target"].name,
+                                     "entity": entity, "file": path,
+                                     "message": template.format(type(result).__name__, result.args)})
+            else:
+                post["previews"].append((path, result))
+        if isinstance(results[0], Exception):
+            raise results[0]
+        return results[0]
+
+    def finish_mirrors(self, mirror_posts, entity, token):
+        for post in mirror_posts:
+            if not post["previews"]:
+                continue
+            try:
+                post["target"].call(token, gazu.task.set_main_preview, pick_main_preview(post["previews"]))
+            except PublishCanceled:
+                raise
+            except Exception as exc:
+                template = "An exception of type {0} occurred. Arguments:\n{1!r}"
+                self.log_record({"outcome": "mirror failed", "target": post["target"].name,
+                                 "entity": entity, "message": template.format(type(exc).__name__, exc.args)})
+                continue
+            self.log_record({"outcome": "mirrored", "target": post["target"].name, "entity": entity,
+                             "files": [path for path, _ in post["previews"]], "complete": not post["failed"]})
+
+    def uploadToKitsu(self, rows, settings, tracker, progress_callback):
+        # rows is a list of PublishRow that all resolve to the same task.
+        # They are posted together under a single comment. The tracker
+        # (this window for the table, or a PublishJob) follows the rows.
+        token = self.cancel_token
+        # The retries of the settings snapshot, never re-read mid-publish
+        call = functools.partial(self.kitsu_call, attempts=settings.retries)
+        if token.cancelled:
+            return  # finish_cancel reports the end state
 
+        first = rows[0]
+        row_numbers = [row.row for row in rows]
+        entity = "/".join(name for name in (first.episode if settings.has_episode == 1 else "",
+                                            first.sequence, first.shot, first.task) if name)
+        started = time.monotonic()
+        preview_dicts = []
+
+        def finish():
+            for row in rows:
+                tracker.row_done(row.row)
+
+        def show_current(row):
+            self.post_info("Uploading with {} threads... This can take a while. Current file: {}".format(
+                self.threadpool.maxThreadCount(), row.filesize))
+
+        try:
             # Update some info
-            status.setText("Uploading")
-            progress_callback.emit(0, self.tv_information.item(i, 8))
+            for row in rows:
+                tracker.post_row_status(row.row, "Uploading")
+            show_current(first)
 
             # About creating new entries:
             # We use Kitsu to handle this process.
             # To avoid confusion, the statements for creating new entries have been disabled.
             # However, this is a very cool feature—
             # if you'd like to use it, simply uncomment "{entry}_dict = gazu.shot.new_{entry}()" statement.
-            if self.has_episode == 1:
-                episode_msg_str = episode.text() + "/"
+            if settings.has_episode == 1:
+                episode_msg_str = first.episode + "/"
                 # Fix Episode
-                episode_dict = gazu.shot.get_episode_by_name(self.cb_project.currentData(),
-                                                             episode.text())
+                episode_dict = call(gazu.shot.get_episode_by_name,
+                                    settings.project,
+                                    first.episode)
                 if episode_dict is None:
-                    #episode_dict = gazu.shot.new_episode(self.cb_project.currentData(),
-                    #                                       episode.text())
-                    progress_callback.emit(1, i)
-                    status.setText("Done")
+                    #episode_dict = gazu.shot.new_episode(settings.project,
+                    #                                       first.episode)
+                    finish()
                     self.log_message(f"\nThere is no data for this episode on Kitsu |\nKitsu上没有这一集的数据："
-                                     f"\n{episode.text()}")
+                                     f"\n{first.episode}",
+                                     outcome="no episode", rows=row_numbers, entity=entity)
                     return
 
                 # Fix Sequence
-                sequence_dict = gazu.shot.get_sequence_by_name(self.cb_project.currentData(),
-                                                               sequence.text(),
-                                                               episode_dict)
+                sequence_dict = call(gazu.shot.get_sequence_by_name,
+                                     settings.project,
+                                     first.sequence,
+                                     episode_dict)
                 if sequence_dict is None:
-                    #sequence_dict = gazu.shot.new_sequence(self.cb_project.currentData(),
-                    #                                       sequence.text(),
+                    #sequence_dict = gazu.shot.new_sequence(settings.project,
+                    #                                       first.sequence,
                     #                                       episode_dict)
-                    progress_callback.emit(1, i)
-                    status.setText("Done")
+                    finish()
                     self.log_message(f"\nThere is no data for this sequence on Kitsu |\nKitsu上没有这一场的数据："
-                                     f"\n{episode_msg_str}{sequence.text()}")
+                                     f"\n{episode_msg_str}{first.sequence}",
+                                     outcome="no sequence", rows=row_numbers, entity=entity)
                     return
             else:
-                episode.setText("")
+                for row in rows:
+                    tracker.post_cell(row.row, 2, "")
                 episode_msg_str = ""
                 # Fix Sequence
-                sequence_dict = gazu.shot.get_sequence_by_name(self.cb_project.currentData(),
-                                                               sequence.text())
+                sequence_dict = call(gazu.shot.get_sequence_by_name,
+                                     settings.project,
+                                     first.sequence)
                 if sequence_dict is None:
-                    #sequence_dict = gazu.shot.new_sequence(self.cb_project.currentData(),
-                    #                                       sequence.text())
-                    progress_callback.emit(1, i)
-                    status.setText("Done")
+                    #sequence_dict = gazu.shot.new_sequence(settings.project,
+                    #                                       first.sequence)
+                    finish()
                     self.log_message(f"\nThere is no data for this sequence on Kitsu |\nKitsu上没有这一场的数据："
-                                     f"\n{sequence.text()}")
+                                     f"\n{first.sequence}",
+                                     outcome="no sequence", rows=row_numbers, entity=entity)
                     return
 
             # Fix Shot
             already_uploaded = True
-            shot_dict = gazu.shot.get_shot_by_name(
-                sequence_dict, shot.text())
+            shot_dict = call(gazu.shot.get_shot_by_name,
+                             sequence_dict, first.shot)
             if shot_dict is None:
-                #shot_dict = gazu.shot.new_shot(self.cb_project.currentData(),
+                #shot_dict = gazu.shot.new_shot(settings.project,
                 #                               sequence_dict,
-                #                               shot.text(),
-                #                               nb_frames=framerange.text())
-                progress_callback.emit(1, i)
-                status.setText("Done")
+                #                               first.shot,
+                #                               nb_frames=first.frames)
+                finish()
                 self.log_message(f"\nThere is no data for this shot on Kitsu |\nKitsu上没有这个镜头的数据："
-                                 f"\n{episode_msg_str}{sequence.text()}/{shot.text()}")
+                                 f"\n{episode_msg_str}{first.sequence}/{first.shot}",
+                                 outcome="no shot", rows=row_numbers, entity=entity)
                 return
                 already_uploaded = False
             # Add preview
-            if already_uploaded is False or self.cb_reupload.isChecked() is True:
-                if "null" in task.text():
-                    if self.cb_task.currentText() == "Don't post | 不上传":
-                            progress_callback.emit(1, i)
-                            status.setText("Done")
-                            return
+            if already_uploaded is False or settings.reupload is True:
+                if "null" in first.task:
+                    if settings.null_task_name == "Don't post | 不上传":
+                        self.log_record({"outcome": "not posted", "rows": row_numbers, "entity": entity})
+                        finish()
+                        return
                     else:
-                        task_dict = gazu.task.get_task_by_name(shot_dict, self.cb_task.currentData())
+                        task_dict = call(gazu.task.get_task_by_name,
+                                         shot_dict, settings.null_task)
                         if task_dict is None:
-                            #task_dict = gazu.task.new_task(shot_dict, self.cb_task.currentData())
+                            #task_dict = gazu.task.new_task(shot_dict, settings.null_task)
                             self.log_message(f"\nThere is no data for this task on Kitsu |\nKitsu上没有这个环节的数据："
-                                             f"\n{episode_msg_str}{sequence.text()}/{shot.text()}/{self.cb_task.currentText()}")
-                            progress_callback.emit(1, i)
-                            status.setText("Done")
+                                             f"\n{episode_msg_str}{first.sequence}/{first.shot}/{settings.null_task_name}",
+                                             outcome="no task", rows=row_numbers, entity=entity)
+                            finish()
                             return
 
                 else:
-                    task_dict = gazu.task.get_task_by_name(shot_dict, task_type_dict)
+                    task_dict = call(gazu.task.get_task_by_name, shot_dict, first.task_type_dict)
                     if task_dict is None:
-                        #task_dict = gazu.task.new_task(shot_dict, task_type_dict)
+                        #task_dict = gazu.task.new_task(shot_dict, first.task_type_dict)
                         self.log_message(f"\nThere is no data for this task on Kitsu |\nKitsu上没有这个环节的数据："
-                                         f"\n{episode_msg_str}{sequence.text()}/{shot.text()}/{task.text()}")
-                        progress_callback.emit(1, i)
-                        status.setText("Done")
+                                         f"\n{episode_msg_str}{first.sequence}/{first.shot}/{first.task}",
+                                         outcome="no task", rows=row_numbers, entity=entity)
+                        finish()
                         return
 
-                previews = gazu.files.get_all_preview_files_for_task(
-                    task_dict)
-                person = gazu.person.get_person_by_email(
-                    self.le_username.text())
-                comment_dict = gazu.task.add_comment(
-                    task_dict,
-                    self.cb_status.currentData(),
-                    "",
-                    person
-                )
-                preview_dict = gazu.task.add_preview(
-                    task_dict,
-                    comment_dict,
-                    preview.text()
-                )
-                gazu.task.set_main_preview(preview_dict)
-            status.setText("Done")
-            progress_callback.emit(1, i)
+                resolved = time.monotonic()
+                previews = call(gazu.files.get_all_preview_files_for_task,
+                                task_dict)
+                person = call(gazu.person.get_person_by_email,
+                              settings.username)
+                if self.processing_monitor is not None:
+                    self.processing_monitor.wait_for_capacity(lambda: self.cancelTransfer)
+                token.raise_if_cancelled()
+                comment_dict = add_comment_once(call, task_dict, settings.status, person)
+                claimed = set()
+                mirror_posts = self.prepare_mirrors(first, settings, entity, token)
+                for row in rows:
+                    if row is not first:
+                        show_current(row)
+                        if self.processing_monitor is not None:
+                            self.processing_monitor.wait_for_capacity(lambda: self.cancelTransfer)
+                    upload_started = time.monotonic()
+                    preview_dict = self.upload_to_targets(call,
+                                                          row.preview,
+                                                          task_dict,
+                                                          comment_dict,
+                                                          claimed,
+                                                          mirror_posts,
+                                                          entity,
+                                                          token)
+                    size = os.path.getsize(row.preview)
+                    self.concurrency.record_upload(size)
+                    with self.progress_lock:
+                        self.run_stats["bytes"] += size
+                    self.log_record({"outcome": "uploaded", "row": row.row, "entity": entity,
+                                     "file": row.preview, "bytes": size,
+                                     "timings": {"resolve": round(resolved - started, 3),
+                                                 "upload": round(time.monotonic() - upload_started, 3)}})
+                    if self.processing_monitor is not None:
+                        self.processing_monitor.add(preview_dict["id"])
+                    preview_dicts.append((row.preview, preview_dict))
+                # Only one main preview per task, so the result doesn't
+                # depend on which upload finishes last
+                call(gazu.task.set_main_preview, pick_main_preview(preview_dicts))
+                self.finish_mirrors(mirror_posts, entity, token)
+            else:
+                self.log_record({"outcome": "shot exists, not re-uploaded", "rows": row_numbers,
+                                 "entity": entity})
+            finish()
+        except PublishCanceled:
+            for row in rows:
+                tracker.post_row_status(row.row, "Canceled")
+            self.log_record({"outcome": "canceled", "rows": row_numbers, "entity": entity,
+                             "uploaded": [path for path, _ in preview_dicts],
+                             "timings": {"total": round(time.monotonic() - started, 3)}})
         except Exception as exc:
             template = "An exception of type {0} occurred. Arguments:\n{1!r}"
             message = template.format(type(exc).__name__, exc.args)
+            self.log_record({"outcome": "failed", "rows": row_numbers, "entity": entity,
+                             "message": message,
+                             "timings": {"total": round(time.monotonic() - started, 3)}})
             return message
 
     def closeEvent(self, event):
@@ -849,10 +4530,12 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             action = msg.exec_()
 
             if action == 0:
+                self.logger.close()
                 event.accept()
             else:
                 event.ignore()
         else:
+            self.logger.close()
             event.accept()
 
     def general_path(self):
@@ -863,8 +4546,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.config_file_path = os.path.join(self.config_path, ".config.ini")
         self.key_file_path = os.path.join(self.config_path, ".secret.key")
         self.log_file_path = os.path.join(self.config_path, "Publish_log.txt")
+        self.jsonl_log_path = os.path.join(self.config_path, "publish_log.jsonl")
 
-    def load_config(self):
+    def load_config(self, login=True):
         config = configparser.ConfigParser()
         if os.path.exists(self.config_file_path):
             config.read(self.config_file_path)
@@ -873,15 +4557,42 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             encrypted_password = config.get("Login", "password", fallback="")
             if encrypted_password:
                 self.le_password.setText(self.decrypt_password(encrypted_password.encode()))
-                self.login(refresh=True)
+                cached = self.session.load_cached_reference(
+                    self.le_kitsuURL.text(), self.le_username.text(),
+                    self.config_value("Login", "cache_days", 7, float) * 86400)
+                if cached:
+                    self.show_reference_data(cached)
+                if login:
+                    self.login(refresh=True)
+
+    def config_value(self, section, option, fallback, value_type=str):
+        config = configparser.ConfigParser()
+        config.read(self.config_file_path)
+        try:
+            return value_type(config.get(section, option, fallback=fallback))
+        except ValueError:
+            return fallback
+
+    def set_config_value(self, section, option, value):
+        config = configparser.ConfigParser()
+        config.read(self.config_file_path)
+        if not config.has_section(section):
+            config.add_section(section)
+        config.set(section, option, str(value))
+        with open(self.config_file_path, "w") as configfile:
+            config.write(configfile)
 
     def save_config(self):
         config = configparser.ConfigParser()
-        config["Login"] = {
+        # Keep the other sections and options, only the login keys are rewritten
+        config.read(self.config_file_path)
+        if not config.has_section("Login"):
+            config.add_section("Login")
+        config["Login"].update({
             "url": self.le_kitsuURL.text(),
             "username": self.le_username.text(),
             "password": self.encrypt_password(self.le_password.text()).decode(),
-            }
+            })
         with open(self.config_file_path, "w") as configfile:
             config.write(configfile)
 
@@ -905,17 +4616,28 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         decrypted_password = f.decrypt(encrypted_password).decode()
         return decrypted_password
 
-    def log_message(self, message):
-        with open(self.log_file_path, "a") as log_file:
-            log_file.write(message + "\n")
-        print(message)
+    def log_message(self, message, outcome="skipped", **fields):
+        # A line for the readable summary plus a structured record
+        fields["outcome"] = outcome
+        fields["message"] = message.strip()
+        self.log_record(fields, text=message)
+
+    def log_record(self, record, text=None):
+        # Only queued here, the logger thread does the writing
+        record = dict(record, time=datetime.now().isoformat(timespec="seconds"), run=self.log_run)
+        self.logger.write(text, record)
+        if text is not None:
+            print(text)
 
-    def clear_log(self):
-        with open(self.log_file_path, "w") as log_file:
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_file.write("===The following preview files have not been uploaded\n"
-                           "===以下视频文件没有被上传\n"
-                           f"\n{current_time}\n")
+    def start_log_run(self):
+        # Earlier runs are kept, every run starts with its own header
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.log_run = current_time
+        self.logger.write("\n===The following preview files have not been uploaded\n"
+                          "===以下视频文件没有被上传\n"
+                          f"\n{current_time}",
+                          {"time": datetime.now().isoformat(timespec="seconds"),
+                           "run": current_time, "outcome": "run started"})
 
     def open_file(self, file_name, path_chosen=0):
         if path_chosen == 0:
@@ -970,21 +4692,468 @@ def pretty_size(bytes):
     return str(amount) + suffix
 
 
-def run_fast_scandir(dir, ext):    # dir: str, ext: list
-    subfolders, files = [], []
+class ScanFilter(object):
+    '''
+    Include/exclude globs and a depth limit for the folder scanner.
+
+    Patterns are separated by ";" and compiled once into one regex per list.
+    They are matched case-insensitively against the entry name and against
+    its path relative to the scanned folder with "/" separators, so "_old",
+    "renders/tmp" and "*cache*" all work. Like in a .gitignore, a pattern
+    with a "/" matches at any depth ("renders/tmp" also prunes
+    "shots/sq010/renders/tmp"), one starting with "/" only from the scanned
+    folder. Include only applies to files, exclude also prunes folders. A
+    max depth of 0 means no limit.
+
+    '''
+
+    def __init__(self, include="", exclude="", max_depth=0):
+        self.include = self.compile(include)
+        self.exclude = self.compile(exclude)
+        self.max_depth = max_depth or 0
+
+    @staticmethod
+    def compile(patterns):
+        regexes = []
+        for glob in (patterns or "").split(";"):
+            glob = glob.strip().replace("\\", "/")
+            anchored = glob.startswith("/")
+            glob = glob.strip("/")
+            if not glob:
+                continue
+            regex = fnmatch.translate(glob)
+            if "/" in glob and not anchored:
+                # Any folder of the relative path can start the match
+                regex = "(?:.*/)?" + regex
+            regexes.append(regex)
+        if not regexes:
+            return None
+        return re.compile("|".join(regexes), re.IGNORECASE)
+
+    @staticmethod
+    def matches(regex, name, relative):
+        return regex.match(name) is not None or regex.match(relative) is not None
+
+    def skip_folder(self, name, relative, depth):
+        # depth is 1 for the folders directly under the scanned folder
+        if self.max_depth and depth > self.max_depth:
+            return True
+        return self.exclude is not None and self.matches(self.exclude, name, relative)
+
+    def accept_file(self, name, relative):
+        if self.exclude is not None and self.matches(self.exclude, name, relative):
+            return False
+        return self.include is None or self.matches(self.include, name, relative)
+
+
+def iter_fast_scandir(dir, ext, scan_filter=None, prefix="", depth=0):    # dir: str, ext: list
+    # Files of the folder first, then each subfolder in turn. Files are
+    # yielded as they are found, so the rest of a fetch can start on them.
+    # Folders rejected by the filter are never opened.
+    subfolders = []
 
     for f in os.scandir(dir):
+        relative = prefix + f.name
         if f.is_dir():
-            subfolders.append(f.path)
+            if scan_filter is None or not scan_filter.skip_folder(f.name, relative, depth + 1):
+                subfolders.append((f.path, relative + "/"))
         if f.is_file():
             if os.path.splitext(f.name)[1].lower() in ext:
-                files.append(f.path)
+                if scan_filter is None or scan_filter.accept_file(f.name, relative):
+                    yield f.path
+
+    for dir, prefix in subfolders:
+        yield from iter_fast_scandir(dir, ext, scan_filter, prefix, depth + 1)
+
+
+# Accepted CSV headers (lower case) for every manifest field
+MANIFEST_COLUMNS = {
+    "episode": ("episode", "ep"),
+    "sequence": ("sequence", "seq", "sq"),
+    "shot": ("shot", "shot name", "name"),
+    "task": ("task", "task type"),
+    "file": ("file", "source", "source file", "path", "preview"),
+    "frames": ("frames", "frame count", "nb_frames", "duration"),
+}
+
+EDL_EVENT = re.compile(
+    r"^(\d+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(?:\d+\s+)?"
+    r"(\d\d:\d\d:\d\d[:;.]\d\d)\s+(\d\d:\d\d:\d\d[:;.]\d\d)\s+"
+    r"(\d\d:\d\d:\d\d[:;.]\d\d)\s+(\d\d:\d\d:\d\d[:;.]\d\d)\s*$"
+)
+
+
+def read_manifest(path, fps=24):
+    """Stream the entries of a CSV or CMX3600 EDL manifest.
+    Every entry is a dict with the keys of MANIFEST_COLUMNS.
+    Fields the manifest doesn't provide are None.
+    """
+    if os.path.splitext(path)[1].lower() == ".edl":
+        return iter_edl_manifest(path, fps)
+    return iter_csv_manifest(path, fps)
+
+
+def iter_csv_manifest(path, fps):
+    base_dir = os.path.dirname(path)
+    with open(path, newline="", encoding="utf-8-sig") as manifest:
+        try:
+            dialect = csv.Sniffer().sniff(manifest.read(4096), delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        manifest.seek(0)
+        reader = csv.reader(manifest, dialect)
+        header = [column.strip().lower() for column in next(reader, [])]
+        columns = {}
+        for field, names in MANIFEST_COLUMNS.items():
+            for name in names:
+                if name in header:
+                    columns[field] = header.index(name)
+                    break
+        if "shot" not in columns or "file" not in columns:
+            raise ValueError("The manifest needs at least a shot and a file column")
+
+        for line in reader:
+            if not any(cell.strip() for cell in line):
+                continue
+            entry = dict.fromkeys(MANIFEST_COLUMNS)
+            for field, index in columns.items():
+                if index < len(line) and line[index].strip():
+                    entry[field] = line[index].strip()
+            if entry["shot"] is None or entry["file"] is None:
+                continue
+            entry["file"] = os.path.normpath(os.path.join(base_dir, entry["file"]))
+            if entry["frames"] is not None:
+                entry["frames"] = duration_to_frames(entry["frames"], fps)
+            yield entry
+
+
+def iter_edl_manifest(path, fps):
+    base_dir = os.path.dirname(path)
+    event = None
+    with open(path, encoding="utf-8", errors="replace") as manifest:
+        for line in manifest:
+            line = line.strip()
+            match = EDL_EVENT.match(line)
+            if match:
+                # The two lines of a dissolve share the event number, the
+                # second one (the incoming clip) is the event
+                if event is not None and event["number"] != match.group(1):
+                    entry = edl_event_entry(event, base_dir)
+                    if entry is not None:
+                        yield entry
+                reel, track = match.group(2), match.group(3)
+                event = {
+                    "number": match.group(1),
+                    "reel": reel,
+                    "video": track.upper().startswith("V") and reel.upper() not in ("BL", "BLK"),
+                    "frames": (timecode_to_frames(match.group(8), fps)
+                               - timecode_to_frames(match.group(7), fps)),
+                }
+            elif event is not None and line.startswith("*"):
+                key, _, value = line[1:].partition(":")
+                key = key.strip().upper()
+                value = value.strip()
+                if key == "FROM CLIP NAME":
+                    event["clip"] = value
+                elif key == "TO CLIP NAME":
+                    event["to_clip"] = value
+                elif key == "SOURCE FILE":
+                    event["file"] = value
+                elif key == "LOC":
+                    # * LOC: 01:00:00:00 YELLOW  Shot010
+                    loc_parts = value.split(None, 2)
+                    if len(loc_parts) == 3:
+                        event["shot"] = loc_parts[2].strip()
+        if event is not None:
+            entry = edl_event_entry(event, base_dir)
+            if entry is not None:
+                yield entry
+
+
+def edl_event_entry(event, base_dir):
+    if not event["video"]:
+        return None
+    source = event.get("file") or event.get("to_clip") or event.get("clip")
+    if not source:
+        return None
+    entry = dict.fromkeys(MANIFEST_COLUMNS)
+    # Without a LOC the shot is left to the rules, applied to the clip
+    entry["shot"] = event.get("shot")
+    entry["file"] = os.path.normpath(os.path.join(base_dir, source))
+    entry["frames"] = event["frames"]
+    return entry
+
+
+def timecode_to_frames(timecode, fps):
+    hours, minutes, seconds, frames = (int(part) for part in re.split(r"[:;.]", timecode))
+    rate = int(round(fps))
+    return ((hours * 60 + minutes) * 60 + seconds) * rate + frames
+
+
+def duration_to_frames(duration, fps):
+    if re.match(r"^\d+:\d+:\d+[:;.]\d+$", duration):
+        return timecode_to_frames(duration, fps)
+    try:
+        return int(float(duration))
+    except ValueError:
+        return None
+
+
+def split_name(file, delimiter, use_folder):
+    # The fields the rules pick from: the file name split by the delimiter,
+    # prefixed by the folders of its path when useFolder is checked
+    if use_folder:
+        normpath = os.path.normpath(file)
+        path_parts = normpath.split(os.sep)
+        filename = os.path.splitext(path_parts[-1])[0]
+        name_parts = filename.split(delimiter)
+        return path_parts[: -1] + name_parts
+    return os.path.splitext(os.path.basename(file))[0].split(delimiter)
+
+
+def sample_files(dir, ext, subfolders, limit, scan_filter=None, progress_callback=None):
+    # Breadth first so the sample covers the top of the tree quickly
+    scan_filter = scan_filter or ScanFilter()
+    files = []
+    folders = [(dir, "", 0)]
+    while folders and len(files) < limit:
+        folder, prefix, depth = folders.pop(0)
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            continue
+        for entry in entries:
+            relative = prefix + entry.name
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in ext:
+                if scan_filter.accept_file(entry.name, relative):
+                    files.append(entry.path)
+                    if len(files) >= limit:
+                        break
+            elif subfolders and entry.is_dir():
+                if not scan_filter.skip_folder(entry.name, relative, depth + 1):
+                    folders.append((entry.path, relative + "/", depth + 1))
+    return files
+
+
+def build_shot_ids(episodes, sequences, shots):
+    # {(episode name, sequence name, shot name): shot id}
+    episode_names = dict((episode["id"], episode["name"]) for episode in episodes)
+    sequence_keys = dict((sequence["id"], (episode_names.get(sequence.get("parent_id"), ""),
+                                           sequence["name"]))
+                         for sequence in sequences)
+    shot_ids = {}
+    for shot in shots:
+        sequence_key = sequence_keys.get(shot.get("parent_id"))
+        if sequence_key is not None:
+            shot_ids[sequence_key + (shot["name"],)] = shot["id"]
+    return shot_ids
+
+
+def plan_publish(groups, settings, shot_ids, task_keys, skipped_rows=0):
+    # Walks the upload groups the way uploadToKitsu does, against the
+    # project data instead of the server. Nothing is written.
+    # task_keys: set of (shot id, task type id) of the existing tasks.
+    lookups = 3 if settings.has_episode == 1 else 2  # episode, sequence, shot
+    plan = {"groups": 0, "rows": 0, "comments": 0, "previews": 0, "bytes": 0,
+            "api_calls": 0, "skipped": Counter()}
+    if skipped_rows:
+        plan["skipped"]["older version"] = skipped_rows
+    for rows in groups:
+        first = rows[0]
+        episode = first.episode if settings.has_episode == 1 else ""
+        shot_id = shot_ids.get((episode, first.sequence, first.shot))
+        plan["api_calls"] += lookups
+        if shot_id is None:
+            plan["skipped"]["no shot on Kitsu"] += len(rows)
+            continue
+        if not settings.reupload:
+            plan["skipped"]["shot exists, not re-uploaded"] += len(rows)
+            continue
+        if "null" in first.task:
+            if settings.null_task_name == "Don't post | 不上传":
+                plan["skipped"]["null task, not posted"] += len(rows)
+                continue
+            task_type = settings.null_task
+        else:
+            task_type = first.task_type_dict
+        plan["api_calls"] += 1  # task
+        if (shot_id, task_type["id"]) not in task_keys:
+            plan["skipped"]["no task on Kitsu"] += len(rows)
+            continue
+        missing = [row for row in rows if not os.path.isfile(row.preview)]
+        if missing:
+            # The upload of the group would fail on the first missing file
+            plan["skipped"]["missing file"] += len(rows)
+            continue
+        plan["groups"] += 1
+        plan["rows"] += len(rows)
+        plan["comments"] += 1
+        plan["previews"] += len(rows)
+        plan["bytes"] += sum(os.path.getsize(row.preview) for row in rows)
+        # previews, person, comment, then per file create + upload, and
+        # the main preview
+        plan["api_calls"] += 3 + 2 * len(rows) + 1
+    return plan
+
 
-    for dir in list(subfolders):
-        sf, f = run_fast_scandir(dir, ext)
-        subfolders.extend(sf)
-        files.extend(f)
-    return subfolders, files
+def estimate_duration(history, total_bytes, api_calls):
+    # history: [{"bytes", "calls", "seconds"}, ...] of earlier runs. Fits
+    # seconds = bytes * a + calls * b by least squares, or uses the byte
+    # rate alone while the runs can't tell the two apart. None without
+    # any history.
+    if not history:
+        return None
+    bb = sum(run["bytes"] ** 2 for run in history)
+    bc = sum(run["bytes"] * run["calls"] for run in history)
+    cc = sum(run["calls"] ** 2 for run in history)
+    bs = sum(run["bytes"] * run["seconds"] for run in history)
+    cs = sum(run["calls"] * run["seconds"] for run in history)
+    determinant = bb * cc - bc * bc
+    if len(history) >= 2 and determinant > 1e-9 * bb * cc:
+        per_byte = (bs * cc - cs * bc) / determinant
+        per_call = (cs * bb - bs * bc) / determinant
+        if per_byte >= 0 and per_call >= 0:
+            return total_bytes * per_byte + api_calls * per_call
+    seconds = sum(run["seconds"] for run in history)
+    measured_bytes = sum(run["bytes"] for run in history)
+    if measured_bytes:
+        return total_bytes * seconds / measured_bytes
+    return api_calls * seconds / max(1, sum(run["calls"] for run in history))
+
+
+def pretty_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "{}h {:02d}m".format(hours, minutes)
+    return "{}m {:02d}s".format(minutes, seconds)
+
+
+PATTERN_FIELDS = ("ep", "sq", "shot", "task", "version")
+# Version token of a file name in rule mode, "_v003" or ".v12". Can be
+# replaced with [Fetch] version_regex, group 1 holds the number.
+VERSION_TOKEN = r"(?:^|[._\- ])v(\d+)(?=$|[._\- ])"
+
+
+def compile_name_pattern(pattern):
+    # A pattern with named groups is used as a regular expression. Anything
+    # else is a template like {ep}_{sq}_{shot}_{task}_v{version} where each
+    # field stops at the next literal text, {*} matches anything.
+    if "(?P<" in pattern:
+        return re.compile(pattern)
+    parts = re.split(r"\{(\w+|\*)\}", pattern)
+    regex = []
+    for position, part in enumerate(parts):
+        if position % 2 == 0:
+            regex.append(re.escape(part))
+        elif part == "*":
+            regex.append(".*?")
+        elif part in PATTERN_FIELDS:
+            regex.append(r"(?P<{}>[^/\\]+?)".format(part))
+        else:
+            raise re.error("Unknown field {{{}}}, use one of {}".format(part, ", ".join(PATTERN_FIELDS)))
+    return re.compile("^" + "".join(regex) + "$")
+
+
+def match_name_pattern(compiled, file, full_path):
+    # One pass per file: every field at once, None when the path doesn't fit
+    if full_path:
+        subject = os.path.splitext(os.path.normpath(file))[0].replace(os.sep, "/")
+    else:
+        subject = os.path.splitext(os.path.basename(file))[0]
+    match = compiled.search(subject)
+    if match is None:
+        return None
+    groups = match.groupdict()
+    return dict((field, groups.get(field) or "") for field in PATTERN_FIELDS)
+
+
+def parse_version(file, version_token, field=None):
+    # Version number of a preview, from the pattern field when there is one
+    # or else from the last version token of the file name. None if none.
+    if field:
+        digits = re.sub(r"\D", "", field)
+        if digits:
+            return int(digits)
+    matches = version_token.findall(os.path.splitext(os.path.basename(file))[0])
+    return int(matches[-1]) if matches else None
+
+
+def superseded_status(version):
+    return "Skipped (superseded by v{:03d})".format(version)
+
+
+def normalize_name(name):
+    # "SQ_010", "sq10" and "Sq010" all become "sq10"
+    parts = re.findall(r"[a-z]+|\d+", (name or "").lower())
+    return "".join((part.lstrip("0") or "0") if part.isdigit() else part for part in parts)
+
+
+def trigrams(text):
+    text = "  " + text + " "
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def poster_frame(path, height):
+    # First frame of a movie or the still itself, scaled to the height and
+    # encoded as JPEG. None when the file can't be decoded.
+    if os.path.splitext(path)[1].lower() in (".mov", ".mp4"):
+        capture = cv2.VideoCapture(path)
+        try:
+            ok, frame = capture.read()
+        finally:
+            capture.release()
+        if not ok:
+            return None
+    else:
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+    width = max(1, int(frame.shape[1] * height / frame.shape[0]))
+    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return data.tobytes() if ok else None
+
+
+def write_snapshot(path, snapshot):
+    # Columnar JSON: every column is one list, which compresses far better
+    # than rows and loads with a single json.loads
+    data = zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"), 6)
+    with open(path + ".tmp", "wb") as snapshot_file:
+        snapshot_file.write(SNAPSHOT_MAGIC)
+        snapshot_file.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def read_snapshot(path):
+    with open(path, "rb") as snapshot_file:
+        if snapshot_file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError("Not a Kitsu Publisher fetch file")
+        return json.loads(zlib.decompress(snapshot_file.read()).decode("utf-8"))
+
+
+def write_snapshot_csv(path, snapshot):
+    # Written row by row, the rows are never built as a whole
+    columns = [snapshot["columns"][name] for name in SNAPSHOT_COLUMNS]
+    with open(path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(SNAPSHOT_COLUMNS + ("shot id",))
+        for values in zip(*columns, snapshot["shot_ids"]):
+            writer.writerow(values)
+
+
+def rotate_file(path, backups):
+    # log.txt -> log.1.txt -> log.2.txt ... the oldest one is dropped
+    base, ext = os.path.splitext(path)
+    for index in range(backups - 1, 0, -1):
+        older = "{}.{}{}".format(base, index, ext)
+        if os.path.exists(older):
+            os.replace(older, "{}.{}{}".format(base, index + 1, ext))
+    if os.path.exists(path):
+        if backups > 0:
+            os.replace(path, "{}.1{}".format(base, ext))
+        else:
+            os.remove(path)
 
 
 def removeLastSlash(adress):
@@ -995,7 +5164,21 @@ def removeLastSlash(adress):
 
 
 if (__name__ == '__main__'):
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Kitsu Publisher")
+    parser.add_argument("--worker", metavar="QUEUE",
+                        help="work a shared publish queue without a window, using the saved login")
+    parser.add_argument("--watch", action="store_true",
+                        help="run the watch last started in the GUI without a window, until Ctrl+C")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="number of parallel uploads of the worker or the watch")
+    args, qt_args = parser.parse_known_args()
+    if args.worker or args.watch:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv[:1] + qt_args)
+    if args.worker:
+        sys.exit(MainWindow(headless=True).run_headless_worker(args.worker, args.threads))
+    if args.watch:
+        sys.exit(MainWindow(headless=True).run_headless_watch(args.threads))
     mainWindow = MainWindow()
     mainWindow.show()
     sys.exit(app.exec_())
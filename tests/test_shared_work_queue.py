@@ -0,0 +1,112 @@
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+spec = importlib.util.spec_from_file_location("kitsu_publisher", os.path.join(ROOT, "Kitsu Publisher.py"))
+kitsu_publisher = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(kitsu_publisher)
+
+SharedWorkQueue = kitsu_publisher.SharedWorkQueue
+PublishSettings = kitsu_publisher.PublishSettings
+PublishRow = kitsu_publisher.PublishRow
+
+
+def publish_row(row):
+    return PublishRow(row, {"name": "Comp"}, "", "SQ010", "SH{:04d}".format(row * 10),
+                      "Comp", "24", "/previews/{}.mov".format(row), "1.0 MB")
+
+
+class SharedWorkQueueTest(unittest.TestCase):
+    '''
+    The queue on a local folder standing for the share, with a clock the
+    tests move by hand to expire leases.
+
+    '''
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "plan.kpq")
+        self.now = 1000.0
+        clock = mock.patch.object(kitsu_publisher.time, "time", lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def make_queue(self, groups=2, lease=60, max_attempts=3):
+        work_queue = SharedWorkQueue(self.path, lease=lease, max_attempts=max_attempts)
+        settings = PublishSettings({"id": "project", "name": "Demo"}, 0, "user@studio", False,
+                                   None, "Don't post | 不上传", None)
+        work_queue.add_plan("https://kitsu.example", settings, [[publish_row(row)] for row in range(groups)])
+        return work_queue
+
+    def test_claim_leases_every_item_once(self):
+        work_queue = self.make_queue()
+        first = work_queue.claim("ws-1")
+        second = work_queue.claim("ws-2")
+        self.assertNotEqual(first[0], second[0])
+        self.assertEqual(first[2], [publish_row(0)])
+        self.assertEqual(first[1].username, "user@studio")
+        self.assertIsNone(work_queue.claim("ws-3"))
+        self.assertEqual(work_queue.counts(), {"leased": 2})
+        self.assertEqual(work_queue.host(), "https://kitsu.example")
+
+    def test_expired_lease_is_claimed_again(self):
+        work_queue = self.make_queue(groups=1)
+        item_id = work_queue.claim("ws-1")[0]
+        self.now += 30
+        self.assertIsNone(work_queue.claim("ws-2"))
+        self.now += 31
+        self.assertEqual(work_queue.claim("ws-2")[0], item_id)
+
+    def test_renewed_lease_is_kept(self):
+        work_queue = self.make_queue(groups=1)
+        work_queue.claim("ws-1")
+        self.now += 50
+        work_queue.renew("ws-1")
+        self.now += 50
+        self.assertIsNone(work_queue.claim("ws-2"))
+
+    def test_complete_after_losing_the_lease_is_rejected(self):
+        work_queue = self.make_queue(groups=1)
+        item_id = work_queue.claim("ws-1")[0]
+        self.now += 61
+        self.assertEqual(work_queue.claim("ws-2")[0], item_id)
+        self.assertIsNone(work_queue.complete(item_id, "ws-1"))
+        self.assertEqual(work_queue.counts(), {"leased": 1})
+        self.assertEqual(work_queue.complete(item_id, "ws-2"), "done")
+        self.assertEqual(work_queue.counts(), {"done": 1})
+        self.assertEqual(work_queue.outstanding(), 0)
+
+    def test_failed_item_is_retried_up_to_the_cap(self):
+        work_queue = self.make_queue(groups=1, max_attempts=2)
+        item_id = work_queue.claim("ws-1")[0]
+        self.assertEqual(work_queue.complete(item_id, "ws-1", "timeout"), "pending")
+        self.assertEqual(work_queue.claim("ws-2")[0], item_id)
+        self.assertEqual(work_queue.complete(item_id, "ws-2", "timeout"), "failed")
+        self.assertIsNone(work_queue.claim("ws-3"))
+
+    def test_lease_expiring_on_every_attempt_fails_the_item(self):
+        work_queue = self.make_queue(groups=1, max_attempts=2)
+        item_id = work_queue.claim("ws-1")[0]
+        self.now += 61
+        self.assertEqual(work_queue.claim("ws-2")[0], item_id)
+        self.now += 61
+        self.assertIsNone(work_queue.claim("ws-3"))
+        self.assertEqual(work_queue.counts(), {"failed": 1})
+
+    def test_release_does_not_count_an_attempt(self):
+        work_queue = self.make_queue(groups=1, max_attempts=1)
+        item_id = work_queue.claim("ws-1")[0]
+        work_queue.release(item_id, "ws-1")
+        self.assertEqual(work_queue.claim("ws-2")[0], item_id)
+        self.assertEqual(work_queue.complete(item_id, "ws-2"), "done")
+
+
+if __name__ == "__main__":
+    unittest.main()
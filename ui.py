@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
 
-################################################################################
+##########################################################################
 # Form generated from reading UI file 'ui.ui'
 ##
-# Created by: Qt User Interface Compiler version 5.15.1
+# Created by: Qt User Interface Compiler version 5.15.2
 ##
 # WARNING! All changes made in this file will be lost when recompiling UI file!
-################################################################################
+##########################################################################
 
 from PySide2.QtCore import *
 from PySide2.QtGui import *
@@ -104,10 +104,11 @@ class Ui_MainWindow(object):
         self.cb_project.setEnabled(False)
 
         self.project_layout.addWidget(self.cb_project)
-        
+
         self.pb_refresh = QPushButton(self.gb_p1)
         self.pb_refresh.setObjectName(u"pb_refresh")
-        self.pb_refresh.setFixedWidth(75)
+        self.pb_refresh.setMinimumSize(QSize(75, 0))
+        self.pb_refresh.setMaximumSize(QSize(75, 16777215))
 
         self.project_layout.addWidget(self.pb_refresh)
 
@@ -135,6 +136,11 @@ class Ui_MainWindow(object):
 
         self.horizontalLayout_5.addWidget(self.rb_doFolder)
 
+        self.rb_doManifest = QRadioButton(self.gb_p2)
+        self.rb_doManifest.setObjectName(u"rb_doManifest")
+
+        self.horizontalLayout_5.addWidget(self.rb_doManifest)
+
         self.cb_subfolders = QCheckBox(self.gb_p2)
         self.cb_subfolders.setObjectName(u"cb_subfolders")
         self.cb_subfolders.setEnabled(False)
@@ -154,9 +160,50 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_3.addLayout(self.horizontalLayout_5)
 
+        self.horizontalLayout_scan = QHBoxLayout()
+        self.horizontalLayout_scan.setObjectName(u"horizontalLayout_scan")
+        self.l_include = QLabel(self.gb_p2)
+        self.l_include.setObjectName(u"l_include")
+
+        self.horizontalLayout_scan.addWidget(self.l_include)
+
+        self.le_include = QLineEdit(self.gb_p2)
+        self.le_include.setObjectName(u"le_include")
+
+        self.horizontalLayout_scan.addWidget(self.le_include)
+
+        self.l_exclude = QLabel(self.gb_p2)
+        self.l_exclude.setObjectName(u"l_exclude")
+
+        self.horizontalLayout_scan.addWidget(self.l_exclude)
+
+        self.le_exclude = QLineEdit(self.gb_p2)
+        self.le_exclude.setObjectName(u"le_exclude")
+
+        self.horizontalLayout_scan.addWidget(self.le_exclude)
+
+        self.l_depth = QLabel(self.gb_p2)
+        self.l_depth.setObjectName(u"l_depth")
+
+        self.horizontalLayout_scan.addWidget(self.l_depth)
+
+        self.le_depth = QLineEdit(self.gb_p2)
+        self.le_depth.setObjectName(u"le_depth")
+        self.le_depth.setMinimumSize(QSize(40, 0))
+        self.le_depth.setMaximumSize(QSize(40, 16777215))
+
+        self.horizontalLayout_scan.addWidget(self.le_depth)
+
+        self.cb_latest_version = QCheckBox(self.gb_p2)
+        self.cb_latest_version.setObjectName(u"cb_latest_version")
+        self.cb_latest_version.setChecked(True)
+
+        self.horizontalLayout_scan.addWidget(self.cb_latest_version)
+
+        self.verticalLayout_3.addLayout(self.horizontalLayout_scan)
+
         self.horizontalLayout_6 = QHBoxLayout()
         self.horizontalLayout_6.setObjectName(u"horizontalLayout_6")
-
         self.l_define_rule = QLabel(self.gb_p2)
         self.l_define_rule.setObjectName(u"l_define_rule")
 
@@ -168,58 +215,141 @@ class Ui_MainWindow(object):
         self.horizontalLayout_6.addWidget(self.cb_use_folder)
 
         self.l_delimiter = QLabel(self.gb_p2)
+        self.l_delimiter.setObjectName(u"l_delimiter")
 
         self.horizontalLayout_6.addWidget(self.l_delimiter)
 
         self.le_delimiter = QLineEdit(self.gb_p2)
+        self.le_delimiter.setObjectName(u"le_delimiter")
 
         self.horizontalLayout_6.addWidget(self.le_delimiter)
 
         self.l_ep = QLabel(self.gb_p2)
+        self.l_ep.setObjectName(u"l_ep")
 
         self.horizontalLayout_6.addWidget(self.l_ep)
 
         self.le_ep = QLineEdit(self.gb_p2)
+        self.le_ep.setObjectName(u"le_ep")
 
         self.horizontalLayout_6.addWidget(self.le_ep)
 
         self.l_sq = QLabel(self.gb_p2)
+        self.l_sq.setObjectName(u"l_sq")
 
         self.horizontalLayout_6.addWidget(self.l_sq)
 
         self.le_sq = QLineEdit(self.gb_p2)
+        self.le_sq.setObjectName(u"le_sq")
 
         self.horizontalLayout_6.addWidget(self.le_sq)
 
         self.l_sh = QLabel(self.gb_p2)
+        self.l_sh.setObjectName(u"l_sh")
 
         self.horizontalLayout_6.addWidget(self.l_sh)
 
         self.le_sh = QLineEdit(self.gb_p2)
+        self.le_sh.setObjectName(u"le_sh")
 
         self.horizontalLayout_6.addWidget(self.le_sh)
 
         self.l_ta = QLabel(self.gb_p2)
+        self.l_ta.setObjectName(u"l_ta")
 
         self.horizontalLayout_6.addWidget(self.l_ta)
 
         self.le_ta = QLineEdit(self.gb_p2)
+        self.le_ta.setObjectName(u"le_ta")
 
         self.horizontalLayout_6.addWidget(self.le_ta)
 
-        self.verticalLayout_3.addLayout(self.horizontalLayout_6)
-
         self.l_spacer = QLabel(self.gb_p2)
+        self.l_spacer.setObjectName(u"l_spacer")
 
         self.horizontalLayout_6.addWidget(self.l_spacer)
 
         self.pb_tips = QPushButton(self.gb_p2)
-        self.pb_tips.setObjectName(u"Tips")
-        self.pb_tips.setFixedWidth(40)
-        self.pb_tips.setFixedHeight(20)
+        self.pb_tips.setObjectName(u"pb_tips")
+        self.pb_tips.setMinimumSize(QSize(40, 20))
+        self.pb_tips.setMaximumSize(QSize(40, 20))
 
         self.horizontalLayout_6.addWidget(self.pb_tips)
 
+        self.verticalLayout_3.addLayout(self.horizontalLayout_6)
+
+        self.horizontalLayout_pattern = QHBoxLayout()
+        self.horizontalLayout_pattern.setObjectName(
+            u"horizontalLayout_pattern")
+        self.cb_pattern = QCheckBox(self.gb_p2)
+        self.cb_pattern.setObjectName(u"cb_pattern")
+
+        self.horizontalLayout_pattern.addWidget(self.cb_pattern)
+
+        self.le_pattern = QLineEdit(self.gb_p2)
+        self.le_pattern.setObjectName(u"le_pattern")
+        self.le_pattern.setEnabled(False)
+
+        self.horizontalLayout_pattern.addWidget(self.le_pattern)
+
+        self.cb_full_path = QCheckBox(self.gb_p2)
+        self.cb_full_path.setObjectName(u"cb_full_path")
+        self.cb_full_path.setEnabled(False)
+
+        self.horizontalLayout_pattern.addWidget(self.cb_full_path)
+
+        self.verticalLayout_3.addLayout(self.horizontalLayout_pattern)
+
+        self.horizontalLayout_preview = QHBoxLayout()
+        self.horizontalLayout_preview.setObjectName(
+            u"horizontalLayout_preview")
+        self.cb_live_preview = QCheckBox(self.gb_p2)
+        self.cb_live_preview.setObjectName(u"cb_live_preview")
+
+        self.horizontalLayout_preview.addWidget(self.cb_live_preview)
+
+        self.l_preview_summary = QLabel(self.gb_p2)
+        self.l_preview_summary.setObjectName(u"l_preview_summary")
+
+        self.horizontalLayout_preview.addWidget(self.l_preview_summary)
+
+        self.horizontalSpacer_preview = QSpacerItem(
+            40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
+
+        self.horizontalLayout_preview.addItem(self.horizontalSpacer_preview)
+
+        self.verticalLayout_3.addLayout(self.horizontalLayout_preview)
+
+        self.tw_rule_preview = QTableWidget(self.gb_p2)
+        if (self.tw_rule_preview.columnCount() < 6):
+            self.tw_rule_preview.setColumnCount(6)
+        __qtablewidgetitem = QTableWidgetItem()
+        self.tw_rule_preview.setHorizontalHeaderItem(0, __qtablewidgetitem)
+        __qtablewidgetitem1 = QTableWidgetItem()
+        self.tw_rule_preview.setHorizontalHeaderItem(1, __qtablewidgetitem1)
+        __qtablewidgetitem2 = QTableWidgetItem()
+        self.tw_rule_preview.setHorizontalHeaderItem(2, __qtablewidgetitem2)
+        __qtablewidgetitem3 = QTableWidgetItem()
+        self.tw_rule_preview.setHorizontalHeaderItem(3, __qtablewidgetitem3)
+        __qtablewidgetitem4 = QTableWidgetItem()
+        self.tw_rule_preview.setHorizontalHeaderItem(4, __qtablewidgetitem4)
+        __qtablewidgetitem5 = QTableWidgetItem()
+        self.tw_rule_preview.setHorizontalHeaderItem(5, __qtablewidgetitem5)
+        self.tw_rule_preview.setObjectName(u"tw_rule_preview")
+        self.tw_rule_preview.setVisible(False)
+        self.tw_rule_preview.setMinimumSize(QSize(0, 120))
+        self.tw_rule_preview.setMaximumSize(QSize(16777215, 120))
+        self.tw_rule_preview.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.tw_rule_preview.setAlternatingRowColors(True)
+        self.tw_rule_preview.setWordWrap(False)
+
+        self.verticalLayout_3.addWidget(self.tw_rule_preview)
+
+        self.cb_stream = QCheckBox(self.gb_p2)
+        self.cb_stream.setObjectName(u"cb_stream")
+
+        self.verticalLayout_3.addWidget(self.cb_stream)
+
         self.pb_fetch = QPushButton(self.gb_p2)
         self.pb_fetch.setObjectName(u"pb_fetch")
 
@@ -232,27 +362,30 @@ class Ui_MainWindow(object):
         self.verticalLayout_5 = QVBoxLayout(self.gb_p3)
         self.verticalLayout_5.setObjectName(u"verticalLayout_5")
         self.tv_information = QTableWidget(self.gb_p3)
-        if (self.tv_information.columnCount() < 9):
-            self.tv_information.setColumnCount(9)
-        __qtablewidgetitem = QTableWidgetItem()
-        self.tv_information.setHorizontalHeaderItem(0, __qtablewidgetitem)
-        __qtablewidgetitem1 = QTableWidgetItem()
-        self.tv_information.setHorizontalHeaderItem(1, __qtablewidgetitem1)
-        __qtablewidgetitem2 = QTableWidgetItem()
-        self.tv_information.setHorizontalHeaderItem(2, __qtablewidgetitem2)
-        __qtablewidgetitem3 = QTableWidgetItem()
-        self.tv_information.setHorizontalHeaderItem(3, __qtablewidgetitem3)
-        __qtablewidgetitem4 = QTableWidgetItem()
-        self.tv_information.setHorizontalHeaderItem(4, __qtablewidgetitem4)
-        __qtablewidgetitem5 = QTableWidgetItem()
-        self.tv_information.setHorizontalHeaderItem(5, __qtablewidgetitem5)
+        if (self.tv_information.columnCount() < 10):
+            self.tv_information.setColumnCount(10)
         __qtablewidgetitem6 = QTableWidgetItem()
-        self.tv_information.setHorizontalHeaderItem(6, __qtablewidgetitem6)
+        self.tv_information.setHorizontalHeaderItem(0, __qtablewidgetitem6)
         __qtablewidgetitem7 = QTableWidgetItem()
-        self.tv_information.setHorizontalHeaderItem(7, __qtablewidgetitem7)
+        self.tv_information.setHorizontalHeaderItem(1, __qtablewidgetitem7)
         __qtablewidgetitem8 = QTableWidgetItem()
-        __qtablewidgetitem8.setTextAlignment(Qt.AlignJustify | Qt.AlignVCenter)
-        self.tv_information.setHorizontalHeaderItem(8, __qtablewidgetitem8)
+        self.tv_information.setHorizontalHeaderItem(2, __qtablewidgetitem8)
+        __qtablewidgetitem9 = QTableWidgetItem()
+        self.tv_information.setHorizontalHeaderItem(3, __qtablewidgetitem9)
+        __qtablewidgetitem10 = QTableWidgetItem()
+        self.tv_information.setHorizontalHeaderItem(4, __qtablewidgetitem10)
+        __qtablewidgetitem11 = QTableWidgetItem()
+        self.tv_information.setHorizontalHeaderItem(5, __qtablewidgetitem11)
+        __qtablewidgetitem12 = QTableWidgetItem()
+        self.tv_information.setHorizontalHeaderItem(6, __qtablewidgetitem12)
+        __qtablewidgetitem13 = QTableWidgetItem()
+        self.tv_information.setHorizontalHeaderItem(7, __qtablewidgetitem13)
+        __qtablewidgetitem14 = QTableWidgetItem()
+        __qtablewidgetitem14.setTextAlignment(
+            Qt.AlignJustify | Qt.AlignVCenter)
+        self.tv_information.setHorizontalHeaderItem(8, __qtablewidgetitem14)
+        __qtablewidgetitem15 = QTableWidgetItem()
+        self.tv_information.setHorizontalHeaderItem(9, __qtablewidgetitem15)
         self.tv_information.setObjectName(u"tv_information")
         self.tv_information.setAlternatingRowColors(True)
         self.tv_information.setSelectionMode(QAbstractItemView.SingleSelection)
@@ -263,6 +396,36 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_5.addWidget(self.tv_information)
 
+        self.horizontalLayout_snapshot = QHBoxLayout()
+        self.horizontalLayout_snapshot.setObjectName(
+            u"horizontalLayout_snapshot")
+        self.cb_thumbnails = QCheckBox(self.gb_p3)
+        self.cb_thumbnails.setObjectName(u"cb_thumbnails")
+
+        self.horizontalLayout_snapshot.addWidget(self.cb_thumbnails)
+
+        self.cb_memory = QCheckBox(self.gb_p3)
+        self.cb_memory.setObjectName(u"cb_memory")
+
+        self.horizontalLayout_snapshot.addWidget(self.cb_memory)
+
+        self.horizontalSpacer_snapshot = QSpacerItem(
+            40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
+
+        self.horizontalLayout_snapshot.addItem(self.horizontalSpacer_snapshot)
+
+        self.pb_save_snapshot = QPushButton(self.gb_p3)
+        self.pb_save_snapshot.setObjectName(u"pb_save_snapshot")
+
+        self.horizontalLayout_snapshot.addWidget(self.pb_save_snapshot)
+
+        self.pb_load_snapshot = QPushButton(self.gb_p3)
+        self.pb_load_snapshot.setObjectName(u"pb_load_snapshot")
+
+        self.horizontalLayout_snapshot.addWidget(self.pb_load_snapshot)
+
+        self.verticalLayout_5.addLayout(self.horizontalLayout_snapshot)
+
         self.tasklayout = QFormLayout()
         self.tasklayout.setObjectName(u"tasklayout")
         self.l_task = QLabel(self.gb_p3)
@@ -302,7 +465,6 @@ class Ui_MainWindow(object):
         self.verticalLayout_4.setObjectName(u"verticalLayout_4")
         self.horizontalLayout = QHBoxLayout()
         self.horizontalLayout.setObjectName(u"horizontalLayout")
-
         self.l_threads = QLabel(self.gb_p4)
         self.l_threads.setObjectName(u"l_threads")
 
@@ -310,26 +472,112 @@ class Ui_MainWindow(object):
 
         self.le_threads = QLineEdit(self.gb_p4)
         self.le_threads.setObjectName(u"le_threads")
+        self.le_threads.setMinimumSize(QSize(40, 0))
+        self.le_threads.setMaximumSize(QSize(40, 16777215))
 
-        self.le_threads.setGeometry(125, 18, 40, 20)
+        self.horizontalLayout.addWidget(self.le_threads)
 
         self.l_max_threads = QLabel(self.gb_p4)
         self.l_max_threads.setObjectName(u"l_max_threads")
 
-        self.l_max_threads.setGeometry(180, 18, 400, 20)
+        self.horizontalLayout.addWidget(self.l_max_threads)
 
         self.max_threads_value = QLabel(self.gb_p4)
         self.max_threads_value.setObjectName(u"max_threads_value")
 
-        self.max_threads_value.setGeometry(380, 18, 10, 20)
+        self.horizontalLayout.addWidget(self.max_threads_value)
+
+        self.horizontalSpacer_threads = QSpacerItem(
+            40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
+
+        self.horizontalLayout.addItem(self.horizontalSpacer_threads)
 
         self.verticalLayout_4.addLayout(self.horizontalLayout)
 
+        self.horizontalLayout_rate = QHBoxLayout()
+        self.horizontalLayout_rate.setObjectName(u"horizontalLayout_rate")
+        self.cb_adaptive = QCheckBox(self.gb_p4)
+        self.cb_adaptive.setObjectName(u"cb_adaptive")
+
+        self.horizontalLayout_rate.addWidget(self.cb_adaptive)
+
+        self.l_rate = QLabel(self.gb_p4)
+        self.l_rate.setObjectName(u"l_rate")
+
+        self.horizontalLayout_rate.addWidget(self.l_rate)
+
+        self.le_rate = QLineEdit(self.gb_p4)
+        self.le_rate.setObjectName(u"le_rate")
+        self.le_rate.setMinimumSize(QSize(40, 0))
+        self.le_rate.setMaximumSize(QSize(40, 16777215))
+
+        self.horizontalLayout_rate.addWidget(self.le_rate)
+
+        self.horizontalSpacer_rate = QSpacerItem(
+            40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
+
+        self.horizontalLayout_rate.addItem(self.horizontalSpacer_rate)
+
+        self.verticalLayout_4.addLayout(self.horizontalLayout_rate)
+
+        self.horizontalLayout_processing = QHBoxLayout()
+        self.horizontalLayout_processing.setObjectName(
+            u"horizontalLayout_processing")
+        self.cb_backpressure = QCheckBox(self.gb_p4)
+        self.cb_backpressure.setObjectName(u"cb_backpressure")
+
+        self.horizontalLayout_processing.addWidget(self.cb_backpressure)
+
+        self.le_backlog = QLineEdit(self.gb_p4)
+        self.le_backlog.setObjectName(u"le_backlog")
+        self.le_backlog.setMinimumSize(QSize(40, 0))
+        self.le_backlog.setMaximumSize(QSize(40, 16777215))
+
+        self.horizontalLayout_processing.addWidget(self.le_backlog)
+
+        self.horizontalSpacer_processing = QSpacerItem(
+            40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
+
+        self.horizontalLayout_processing.addItem(
+            self.horizontalSpacer_processing)
+
+        self.l_processing = QLabel(self.gb_p4)
+        self.l_processing.setObjectName(u"l_processing")
+
+        self.horizontalLayout_processing.addWidget(self.l_processing)
+
+        self.verticalLayout_4.addLayout(self.horizontalLayout_processing)
+
         self.cb_reupload = QCheckBox(self.gb_p4)
         self.cb_reupload.setObjectName(u"cb_reupload")
 
         self.verticalLayout_4.addWidget(self.cb_reupload)
 
+        self.cb_batch_task = QCheckBox(self.gb_p4)
+        self.cb_batch_task.setObjectName(u"cb_batch_task")
+
+        self.verticalLayout_4.addWidget(self.cb_batch_task)
+
+        self.horizontalLayout_mirrors = QHBoxLayout()
+        self.horizontalLayout_mirrors.setObjectName(
+            u"horizontalLayout_mirrors")
+        self.cb_mirrors = QCheckBox(self.gb_p4)
+        self.cb_mirrors.setObjectName(u"cb_mirrors")
+
+        self.horizontalLayout_mirrors.addWidget(self.cb_mirrors)
+
+        self.pb_add_mirror = QPushButton(self.gb_p4)
+        self.pb_add_mirror.setObjectName(u"pb_add_mirror")
+
+        self.horizontalLayout_mirrors.addWidget(self.pb_add_mirror)
+
+        self.verticalLayout_4.addLayout(self.horizontalLayout_mirrors)
+
+        self.pb_dry_run = QPushButton(self.gb_p4)
+        self.pb_dry_run.setObjectName(u"pb_dry_run")
+
+        self.verticalLayout_4.addWidget(self.pb_dry_run)
+
         self.pb_publish = QPushButton(self.gb_p4)
         self.pb_publish.setObjectName(u"pb_publish")
 
@@ -342,16 +590,16 @@ class Ui_MainWindow(object):
         self.verticalLayout_4.addWidget(self.progressBar)
 
         self.horizontal_layout_info = QHBoxLayout()
-
+        self.horizontal_layout_info.setObjectName(u"horizontal_layout_info")
         self.l_info = QLabel(self.gb_p4)
         self.l_info.setObjectName(u"l_info")
 
         self.horizontal_layout_info.addWidget(self.l_info)
 
         self.pb_logs = QPushButton(self.gb_p4)
-        self.pb_logs.setObjectName(u"Logs")
-        self.pb_logs.setFixedWidth(40)
-        self.pb_logs.setFixedHeight(20)
+        self.pb_logs.setObjectName(u"pb_logs")
+        self.pb_logs.setMinimumSize(QSize(40, 20))
+        self.pb_logs.setMaximumSize(QSize(40, 20))
 
         self.horizontal_layout_info.addWidget(self.pb_logs)
 
@@ -359,6 +607,92 @@ class Ui_MainWindow(object):
 
         self.verticalLayout.addWidget(self.gb_p4)
 
+        self.gb_p5 = QGroupBox(self.centralwidget)
+        self.gb_p5.setObjectName(u"gb_p5")
+        self.verticalLayout_6 = QVBoxLayout(self.gb_p5)
+        self.verticalLayout_6.setObjectName(u"verticalLayout_6")
+        self.tw_jobs = QTableWidget(self.gb_p5)
+        if (self.tw_jobs.columnCount() < 4):
+            self.tw_jobs.setColumnCount(4)
+        __qtablewidgetitem16 = QTableWidgetItem()
+        self.tw_jobs.setHorizontalHeaderItem(0, __qtablewidgetitem16)
+        __qtablewidgetitem17 = QTableWidgetItem()
+        self.tw_jobs.setHorizontalHeaderItem(1, __qtablewidgetitem17)
+        __qtablewidgetitem18 = QTableWidgetItem()
+        self.tw_jobs.setHorizontalHeaderItem(2, __qtablewidgetitem18)
+        __qtablewidgetitem19 = QTableWidgetItem()
+        self.tw_jobs.setHorizontalHeaderItem(3, __qtablewidgetitem19)
+        self.tw_jobs.setObjectName(u"tw_jobs")
+        self.tw_jobs.setMinimumSize(QSize(0, 110))
+        self.tw_jobs.setMaximumSize(QSize(16777215, 110))
+        self.tw_jobs.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.tw_jobs.setAlternatingRowColors(True)
+        self.tw_jobs.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.tw_jobs.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tw_jobs.setWordWrap(False)
+
+        self.verticalLayout_6.addWidget(self.tw_jobs)
+
+        self.horizontalLayout_jobs = QHBoxLayout()
+        self.horizontalLayout_jobs.setObjectName(u"horizontalLayout_jobs")
+        self.pb_add_job = QPushButton(self.gb_p5)
+        self.pb_add_job.setObjectName(u"pb_add_job")
+
+        self.horizontalLayout_jobs.addWidget(self.pb_add_job)
+
+        self.pb_job_up = QPushButton(self.gb_p5)
+        self.pb_job_up.setObjectName(u"pb_job_up")
+        self.pb_job_up.setMinimumSize(QSize(40, 0))
+        self.pb_job_up.setMaximumSize(QSize(40, 16777215))
+
+        self.horizontalLayout_jobs.addWidget(self.pb_job_up)
+
+        self.pb_job_down = QPushButton(self.gb_p5)
+        self.pb_job_down.setObjectName(u"pb_job_down")
+        self.pb_job_down.setMinimumSize(QSize(40, 0))
+        self.pb_job_down.setMaximumSize(QSize(40, 16777215))
+
+        self.horizontalLayout_jobs.addWidget(self.pb_job_down)
+
+        self.pb_job_pause = QPushButton(self.gb_p5)
+        self.pb_job_pause.setObjectName(u"pb_job_pause")
+
+        self.horizontalLayout_jobs.addWidget(self.pb_job_pause)
+
+        self.pb_job_remove = QPushButton(self.gb_p5)
+        self.pb_job_remove.setObjectName(u"pb_job_remove")
+
+        self.horizontalLayout_jobs.addWidget(self.pb_job_remove)
+
+        self.pb_share_export = QPushButton(self.gb_p5)
+        self.pb_share_export.setObjectName(u"pb_share_export")
+
+        self.horizontalLayout_jobs.addWidget(self.pb_share_export)
+
+        self.pb_share_work = QPushButton(self.gb_p5)
+        self.pb_share_work.setObjectName(u"pb_share_work")
+
+        self.horizontalLayout_jobs.addWidget(self.pb_share_work)
+
+        self.pb_watch = QPushButton(self.gb_p5)
+        self.pb_watch.setObjectName(u"pb_watch")
+
+        self.horizontalLayout_jobs.addWidget(self.pb_watch)
+
+        self.horizontalSpacer_jobs = QSpacerItem(
+            40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
+
+        self.horizontalLayout_jobs.addItem(self.horizontalSpacer_jobs)
+
+        self.pb_run_queue = QPushButton(self.gb_p5)
+        self.pb_run_queue.setObjectName(u"pb_run_queue")
+
+        self.horizontalLayout_jobs.addWidget(self.pb_run_queue)
+
+        self.verticalLayout_6.addLayout(self.horizontalLayout_jobs)
+
+        self.verticalLayout.addWidget(self.gb_p5)
+
         self.horizontalLayout_7 = QHBoxLayout()
         self.horizontalLayout_7.setObjectName(u"horizontalLayout_7")
         self.l_createdby = QLabel(self.centralwidget)
@@ -425,107 +759,355 @@ class Ui_MainWindow(object):
     # setupUi
 
     def retranslateUi(self, MainWindow):
-        MainWindow.setWindowTitle(QCoreApplication.translate(
-            "MainWindow", u"Kitsu Publisher", None))
-        self.gb_p1.setTitle(QCoreApplication.translate(
-            "MainWindow", u"1. Login", None))
-        self.l_kitsuURL.setText(QCoreApplication.translate(
-            "MainWindow", u"Kitsu URL:", None))
-        self.l_username.setText(QCoreApplication.translate(
-            "MainWindow", u"Username:", None))
-        self.l_password.setText(QCoreApplication.translate(
-            "MainWindow", u"Password:", None))
-        self.pb_login.setText(QCoreApplication.translate(
-            "MainWindow", u"Log in", None))
-        self.l_project.setText(QCoreApplication.translate(
-            "MainWindow", u"Project:", None))
-        self.pb_refresh.setText(QCoreApplication.translate(
-            "MainWindow", u"Refresh", None))
-        self.gb_p2.setTitle(QCoreApplication.translate(
-            "MainWindow", u"2. Where to fetch information from", None))
-        self.rb_doXML.setText(QCoreApplication.translate(
-            "MainWindow", u"Resolve XML", None))
+        MainWindow.setWindowTitle(
+            QCoreApplication.translate(
+                "MainWindow", u"Kitsu Publisher", None))
+        self.gb_p1.setTitle(
+            QCoreApplication.translate(
+                "MainWindow", u"1. Login", None))
+        self.l_kitsuURL.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Kitsu URL:", None))
+        self.l_username.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Username:", None))
+        self.l_password.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Password:", None))
+        self.pb_login.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Log in", None))
+        self.l_project.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Project:", None))
+        self.pb_refresh.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Refresh", None))
+        self.gb_p2.setTitle(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"2. Where to fetch information from",
+                None))
+        self.rb_doXML.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Resolve XML", None))
         self.rb_doFolder.setText(
-            QCoreApplication.translate("MainWindow", u"Folder", None))
-        self.cb_subfolders.setText(QCoreApplication.translate(
-            "MainWindow", u"Subfolders", None))
-        self.pb_pick.setText(QCoreApplication.translate(
-            "MainWindow", u"Pick", None))
-        self.l_define_rule.setText(QCoreApplication.translate(
-            "MainWindow", u"Define rule:", None))
-        self.cb_use_folder.setText(QCoreApplication.translate(
-            "MainWindow", u"useFolder", None))
-        self.l_delimiter.setText(QCoreApplication.translate(
-            "MainWindow", u"Delimiter:", None))
-        self.l_ep.setText(QCoreApplication.translate(
-            "MainWindow", u"Ep:", None))
-        self.l_sq.setText(QCoreApplication.translate(
-            "MainWindow", u"Sq:", None))
-        self.l_sh.setText(QCoreApplication.translate(
-            "MainWindow", u"Shot:", None))
-        self.l_ta.setText(QCoreApplication.translate(
-            "MainWindow", u"Task:", None))
-        self.l_spacer.setText(QCoreApplication.translate(
-            "MainWindow", u"  ", None))
-        self.pb_tips.setText(QCoreApplication.translate(
-            "MainWindow", u"Tips", None))
-        self.pb_fetch.setText(QCoreApplication.translate(
-            "MainWindow", u"Fetch!", None))
-        self.gb_p3.setTitle(QCoreApplication.translate(
-            "MainWindow", u"3. Analyze your information", None))
-        ___qtablewidgetitem = self.tv_information.horizontalHeaderItem(0)
+            QCoreApplication.translate(
+                "MainWindow", u"Folder", None))
+        self.rb_doManifest.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"CSV/EDL", None))
+        self.cb_subfolders.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Subfolders", None))
+        self.pb_pick.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Pick", None))
+        self.l_include.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Include:", None))
+        self.le_include.setPlaceholderText(
+            QCoreApplication.translate(
+                "MainWindow", u"*.mov; shots/*", None))
+        self.l_exclude.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Exclude:", None))
+        self.le_exclude.setPlaceholderText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"_old; renders/tmp; *cache*",
+                None))
+        self.l_depth.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Max depth:", None))
+        self.le_depth.setPlaceholderText(
+            QCoreApplication.translate(
+                "MainWindow", u"all", None))
+        self.cb_latest_version.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Latest version only", None))
+        self.l_define_rule.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Define rule:", None))
+        self.cb_use_folder.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"useFolder", None))
+        self.l_delimiter.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Delimiter:", None))
+        self.l_ep.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Ep:", None))
+        self.l_sq.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Sq:", None))
+        self.l_sh.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Shot:", None))
+        self.l_ta.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Task:", None))
+        self.l_spacer.setText("")
+        self.pb_tips.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Tips", None))
+        self.cb_pattern.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Use a pattern instead:",
+                None))
+        self.le_pattern.setPlaceholderText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"{ep}_{sq}_{shot}_{task}_v{version}  or  (?P<sq>...)(?P<shot>...)",
+                None))
+        self.cb_full_path.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Match full path", None))
+        self.cb_live_preview.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Live rule preview on a sample of files",
+                None))
+        ___qtablewidgetitem = self.tw_rule_preview.horizontalHeaderItem(0)
         ___qtablewidgetitem.setText(
-            QCoreApplication.translate("MainWindow", u"Status", None))
-        ___qtablewidgetitem1 = self.tv_information.horizontalHeaderItem(1)
-        ___qtablewidgetitem1.setText(QCoreApplication.translate(
-            "MainWindow", u"Shot Exists", None))
-        ___qtablewidgetitem2 = self.tv_information.horizontalHeaderItem(2)
+            QCoreApplication.translate(
+                "MainWindow", u"File", None))
+        ___qtablewidgetitem1 = self.tw_rule_preview.horizontalHeaderItem(1)
+        ___qtablewidgetitem1.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Episode", None))
+        ___qtablewidgetitem2 = self.tw_rule_preview.horizontalHeaderItem(2)
         ___qtablewidgetitem2.setText(
-            QCoreApplication.translate("MainWindow", u"Episode", None))
-        ___qtablewidgetitem3 = self.tv_information.horizontalHeaderItem(3)
+            QCoreApplication.translate(
+                "MainWindow", u"Sequence", None))
+        ___qtablewidgetitem3 = self.tw_rule_preview.horizontalHeaderItem(3)
         ___qtablewidgetitem3.setText(
-            QCoreApplication.translate("MainWindow", u"Sequence", None))
-        ___qtablewidgetitem4 = self.tv_information.horizontalHeaderItem(4)
+            QCoreApplication.translate(
+                "MainWindow", u"Shot", None))
+        ___qtablewidgetitem4 = self.tw_rule_preview.horizontalHeaderItem(4)
         ___qtablewidgetitem4.setText(
-            QCoreApplication.translate("MainWindow", u"Shot", None))
-        ___qtablewidgetitem5 = self.tv_information.horizontalHeaderItem(5)
+            QCoreApplication.translate(
+                "MainWindow", u"Task", None))
+        ___qtablewidgetitem5 = self.tw_rule_preview.horizontalHeaderItem(5)
         ___qtablewidgetitem5.setText(
-            QCoreApplication.translate("MainWindow", u"Task", None))
-        ___qtablewidgetitem6 = self.tv_information.horizontalHeaderItem(6)
+            QCoreApplication.translate(
+                "MainWindow", u"Shot Exists", None))
+        self.cb_stream.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Fetch and publish: upload each resolved row while fetching",
+                None))
+        self.pb_fetch.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Fetch!", None))
+        self.gb_p3.setTitle(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"3. Analyze your information",
+                None))
+        ___qtablewidgetitem6 = self.tv_information.horizontalHeaderItem(0)
         ___qtablewidgetitem6.setText(
-            QCoreApplication.translate("MainWindow", u"Framerange", None))
-        ___qtablewidgetitem7 = self.tv_information.horizontalHeaderItem(7)
-        ___qtablewidgetitem7.setText(QCoreApplication.translate(
-            "MainWindow", u"Preview Path", None))
-        ___qtablewidgetitem8 = self.tv_information.horizontalHeaderItem(8)
+            QCoreApplication.translate(
+                "MainWindow", u"Status", None))
+        ___qtablewidgetitem7 = self.tv_information.horizontalHeaderItem(1)
+        ___qtablewidgetitem7.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Shot Exists", None))
+        ___qtablewidgetitem8 = self.tv_information.horizontalHeaderItem(2)
         ___qtablewidgetitem8.setText(
-            QCoreApplication.translate("MainWindow", u"Filesize", None))
-        self.l_task.setText(QCoreApplication.translate(
-            "MainWindow", u"Post previews with a null task name under:", None))
-        self.l_status.setText(QCoreApplication.translate(
-            "MainWindow", u"With status:", None))
-        self.gb_p4.setTitle(QCoreApplication.translate(
-            "MainWindow", u"4. Publish", None))
-        self.l_threads.setText(QCoreApplication.translate(
-            "MainWindow", u"Number of Threads:", None))
-        self.l_max_threads.setText(QCoreApplication.translate(
-            "MainWindow", u"# Max input value | <span style='font-size: 8.8pt;'>最大允许输入</ span>", None))
-        self.cb_reupload.setText(QCoreApplication.translate(
-            "MainWindow", u"Upload previews to shots that already exists", None))
-        self.pb_publish.setText(QCoreApplication.translate(
-            "MainWindow", u"Publish", None))
-        self.l_info.setText(QCoreApplication.translate(
-            "MainWindow", u"Information bar", None))
-        self.pb_logs.setText(QCoreApplication.translate(
-            "MainWindow", u"Logs", None))
-        self.l_createdby.setText(QCoreApplication.translate(
-            "MainWindow", u"Created by Jacob Danell, Ember Light", None))
-        self.l_appinfo.setText(QCoreApplication.translate(
-            "MainWindow", u"Kitsu Publisher v", None))
+            QCoreApplication.translate(
+                "MainWindow", u"Episode", None))
+        ___qtablewidgetitem9 = self.tv_information.horizontalHeaderItem(3)
+        ___qtablewidgetitem9.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Sequence", None))
+        ___qtablewidgetitem10 = self.tv_information.horizontalHeaderItem(4)
+        ___qtablewidgetitem10.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Shot", None))
+        ___qtablewidgetitem11 = self.tv_information.horizontalHeaderItem(5)
+        ___qtablewidgetitem11.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Task", None))
+        ___qtablewidgetitem12 = self.tv_information.horizontalHeaderItem(6)
+        ___qtablewidgetitem12.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Framerange", None))
+        ___qtablewidgetitem13 = self.tv_information.horizontalHeaderItem(7)
+        ___qtablewidgetitem13.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Preview Path", None))
+        ___qtablewidgetitem14 = self.tv_information.horizontalHeaderItem(8)
+        ___qtablewidgetitem14.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Filesize", None))
+        ___qtablewidgetitem15 = self.tv_information.horizontalHeaderItem(9)
+        ___qtablewidgetitem15.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Thumbnail", None))
+        self.cb_thumbnails.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Show thumbnails of the rows in view",
+                None))
+# if QT_CONFIG(tooltip)
+        self.cb_memory.setToolTip(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Peak memory and Python allocations per stage, in the information bar and the log. Set [Memory] budget_mb in the config to cap the memory.",
+                None))
+# endif // QT_CONFIG(tooltip)
+        self.cb_memory.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Measure memory",
+                None))
+        self.pb_save_snapshot.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Save fetch...", None))
+        self.pb_load_snapshot.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Open fetch...", None))
+        self.l_task.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Post previews with a null task name under:",
+                None))
+        self.l_status.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"With status:", None))
+        self.gb_p4.setTitle(
+            QCoreApplication.translate(
+                "MainWindow", u"4. Publish", None))
+        self.l_threads.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Number of Threads:",
+                None))
+        self.l_max_threads.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"# Max input value | <span style='font-size: 8.8pt;'>\u6700\u5927\u5141\u8bb8\u8f93\u5165</ span>",
+                None))
+        self.cb_adaptive.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Adaptive thread count (threads above are the maximum)",
+                None))
+        self.l_rate.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Max requests per second (0 = no limit):",
+                None))
+        self.cb_backpressure.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Pause uploads while Kitsu is still processing this many previews:",
+                None))
+        self.cb_reupload.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Upload previews to shots that already exists",
+                None))
+        self.cb_batch_task.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Post all previews of the same task under one comment",
+                None))
+        self.cb_mirrors.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Also publish to the mirrors",
+                None))
+        self.pb_add_mirror.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Add mirror...", None))
+        self.pb_dry_run.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Dry run: plan the publish without uploading",
+                None))
+        self.pb_publish.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Publish", None))
+        self.l_info.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Information bar",
+                None))
+        self.pb_logs.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Logs", None))
+        self.gb_p5.setTitle(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"5. Publish queue",
+                None))
+        ___qtablewidgetitem16 = self.tw_jobs.horizontalHeaderItem(0)
+        ___qtablewidgetitem16.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Status", None))
+        ___qtablewidgetitem17 = self.tw_jobs.horizontalHeaderItem(1)
+        ___qtablewidgetitem17.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Project", None))
+        ___qtablewidgetitem18 = self.tw_jobs.horizontalHeaderItem(2)
+        ___qtablewidgetitem18.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Path", None))
+        ___qtablewidgetitem19 = self.tw_jobs.horizontalHeaderItem(3)
+        ___qtablewidgetitem19.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Progress", None))
+        self.pb_add_job.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Add fetched rows to queue",
+                None))
+        self.pb_job_up.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Up", None))
+        self.pb_job_down.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Down", None))
+        self.pb_job_pause.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Pause / Resume", None))
+        self.pb_job_remove.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Remove", None))
+        self.pb_share_export.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Export to shared queue",
+                None))
+        self.pb_share_work.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Work shared queue", None))
+        self.pb_watch.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Watch folder", None))
+        self.pb_run_queue.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Run queue", None))
+        self.l_createdby.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Created by Jacob Danell, Ember Light",
+                None))
+        self.l_appinfo.setText(
+            QCoreApplication.translate(
+                "MainWindow",
+                u"Kitsu Publisher v",
+                None))
         self.l_appversion.setText(
-            QCoreApplication.translate("MainWindow", u"1234", None))
-        self.l_gazuinfo.setText(QCoreApplication.translate(
-            "MainWindow", u"Gazu v", None))
+            QCoreApplication.translate(
+                "MainWindow", u"1234", None))
+        self.l_gazuinfo.setText(
+            QCoreApplication.translate(
+                "MainWindow", u"Gazu v", None))
         self.l_gazuversion.setText(
-            QCoreApplication.translate("MainWindow", u"1234", None))
+            QCoreApplication.translate(
+                "MainWindow", u"1234", None))
     # retranslateUi